@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+本地账户状态：余额和挂单
+
+从balance()/open_orders()初始化，经过AccountState下单和撤单时立即更新本地状态，
+后台线程按interval与交易所对账，发现不一致(drift)时记录并调用on_drift，然后以交易所为准。
+读取余额和挂单不发请求。
+
+    state = AccountState(poloniex_service(), ['usd_btc'], interval=10)
+    state.start()
+    state.trade('buy_LIMIT', 0.1, 9000, 'usd_btc')
+    state.balance()['trade']['usd']
+    state.openOrders('usd_btc')
+"""
+
+import contextlib
+import copy
+import logging
+import threading
+import time
+import batch
+
+log = logging.getLogger(__name__)
+
+# 对账时小于这个差值的余额视为一致
+TOLERANCE = 1e-8
+
+
+# trade()的参数名，交易对在poloniex为symbol，在coolcoin为coin
+ORDER_FIELDS = ('trade_type', 'amount', 'price', 'pair')
+PAIR_NAMES = ('pair', 'symbol', 'coin')
+
+
+def _order_fields(order):
+    """
+    :param order: (trade_type, amount, price, pair)，或者trade()参数名组成的dict
+    :return: {'trade_type', 'amount', 'price', 'pair'}
+    """
+    args, kwargs = batch.order_args(order)
+    fields = dict(zip(ORDER_FIELDS, args))
+    for name in PAIR_NAMES:
+        if name in kwargs:
+            fields['pair'] = kwargs[name]
+    fields.update((k, v) for k, v in kwargs.items() if k in ORDER_FIELDS[:3])
+    return fields
+
+def _as_float(balance):
+    return {k: ({c: float(v) for c, v in balance[k].items()} if k in ('trade', 'frozen') else dict(balance[k]))
+            for k in balance}
+
+
+class AccountState():
+    """
+    :param client: Client_Poloniex/Client_Coolcoin
+    :param pairs: 需要跟踪挂单的交易对，本地挂单的pair统一为这里的写法
+    :param interval: 后台对账间隔秒数
+    :param on_drift: on_drift(drift)，对账发现不一致时调用，drift格式见reconcile()
+    :param tolerance: 余额差值小于tolerance时视为一致
+    """
+    def __init__(self, client, pairs, interval=5.0, on_drift=None, tolerance=TOLERANCE):
+        self.client = client
+        self.pairs = list(pairs)
+        # 交易所的交易对名字 -> self.pairs中的写法，'usd_btc'和'USDT_BTC'是同一个交易对
+        self._pairs = {client.markets.get(p).native: p for p in self.pairs}
+        self.interval = interval
+        self.on_drift = on_drift
+        self.tolerance = tolerance
+        self._balance = None
+        self._orders = {}           # {order_id: {'id', 'pair', 'side', 'price', 'amount'}}
+        self._lock = threading.Lock()
+        self._version = 0           # 每次本地更新加1，对账期间有更新时放弃这次对账
+        self._pending = 0           # 已经发出、还没有更新到本地的下单/撤单，不为0时放弃对账
+        self._stop = threading.Event()
+        self._thread = None
+        self.reads = 0
+        self.reconciles = 0
+        self.skipped = 0
+        self.drifts = 0
+        self.last_drift = None
+        self.last_reconcile = None
+
+    def _pair(self, pair):
+        """
+        :return: pair在self.pairs中的写法
+        :raises ValueError: pair不在self.pairs中，对账时不会拉取它的挂单
+        """
+        tracked = self._pairs.get(self.client.markets.get(pair).native)
+        if tracked is None:
+            raise ValueError("pair {!r} is not tracked, expected one of {}".format(pair, self.pairs))
+        return tracked
+
+    # ---- 读取 ----
+
+    def balance(self):
+        """
+        :return: 统一格式的balance，数值为float
+        """
+        if self._balance is None:
+            self.refresh()
+        with self._lock:
+            self.reads += 1
+            return copy.deepcopy(self._balance)
+
+    def openOrders(self, pair=None):
+        """
+        :param pair: 交易对，None为全部
+        :return: [{'id', 'pair', 'side', 'price', 'amount'}]
+        """
+        if pair is not None:
+            pair = self._pair(pair)
+        if self._balance is None:
+            self.refresh()
+        with self._lock:
+            self.reads += 1
+            return [dict(o) for o in self._orders.values() if pair is None or o['pair'] == pair]
+
+    # ---- 交易 ----
+
+    def place_orders(self, orders, concurrency=5, deadline=None):
+        """
+        client.place_orders，成功的订单立即计入本地挂单并冻结余额；
+        unknown的订单不计入，下次对账时如果已经挂单会出现在drift的unknown中
+        :param orders: [(trade_type, amount, price, pair), ...]，或者trade()参数名组成的dict的list
+        :raises ValueError: 有订单的交易对不在self.pairs中，这时不会下任何订单
+        """
+        orders = list(orders)
+        pairs = [self._pair(_order_fields(o)['pair']) for o in orders]
+        with self._in_flight():
+            report = self.client.place_orders(orders, concurrency=concurrency, deadline=deadline)
+            with self._lock:
+                for index in report[batch.PLACED]:
+                    order = _order_fields(report['results'][index]['order'])
+                    self._add_order({'id': report['results'][index]['id'], 'pair': pairs[index],
+                                     'side': order['trade_type'].split('_')[0], 'price': float(order['price']),
+                                     'amount': float(order['amount'])})
+        return report
+
+    def trade(self, trade_type, amount, price, pair):
+        """
+        :return: place_orders结果中的这一个订单：{'order', 'id', 'error', 'response'}
+        """
+        return self.place_orders([(trade_type, amount, price, pair)], concurrency=1)['results'][0]
+
+    def cancel_all(self, order_id_list=None, pair=None, concurrency=5, deadline=None):
+        """
+        按本地挂单撤单，撤销成功的订单立即解冻余额
+        :param order_id_list: 要撤的订单ID，为空时撤销pair(或全部交易对)的本地挂单
+        :return: {pair: client.cancel_all的返回值}，pair为self.pairs中的写法
+        """
+        if pair is not None:
+            pair = self._pair(pair)
+        with self._lock:
+            if order_id_list:
+                ids = set(str(i) for i in order_id_list)
+                targets = [o for o in self._orders.values() if o['id'] in ids]
+            else:
+                targets = [o for o in self._orders.values() if pair is None or o['pair'] == pair]
+        by_pair = {}
+        for o in targets:
+            by_pair.setdefault(o['pair'], []).append(o['id'])
+        reports = {}
+        for p, ids in by_pair.items():
+            with self._in_flight():
+                report = reports[p] = self.client.cancel_all(ids, p, concurrency=concurrency, deadline=deadline)
+                with self._lock:
+                    for order_id in report[batch.CANCELLED]:
+                        self._remove_order(order_id)
+                    for order_id in report[batch.GONE]:
+                        # 已经成交或在别处撤销，余额以下次对账为准
+                        self._orders.pop(order_id, None)
+                        self._version += 1
+        return reports
+
+    def cancel(self, order_id, pair):
+        return self.cancel_all([order_id], pair, concurrency=1)[self._pair(pair)]
+
+    @contextlib.contextmanager
+    def _in_flight(self):
+        """
+        请求发出到结果更新到本地之间，交易所的数据可能已经包含这次下单/撤单，对账会被放弃
+        """
+        with self._lock:
+            self._pending += 1
+            self._version += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._version += 1
+
+    # ---- 本地更新，调用时持有self._lock ----
+
+    def _freeze(self, order, sign):
+        asset, currency = self.client.split_pair(order['pair'])
+        if order['side'] == 'buy':
+            coin, quantity = currency, order['amount'] * order['price']
+        else:
+            coin, quantity = asset, order['amount']
+        if self._balance is None or coin not in self._balance['trade']:
+            return
+        self._balance['trade'][coin] -= sign * quantity
+        self._balance['frozen'][coin] += sign * quantity
+
+    def _add_order(self, order):
+        if order['id'] in self._orders:
+            return
+        self._orders[order['id']] = order
+        self._freeze(order, 1)
+        self._version += 1
+
+    def _remove_order(self, order_id):
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            self._freeze(order, -1)
+        self._version += 1
+
+    # ---- 对账 ----
+
+    def _fetch(self):
+        balance = self.client.balance()
+        orders = {}
+        for pair in self.pairs:
+            for o in self.client.open_orders(pair):
+                o['pair'] = pair
+                orders[o['id']] = o
+        return _as_float(balance), orders
+
+    def refresh(self):
+        """
+        从交易所重新加载，不检查drift
+        """
+        balance, orders = self._fetch()
+        with self._lock:
+            self._balance, self._orders = balance, orders
+            self._version += 1
+            self.last_reconcile = time.time()
+
+    def _diff(self, balance, orders):
+        drift = {'balance': {}, 'missing': [], 'unknown': [], 'changed': []}
+        for kind in ('trade', 'frozen'):
+            for coin, value in balance[kind].items():
+                local = self._balance[kind].get(coin, 0.0)
+                if abs(local - value) > self.tolerance:
+                    drift['balance']['{}.{}'.format(kind, coin)] = (local, value)
+        for order_id, o in self._orders.items():
+            remote = orders.get(order_id)
+            if remote is None:
+                drift['missing'].append(o)
+            elif abs(remote['amount'] - o['amount']) > self.tolerance:
+                drift['changed'].append((o, remote))
+        drift['unknown'] = [o for order_id, o in orders.items() if order_id not in self._orders]
+        return drift
+
+    def reconcile(self):
+        """
+        与交易所对账，以交易所为准
+        :return: 有不一致时为{'balance': {'trade.btc': (本地, 交易所)}, 'missing': [本地有交易所没有的订单],
+                 'unknown': [交易所有本地没有的订单], 'changed': [(本地, 交易所)]}，否则为None
+        """
+        if self._balance is None:
+            self.refresh()
+            return None
+        version = self._version
+        balance, orders = self._fetch()
+        with self._lock:
+            if version != self._version or self._pending:
+                # 对账期间有本地下单/撤单，交易所的数据可能不包含它们，下次再对账
+                self.skipped += 1
+                return None
+            drift = self._diff(balance, orders)
+            self._balance, self._orders = balance, orders
+            self.reconciles += 1
+            self.last_reconcile = time.time()
+            if not any(drift.values()):
+                return None
+            self.drifts += 1
+            self.last_drift = drift
+        log.warning("account drift: %s", drift)
+        if self.on_drift is not None:
+            self.on_drift(drift)
+        return drift
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                log.warning("reconcile failed: %r", e)
+
+    def start(self):
+        """
+        启动后台对账线程
+        """
+        if self._balance is None:
+            self.refresh()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """
+        :return: {'reads', 'reconciles', 'skipped', 'drifts', 'orders', 'last_reconcile'}
+        """
+        with self._lock:
+            return {'reads': self.reads, 'reconciles': self.reconciles, 'skipped': self.skipped,
+                    'drifts': self.drifts, 'orders': len(self._orders), 'last_reconcile': self.last_reconcile}
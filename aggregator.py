@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+多交易所聚合：并发查询多个client并合并深度
+"""
+
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# 每个交易所最多保留的超时后仍在执行的请求数，达到后不再向它发请求，直到其中一个结束
+MAX_ABANDONED = 1
+
+
+class Aggregator():
+    """
+    :param clients: {venue: client}，例如{'poloniex': poloniex_service(), 'coolcoin': coolcoin_service()}
+    :param timeout: 每次查询等待各交易所的最长秒数，超时的交易所不计入结果
+    :param max_workers: 线程数，默认每个交易所1 + MAX_ABANDONED个，超时的请求不会占满线程池
+    """
+    def __init__(self, clients, timeout=2.0, max_workers=None):
+        self.clients = dict(clients)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or (1 + MAX_ABANDONED) * len(self.clients))
+        self._abandoned = dict.fromkeys(self.clients, 0)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _pairs(self, pair):
+        # 两个交易所的命名习惯不同时，可以按venue分别指定交易对
+        if isinstance(pair, dict):
+            return pair
+        return {venue: pair for venue in self.clients}
+
+    def symbols(self, pair):
+        """
+        :param pair: 交易对，或{venue: 交易对}
+        :return: {venue: 该交易所的交易对名字}，pair为dict时只包括其中的交易所
+        """
+        pairs = self._pairs(pair)
+        return {venue: self.clients[venue].compatible(pairs[venue]) for venue in self.clients if venue in pairs}
+
+    def _release(self, venue):
+        with self._lock:
+            self._abandoned[venue] -= 1
+
+    def _fan_out(self, call, venues=None):
+        """
+        对每个client并发执行call(venue, client)
+        :param venues: 只查询这些交易所，默认为全部
+        :return: (results, latency, errors)，都以venue为key
+        """
+        def _timed(venue, client):
+            start = time.time()
+            result = call(venue, client)
+            return result, time.time() - start
+
+        results, latency, errors = {}, {}, {}
+        futures = {}
+        for venue, client in self.clients.items():
+            if venues is not None and venue not in venues:
+                continue
+            latency[venue] = None
+            with self._lock:
+                abandoned = self._abandoned[venue]
+            if abandoned >= MAX_ABANDONED:
+                errors[venue] = 'skipped, {} earlier request(s) still running'.format(abandoned)
+            else:
+                futures[venue] = self._executor.submit(_timed, venue, client)
+        wait(futures.values(), timeout=self.timeout)
+        for venue, f in futures.items():
+            if not f.done():
+                errors[venue] = 'timeout after {}s'.format(self.timeout)
+                # 请求结束之前一直占用一个线程
+                with self._lock:
+                    self._abandoned[venue] += 1
+                f.add_done_callback(lambda f, venue=venue: self._release(venue))
+            elif f.exception() is not None:
+                errors[venue] = repr(f.exception())
+            else:
+                result, latency[venue] = f.result()
+                if result is None or isinstance(result, Exception):
+                    errors[venue] = repr(result) if result is not None else 'no data'
+                else:
+                    results[venue] = result
+        return results, latency, errors
+
+    def depth(self, pair, **kwargs):
+        """
+        并发获取各交易所pair的深度并合并
+        :param pair: 交易对，例如'eth_btc'，由各client自己转换成交易所的命名；
+                     也可以是{venue: 交易对}，这时只查询其中的交易所
+        :return: {'bids': [[price, qty, venue]], 'asks': [...], 'venues': {venue: depth},
+                  'symbols': {venue: symbol}, 'latency': {venue: 秒}, 'errors': {venue: 原因}}
+        """
+        pairs = self._pairs(pair)
+        depths, latency, errors = self._fan_out(
+            lambda venue, client: client.get_depth(pairs[venue], **kwargs), venues=pairs)
+        bids = [[[p, q, venue] for p, q in d['bids']] for venue, d in depths.items()]
+        asks = [[[p, q, venue] for p, q in d['asks']] for venue, d in depths.items()]
+        return {
+            'bids': list(heapq.merge(*bids, key=lambda x: x[0], reverse=True)),
+            'asks': list(heapq.merge(*asks, key=lambda x: x[0])),
+            'venues': depths,
+            'symbols': self.symbols(pair),
+            'latency': latency,
+            'errors': errors,
+        }
+
+    def balance(self):
+        """
+        并发获取各交易所的余额
+        :return: {'venues': {venue: balance}, 'latency': {...}, 'errors': {...}}
+        """
+        balances, latency, errors = self._fan_out(lambda venue, client: client.balance())
+        return {'venues': balances, 'latency': latency, 'errors': errors}
+
+
+def main():
+    import poloniexSDK
+    import coocoinSDK
+    aggregator = Aggregator({'poloniex': poloniexSDK.poloniex_service(),
+                             'coolcoin': coocoinSDK.coolcoin_service()})
+    book = aggregator.depth({'poloniex': 'btc_eth', 'coolcoin': 'eth_btc'})
+    print(book['bids'][:5], book['asks'][:5], book['latency'], book['errors'])
+
+if __name__ == '__main__':
+    main()
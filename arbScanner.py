@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+跨交易所和三角套利扫描
+
+poloniex用一次get_depth('all', as_array=True)取得所有市场，coolcoin按币种并发get_depth，
+两边同时请求。所有交易对的可成交价差在(m, levels, 2)数组上一次算出，见depthArray.BulkDepth。
+
+    scanner = ArbScanner(poloniex, coolcoin, coins=['eth', 'ltc', 'etc'])
+    for opportunity in scanner.scan(size=0.5):      # 每条路径投入0.5 btc
+        print(opportunity)
+
+价差按size从最优价开始吃单计算(VWAP)，每一步扣除该交易所的手续费：
+    cross       在一个交易所买入coin，同时在另一个交易所卖出同样数量，profit以quote计
+    triangle    poloniex内quote -> base -> coin -> quote(或反方向)，例如btc -> usdt -> eth -> btc
+spread = 扣除手续费后收回的quote / 投入的quote - 1，深度不足以成交size时不计入结果。
+"""
+
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+import depthArray
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+CROSS = 'cross'
+TRIANGLE = 'triangle'
+
+# 吃单手续费率
+FEES = {'poloniex': 0.0025, 'coolcoin': 0.002}
+
+
+class Opportunity(namedtuple('Opportunity', 'kind path spread profit')):
+    """
+    :param kind: CROSS/TRIANGLE
+    :param path: 每一步的说明，例如('buy coolcoin eth', 'sell poloniex BTC_ETH')
+    :param spread: 扣除手续费后的收益率
+    :param profit: 以quote计的收益
+    """
+    __slots__ = ()
+
+
+def convert(bulk, rows, buy, amounts):
+    """
+    每条路径在bulk的一个市场上成交一步
+    :param rows: 每条路径使用的市场行号
+    :param buy: 每条路径是否为买入：True时用amounts的currency吃asks得到asset，False时卖出amounts的asset
+    :param amounts: 每条路径投入的数量
+    :return: 每条路径得到的数量，深度不足时为nan
+    """
+    out = np.empty(len(rows))
+    out[buy] = depthArray.spend_many(bulk.asks[rows[buy]], amounts[buy])
+    sell = ~buy
+    out[sell] = depthArray.proceeds_many(bulk.bids[rows[sell]], amounts[sell])
+    return out
+
+def cross_spreads(buy_asks, sell_bids, size, buy_fee, sell_fee):
+    """
+    每一行在buy_asks买入、在sell_bids卖出同样的数量
+    :param buy_asks: (m, levels, 2)
+    :param sell_bids: (m, levels, 2)，与buy_asks按行对应
+    :param size: 按买入方最优价折算的投入金额
+    :return: (spread, profit)，深度不足时为nan
+    """
+    amounts = size / depthArray.best(buy_asks)
+    cost = depthArray.proceeds_many(buy_asks, amounts) * (1 + buy_fee)
+    received = depthArray.proceeds_many(sell_bids, amounts) * (1 - sell_fee)
+    return received / cost - 1, received - cost
+
+def triangles(markets, quote):
+    """
+    :param markets: poloniex的交易对名字，例如('USDT_BTC', 'BTC_ETH', 'USDT_ETH')
+    :param quote: 起止币种，例如'BTC'
+    :return: [(base, link, link_buy, coin)]，link为quote和base之间的市场，
+             link_buy表示quote -> base是在link上买入(link为QUOTE_BASE)
+    """
+    by_currency = {}
+    for market in markets:
+        currency, _, asset = market.partition('_')
+        by_currency.setdefault(currency, set()).add(asset)
+    result = []
+    for market in markets:
+        currency, _, asset = market.partition('_')
+        if quote not in (currency, asset):
+            continue
+        base = asset if currency == quote else currency
+        for coin in sorted(by_currency.get(base, set()) & by_currency.get(quote, set())):
+            if coin not in (quote, base):
+                result.append((base, market, currency == quote, coin))
+    return result
+
+
+class ArbScanner():
+    """
+    :param poloniex: Client_Poloniex
+    :param coolcoin: Client_Coolcoin，None时只扫描poloniex内的三角套利
+    :param coins: 跨交易所比较的币种，coolcoin以btc计价
+    :param quote: 投入和计算收益的币种，poloniex的币种名，例如btc、usdt
+    :param fees: {venue: 手续费率}，默认为FEES
+    :param timeout: 每次获取深度的最长等待秒数，超时的coolcoin币种不计入结果
+    :param kwargs: 传给get_depth的参数，例如depth=10
+    """
+    def __init__(self, poloniex, coolcoin=None, coins=('eth', 'ltc', 'etc'), quote='btc', fees=None,
+                 timeout=5.0, max_workers=None, **kwargs):
+        depthArray.require_numpy()
+        self.poloniex = poloniex
+        self.coolcoin = coolcoin
+        self.coins = list(coins) if coolcoin is not None else []
+        self.quote = quote
+        self.fees = dict(FEES if fees is None else fees)
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or 1 + len(self.coins))
+        # 按市场列表缓存的路径
+        self._plans = {}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def fetch(self):
+        """
+        并发获取poloniex的全部深度和coolcoin每个币种的深度
+        :return: (poloniex的BulkDepth, coolcoin的BulkDepth)，coolcoin的行与self.coins对应
+        :raises errors.ExchangeError: poloniex获取失败；coolcoin失败或超时的币种深度为空
+        """
+        bulk = self._executor.submit(self.poloniex.get_depth, 'all', as_array=True, **self.kwargs)
+        coins = [self._executor.submit(self.coolcoin.get_depth, coin, **self.kwargs) for coin in self.coins]
+        wait([bulk] + coins, timeout=self.timeout)
+        depths = []
+        for coin, f in zip(self.coins, coins):
+            if f.done() and f.exception() is None:
+                depths.append(f.result())
+                continue
+            log.warning("coolcoin %s depth unavailable: %r", coin,
+                        f.exception() if f.done() else 'timeout after {}s'.format(self.timeout))
+            depths.append({'bids': [], 'asks': []})
+        return bulk.result(), depthArray.stack(depths, self.coins)
+
+    def scan(self, size, min_spread=0.0):
+        """
+        获取深度并计算所有路径
+        :param size: 每条路径投入的quote数量
+        :return: spread大于min_spread的Opportunity，按spread从高到低
+        """
+        bulk, coolcoin = self.fetch()
+        return self.evaluate(bulk, coolcoin, size, min_spread)
+
+    def evaluate(self, bulk, coolcoin, size, min_spread=0.0):
+        """
+        用已有的深度计算所有路径，不发请求
+        :param bulk: poloniex的BulkDepth
+        :param coolcoin: coolcoin的BulkDepth，行与self.coins对应，可以为None
+        """
+        opportunities = []
+        if coolcoin is not None and len(coolcoin):
+            opportunities.extend(self._cross(bulk, coolcoin, size, min_spread))
+        opportunities.extend(self._triangles(bulk, size, min_spread))
+        opportunities.sort(key=lambda o: o.spread, reverse=True)
+        return opportunities
+
+    def _cross(self, bulk, coolcoin, size, min_spread):
+        markets = [self.poloniex.compatible('{}_{}'.format(self.quote, coin)) for coin in coolcoin.markets]
+        rows = bulk.rows(markets)
+        listed = np.flatnonzero((rows >= 0) & ~bulk.frozen[np.maximum(rows, 0)])
+        if not len(listed):
+            return []
+        polo_bids, polo_asks = bulk.bids[rows[listed]], bulk.asks[rows[listed]]
+        cool_bids, cool_asks = coolcoin.bids[listed], coolcoin.asks[listed]
+        fee_p, fee_c = self.fees.get('poloniex', 0.0), self.fees.get('coolcoin', 0.0)
+        # 前一半为coolcoin买入poloniex卖出，后一半相反
+        spread, profit = cross_spreads(np.concatenate([cool_asks, polo_asks]),
+                                       np.concatenate([polo_bids, cool_bids]),
+                                       size, np.repeat([fee_c, fee_p], len(listed)),
+                                       np.repeat([fee_p, fee_c], len(listed)))
+        result = []
+        for i in np.flatnonzero(spread > min_spread):
+            j = listed[i % len(listed)]
+            coin, market = coolcoin.markets[j], markets[j]
+            if i < len(listed):
+                path = ('buy coolcoin {}'.format(coin), 'sell poloniex {}'.format(market))
+            else:
+                path = ('buy poloniex {}'.format(market), 'sell coolcoin {}'.format(coin))
+            result.append(Opportunity(CROSS, path, float(spread[i]), float(profit[i])))
+        return result
+
+    def _plan(self, bulk):
+        """
+        :return: (legs, paths)，legs为三步的(rows, buy)，paths与rows按位置对应
+        """
+        plan = self._plans.get(bulk.markets)
+        if plan is not None:
+            return plan
+        quote = self.quote.upper()
+        rows, paths = [[], [], []], []
+        buys = [[], [], []]
+        for base, link, link_buy, coin in triangles(bulk.markets, quote):
+            base_coin, quote_coin = '{}_{}'.format(base, coin), '{}_{}'.format(quote, coin)
+            # quote -> base -> coin -> quote
+            for leg, (market, buy) in enumerate([(link, link_buy), (base_coin, True), (quote_coin, False)]):
+                rows[leg].append(bulk.index[market])
+                buys[leg].append(buy)
+            paths.append(('{} {}'.format('buy' if link_buy else 'sell', link), 'buy ' + base_coin,
+                          'sell ' + quote_coin))
+            # quote -> coin -> base -> quote
+            for leg, (market, buy) in enumerate([(quote_coin, True), (base_coin, False), (link, not link_buy)]):
+                rows[leg].append(bulk.index[market])
+                buys[leg].append(buy)
+            paths.append(('buy ' + quote_coin, 'sell ' + base_coin,
+                          '{} {}'.format('sell' if link_buy else 'buy', link)))
+        legs = [(np.array(r, dtype=np.intp), np.array(b, dtype=bool)) for r, b in zip(rows, buys)]
+        plan = self._plans[bulk.markets] = (legs, paths)
+        return plan
+
+    def _triangles(self, bulk, size, min_spread):
+        legs, paths = self._plan(bulk)
+        if not paths:
+            return []
+        fee = self.fees.get('poloniex', 0.0)
+        amounts = np.full(len(paths), float(size))
+        usable = np.ones(len(paths), dtype=bool)
+        for rows, buy in legs:
+            amounts = convert(bulk, rows, buy, amounts) * (1 - fee)
+            usable &= ~bulk.frozen[rows]
+        spread = amounts / size - 1
+        return [Opportunity(TRIANGLE, paths[i], float(spread[i]), float(amounts[i] - size))
+                for i in np.flatnonzero(usable & (spread > min_spread))]
+
+
+def main():
+    import poloniexSDK
+    import coocoinSDK
+
+    logging.basicConfig(level=logging.INFO)
+    scanner = ArbScanner(poloniexSDK.Client_Poloniex(), coocoinSDK.Client_Coolcoin())
+    start = time.perf_counter()
+    bulk, coolcoin = scanner.fetch()
+    fetched = time.perf_counter()
+    opportunities = scanner.evaluate(bulk, coolcoin, size=0.1, min_spread=-0.01)
+    print("{} markets, fetch {:.1f}ms, evaluate {:.1f}ms".format(
+        len(bulk), (fetched - start) * 1e3, (time.perf_counter() - fetched) * 1e3))
+    for o in opportunities[:20]:
+        print("{:8} {:+.4%} {:+.8f}  {}".format(o.kind, o.spread, o.profit, ' -> '.join(o.path)))
+    scanner.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+asyncio版本的Client_Poloniex和Client_Coolcoin
+
+方法与同步版本一一对应，但都是coroutine；只有不发请求的compatible/split_pair仍是普通方法，
+openOrders没有lazy参数。多个client可以共用一个aiohttp.ClientSession，从而共用一个连接池。
+
+同一个key在一个事件循环中的签名请求逐个签名并写入socket，nonce按顺序发出，写入之后不等待响应
+就可以发送下一个，与同步版本的transport相同；偶尔仍然被拒绝的请求用新的nonce重试NONCE_RETRIES次。
+public请求不受影响。
+写入完成由sent_trace()通知，new_session()创建的session已经包含它；传入自己创建的session时
+需要加上trace_configs=[sent_trace()]，否则每个签名请求要等到响应之后才发送下一个，同一个key的
+place_orders/cancel_all实际上是逐个执行的。
+"""
+
+import asyncio
+import time
+import weakref
+import aiohttp
+import batch
+import depthArray
+import errors
+import jsonCodec
+import poloniexSDK
+import coocoinSDK
+from orderBook import OrderBook
+
+# 事件循环 -> {NonceGenerator: asyncio.Lock}
+_send_locks = weakref.WeakKeyDictionary()
+
+def _send_lock(nonces):
+    """
+    :return: 当前事件循环中nonces共用的锁
+    """
+    locks = _send_locks.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(nonces)
+    if lock is None:
+        lock = locks[nonces] = asyncio.Lock()
+    return lock
+
+async def _headers_sent(session, context, params):
+    sent = context.trace_request_ctx
+    # 没有body的请求写完header就已经发出
+    if isinstance(sent, asyncio.Event) and params.headers.get('Content-Length', '0') == '0':
+        sent.set()
+
+async def _chunk_sent(session, context, params):
+    sent = context.trace_request_ctx
+    if isinstance(sent, asyncio.Event):
+        sent.set()
+
+def sent_trace():
+    """
+    :return: aiohttp.TraceConfig，签名请求写入socket后通知_signed释放nonce的发送顺序
+    """
+    trace = aiohttp.TraceConfig()
+    trace.on_request_headers_sent.append(_headers_sent)
+    trace.on_request_chunk_sent.append(_chunk_sent)
+    return trace
+
+def new_session(limit=100, limit_per_host=0):
+    """
+    创建一个可被多个async client共用的连接池
+    :param limit: 连接池总连接数
+    :param limit_per_host: 每个host的连接数，0为不限制
+    :return: aiohttp.ClientSession
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, trace_configs=[sent_trace()])
+
+async def fan_out(calls, concurrency=50):
+    """
+    并发执行多个coroutine，最多同时执行concurrency个
+    :param calls: coroutine list
+    :param concurrency: 最大并发数
+    :return: 与calls顺序一致的结果list，出错的位置为对应的Exception
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(call):
+        async with semaphore:
+            return await call
+    return await asyncio.gather(*[_run(c) for c in calls], return_exceptions=True)
+
+async def run_batch(fn, items, concurrency=5, deadline=None):
+    """
+    batch.run_batch的asyncio版本
+    :param fn: 返回coroutine的函数
+    :param items: 参数list
+    :param concurrency: 最大并发数
+    :param deadline: 整批的最长等待秒数，None为不限制
+    :return: 与items顺序一致的[(result, error), ...]，同batch.run_batch
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = set()
+
+    async def _run(index, item):
+        async with semaphore:
+            started.add(index)
+            return await fn(item)
+    tasks = [asyncio.ensure_future(_run(n, i)) for n, i in enumerate(items)]
+    if not tasks:
+        return []
+    await asyncio.wait(tasks, timeout=deadline)
+    pending = [t for t in tasks if not t.done()]
+    for t in pending:
+        t.cancel()
+    # 等待取消完成，避免task在run_batch返回之后仍在运行
+    await asyncio.gather(*pending, return_exceptions=True)
+    outcomes = []
+    for n, t in enumerate(tasks):
+        if t in pending:
+            if n in started:
+                error = batch.DeadlineExceeded('deadline of {}s exceeded'.format(deadline), started=True)
+            else:
+                error = batch.DeadlineExceeded('not started before deadline')
+            outcomes.append((None, error))
+        elif t.exception() is not None:
+            outcomes.append((None, t.exception()))
+        else:
+            outcomes.append((t.result(), None))
+    return outcomes
+
+async def cancel_orders(cancel, order_ids, classify, concurrency=5, deadline=None):
+    """
+    batch.cancel_orders的asyncio版本
+    """
+    order_ids = list(order_ids)
+    start = time.time()
+    outcomes = await run_batch(cancel, order_ids, concurrency, deadline)
+    report = batch.cancel_report(order_ids, outcomes, classify)
+    report['elapsed'] = time.time() - start
+    return report
+
+async def place_orders(place, orders, describe, concurrency=5, deadline=None):
+    """
+    batch.place_orders的asyncio版本
+    """
+    orders = list(orders)
+    start = time.time()
+    outcomes = await run_batch(place, orders, concurrency, deadline)
+    report = batch.place_report(orders, outcomes, describe)
+    report['elapsed'] = time.time() - start
+    return report
+
+async def gather_depth(client_pairs, concurrency=50, **kwargs):
+    """
+    并发获取多个交易对的深度
+    :param client_pairs: [(client, pair), ...]
+    :param concurrency: 最大并发数
+    :param kwargs: 传给get_depth的参数
+    :return: 与client_pairs顺序一致的depth list
+    """
+    calls = [client.get_depth(pair, **kwargs) for client, pair in client_pairs]
+    return await fan_out(calls, concurrency)
+
+async def gather_balance(clients, concurrency=50):
+    """
+    并发获取多个账户的余额
+    :param clients: async client list
+    :param concurrency: 最大并发数
+    :return: 与clients顺序一致的balance list，出错的位置为对应的Exception
+    """
+    return await fan_out([client.balance() for client in clients], concurrency)
+
+
+# 同步client的这些参数基于线程阻塞等待，async client不支持
+SYNC_ONLY = ('cache', 'limiter', 'instrument', 'hedge')
+
+def _check_options(cls, options):
+    """
+    :param options: 构造函数收到的其他关键字参数
+    :raises TypeError: 同步client才支持的参数，或者未知参数
+    """
+    for name, value in options.items():
+        if name not in SYNC_ONLY:
+            raise TypeError("{}() got an unexpected keyword argument {!r}".format(cls.__name__, name))
+        if value is not None:
+            raise TypeError("{}() does not support {!r}, it is only available on the sync client".format(
+                cls.__name__, name))
+
+
+class _AsyncSession():
+    """
+    管理aiohttp session：传入的session由调用者关闭，自己创建的session由close()关闭
+    """
+    def _init_session(self, session):
+        self.asession = session
+        self._own_session = session is None
+
+    def _session(self):
+        if self.asession is None:
+            self.asession = new_session()
+        return self.asession
+
+    async def _fetch(self, venue, endpoint, method, url, **kwargs):
+        """
+        发送请求并解码json
+        :raises errors.ExchangeError: 网络错误、429、5xx或响应不是json
+        """
+        try:
+            async with self._session().request(method, url, **kwargs) as response:
+                errors.check_status(response.status, venue, endpoint, response.headers)
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 连接没有建立时请求不可能被执行
+            raise errors.NetworkError(venue, endpoint, repr(e),
+                                      safe=isinstance(e, aiohttp.ClientConnectorError)) from e
+        try:
+            return jsonCodec.loads(content)
+        except ValueError as e:
+            raise errors.ServerError(venue, endpoint, 'invalid json: {!r}'.format(content[:80])) from e
+
+    async def _signed(self, send, is_nonce_error, retries):
+        """
+        按nonce顺序发送签名请求，nonce被拒绝时重新签名重试
+        :param send: send(sent) -> coroutine，每次调用重新签名并发送，sent作为trace_request_ctx传给request
+        :param is_nonce_error: 该交易所的is_nonce_error
+        :param retries: nonce被拒绝时的重试次数
+        """
+        async def _send_in_order():
+            # 只在签名和写入socket期间持有锁，等待响应时下一个请求已经可以签名发送
+            async with _send_lock(self.nonces):
+                sent = asyncio.Event()
+                request = asyncio.ensure_future(send(sent))
+                written = asyncio.ensure_future(sent.wait())
+                try:
+                    await asyncio.wait([request, written], return_when=asyncio.FIRST_COMPLETED)
+                    # 与transport相同，间隔send_gap再发送下一个nonce，给交易所留出按顺序处理的时间
+                    if self.nonces.send_gap and not request.done():
+                        await asyncio.sleep(self.nonces.send_gap)
+                except asyncio.CancelledError:
+                    request.cancel()
+                    raise
+                finally:
+                    written.cancel()
+            return await request
+
+        async def _attempt():
+            for attempt in range(retries + 1):
+                data = await _send_in_order()
+                if not is_nonce_error(data):
+                    break
+            return data
+        return await self.retry.call_async(_attempt, idempotent=False)
+
+    async def close(self):
+        if self._own_session and self.asession is not None:
+            await self.asession.close()
+        self.asession = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncClient_Poloniex(_AsyncSession, poloniexSDK.Client_Poloniex):
+    def __init__(self, access_key=None, secret_key=None, endpoint=poloniexSDK.ENDPOINT, session=None, credentials=None,
+                 nonces=None, retry=None, markets=None, **options):
+        """
+        :param session: aiohttp.ClientSession，默认第一次请求时用new_session()创建
+        :param credentials/nonces/retry/markets: 与Client_Poloniex相同
+        :raises TypeError: 传入了SYNC_ONLY中的参数
+        """
+        _check_options(type(self), options)
+        poloniexSDK.Client_Poloniex.__init__(self, access_key, secret_key, endpoint, nonces=nonces, retry=retry,
+                                             markets=markets, credentials=credentials)
+        self._init_session(session)
+
+    async def http_request(self, method, path, params=None):
+        """
+        适用于public的api接口请求
+        """
+        endpoint = (params or {}).get('command', path)
+        return await self.retry.call_async(lambda: self._fetch(
+            poloniexSDK.VENUE, endpoint, method, self.endpoint + path, params=params))
+
+    async def signedRequest(self, method="POST", path='/tradingApi', params={}):
+        """
+        适用于private的api接口请求，签名方式与Client_Poloniex.signedRequest相同
+        """
+        endpoint = params.get('command', path)
+
+        async def _send(sent):
+            body, headers = self._sign(params)
+            return await self._fetch(poloniexSDK.VENUE, endpoint, method, self.endpoint + path,
+                                     headers=headers, data=body, trace_request_ctx=sent)
+        return await self._signed(_send, poloniexSDK.is_nonce_error, poloniexSDK.NONCE_RETRIES)
+
+    async def get_depth(self, currencyPair, as_array=False, **kwargs):
+        currencyPair = self.compatible(currencyPair)
+        if as_array:
+            depthArray.require_numpy()
+        params = {
+            "command": "returnOrderBook",
+            "currencyPair": currencyPair,
+            "depth": "25"}
+        params.update(kwargs)
+        data = await self.http_request("GET", "/public", params)
+        if isinstance(data, dict) and data.get('error'):
+            raise errors.APIError(poloniexSDK.VENUE, "returnOrderBook", data['error'])
+        if currencyPair == 'all':
+            return depthArray.parse_all_depth(data) if as_array else poloniexSDK.parse_all_depth(data)
+        if as_array:
+            return depthArray.parse_depth(data)
+        return poloniexSDK.parse_depth(data)
+
+    async def get_book(self, currencyPair, book=None, **kwargs):
+        depth = await self.get_depth(currencyPair, **kwargs)
+        if book is None:
+            return OrderBook.from_depth(depth)
+        book.apply_snapshot(depth)
+        return book
+
+    async def balance(self):
+        params = {
+            "command": "returnCompleteBalances",
+            "account": "all"
+        }
+        data = await self.signedRequest("POST", "/tradingApi", params=params)
+        if poloniexSDK.error_code(data):
+            raise errors.APIError(poloniexSDK.VENUE, "returnCompleteBalances", data['error'])
+        return poloniexSDK.parse_balance(data)
+
+    async def trade(self, trade_type, amount, price, symbol, test=False):
+        market = self.markets.get(symbol).validate(amount, price)
+        side, orderType = trade_type.split('_')
+        amount, price = market.format(amount, price)
+        params = {
+            'command': side,
+            'currencyPair': market.native,
+            'rate': price,
+            'Amount': amount,
+        }
+        return await self.signedRequest("POST", "/tradingApi", params)
+
+    async def place_orders(self, orders, concurrency=5, deadline=None):
+        def _place(order):
+            args, kwargs = batch.order_args(order)
+            return self.trade(*args, **kwargs)
+        return await place_orders(_place, orders, poloniexSDK.describe_order,
+                                  concurrency=concurrency, deadline=deadline)
+
+    async def cancel(self, orderNumber, currencyPair, **kwargs):
+        currencyPair = self.compatible(currencyPair)
+        params = {
+            "command": "cancelOrder",
+            'currencyPair': currencyPair,
+            'orderNumber': orderNumber,
+            }
+        params.update(kwargs)
+        return await self.signedRequest("POST", "/tradingApi", params)
+
+    async def openOrders(self, symbol='all', **kwargs):
+        currencyPair = self.compatible(symbol)
+        params = {
+            "command": "returnOpenOrders",
+            "currencyPair": currencyPair
+            }
+        params.update(kwargs)
+        return await self.signedRequest("POST", "/tradingApi", params)
+
+    async def open_orders(self, symbol):
+        data = await self.openOrders(symbol)
+        if poloniexSDK.error_code(data):
+            raise errors.APIError(poloniexSDK.VENUE, "returnOpenOrders", data['error'])
+        if isinstance(data, dict):
+            # all时按交易对分组，与同步版本一样给每个订单加上currencyPair
+            data = [dict(order, currencyPair=market) for market, orders in data.items()
+                    if isinstance(orders, list) for order in orders]
+        return [poloniexSDK.parse_open_order(i) for i in data if isinstance(i, dict)]
+
+    async def cancel_all(self, order_id_list=None, currencyPair='ETH_BTC', concurrency=5, deadline=None):
+        currencyPair = self.compatible(currencyPair)
+        markets = {}
+        if not order_id_list:
+            openorders = await self.openOrders(currencyPair)
+            if poloniexSDK.error_code(openorders):
+                raise errors.APIError(poloniexSDK.VENUE, "returnOpenOrders", openorders['error'])
+            if isinstance(openorders, dict):
+                # all时每个挂单按它自己的交易对撤销
+                openorders = [dict(i, currencyPair=market) for market, orders in openorders.items()
+                              if isinstance(orders, list) for i in orders]
+            order_id_list = [i['orderNumber'] for i in openorders if type(i) == type({})]
+            markets = {i['orderNumber']: i.get('currencyPair', currencyPair) for i in openorders
+                       if type(i) == type({})}
+
+        def _cancel(orderNumber):
+            return self.cancel(orderNumber=orderNumber, currencyPair=markets.get(orderNumber, currencyPair))
+        return await cancel_orders(_cancel, order_id_list, poloniexSDK.classify_cancel,
+                                   concurrency=concurrency, deadline=deadline)
+
+
+class AsyncClient_Coolcoin(_AsyncSession, coocoinSDK.Client_Coolcoin):
+    def __init__(self, access_key=None, secret_key=None, endpoint=coocoinSDK.ENDPOINT, session=None, credentials=None,
+                 nonces=None, retry=None, markets=None, **options):
+        """
+        :param session: aiohttp.ClientSession，默认第一次请求时用new_session()创建
+        :param credentials/nonces/retry/markets: 与Client_Coolcoin相同
+        :raises TypeError: 传入了SYNC_ONLY中的参数
+        """
+        _check_options(type(self), options)
+        coocoinSDK.Client_Coolcoin.__init__(self, access_key, secret_key, endpoint, nonces=nonces, retry=retry,
+                                            markets=markets, credentials=credentials)
+        self._init_session(session)
+
+    async def http_request(self, method, path, params=None):
+        """
+        适用于public的api接口请求
+        """
+        return await self.retry.call_async(lambda: self._fetch(
+            coocoinSDK.VENUE, path, method, self.endpoint + path, params=params))
+
+    async def signedRequest(self, method="POST", path='', params={}):
+        """
+        适用于private的api接口请求，签名方式与Client_Coolcoin.signedRequest相同
+        """
+        async def _send(sent):
+            body = self._sign(params)
+            return await self._fetch(coocoinSDK.VENUE, path, method, self.endpoint + path,
+                                     headers=coocoinSDK.FORM_HEADERS, data=body, trace_request_ctx=sent)
+        return await self._signed(_send, coocoinSDK.is_nonce_error, coocoinSDK.NONCE_RETRIES)
+
+    async def get_depth(self, coinPairs, as_array=False, **kwargs):
+        coin = self.compatible(coinPairs)
+        if as_array:
+            depthArray.require_numpy()
+        params = {
+            "coin": coin,
+            }
+        params.update(kwargs)
+        data = await self.http_request("GET", "/api/v1/depth/", params)
+        code = coocoinSDK.error_code(data)
+        if code is not None:
+            raise errors.APIError(coocoinSDK.VENUE, "/api/v1/depth/", coocoinSDK._codeErro(code), code=code)
+        if as_array:
+            return depthArray.parse_depth(data)
+        return coocoinSDK.parse_depth(data)
+
+    async def get_book(self, coinPairs, book=None, **kwargs):
+        depth = await self.get_depth(coinPairs, **kwargs)
+        if book is None:
+            return OrderBook.from_depth(depth)
+        book.apply_snapshot(depth)
+        return book
+
+    async def balance(self):
+        data = await self.signedRequest("POST", "/api/v1/balance/", params={})
+        code = coocoinSDK.error_code(data)
+        if code is not None:
+            raise errors.APIError(coocoinSDK.VENUE, "/api/v1/balance/", coocoinSDK._codeErro(code), code=code)
+        return coocoinSDK.parse_balance(data)
+
+    async def trade(self, trade_type, amount, price, coin, test=False):
+        data = await self._trade(trade_type, amount, price, coin)
+        if not data['code']:
+            return data
+        else:
+            return data['code']
+
+    async def _trade(self, trade_type, amount, price, coin, test=False):
+        market = self.markets.get(coin).validate(amount, price)
+        side, type = trade_type.split('_')
+        amount, price = market.format(amount, price)
+        params = {
+            'amount': amount,
+            'price': price,
+            'type': side,
+            'coin': market.native,
+        }
+        return await self.signedRequest("POST", "/api/v1/trade_add/", params)
+
+    async def place_orders(self, orders, concurrency=5, deadline=None):
+        def _place(order):
+            args, kwargs = batch.order_args(order)
+            return self._trade(*args, **kwargs)
+        return await place_orders(_place, orders, coocoinSDK.describe_order,
+                                  concurrency=concurrency, deadline=deadline)
+
+    async def cancel(self, orderID, coin, **kwargs):
+        coin = self.compatible(coin)
+        params = {
+            'id': int(orderID),
+            'coin': coin,
+        }
+        return await self.signedRequest("POST", "/api/v1/trade_cancel/", params)
+
+    async def openOrders(self, coin, **kwargs):
+        coin = self.compatible(coin)
+        params = {
+            'coin': coin,
+            'type': 'open', # 默认open
+        }
+        data = await self.signedRequest("POST", "/api/v1/trade_list/", params)
+        code = coocoinSDK.error_code(data)
+        if code is not None:
+            raise errors.APIError(coocoinSDK.VENUE, "/api/v1/trade_list/", coocoinSDK._codeErro(code), code=code)
+        data = data['data']
+        if data:
+            return data
+        else:
+            return None
+
+    async def open_orders(self, coin):
+        orders = await self.openOrders(coin) or []
+        return [coocoinSDK.parse_open_order(i) for i in orders if isinstance(i, dict)]
+
+    async def cancel_all(self, order_id_list=None, coin='ETH_BTC', concurrency=5, deadline=None):
+        coin = self.compatible(coin)
+        if not order_id_list:
+            openOrders = await self.openOrders(coin) or []
+            order_id_list = [i['id'] for i in openOrders if type(i) == type({})]
+
+        def _cancel(orderID):
+            return self.cancel(orderID=orderID, coin=coin)
+        return await cancel_orders(_cancel, order_id_list, coocoinSDK.classify_cancel,
+                                   concurrency=concurrency, deadline=deadline)
+
+
+def main():
+    async def _demo():
+        async with new_session() as session:
+            poloniex = AsyncClient_Poloniex('', '', session=session)
+            coolcoin = AsyncClient_Coolcoin('', '', session=session)
+            print(await gather_depth([(poloniex, 'usd_btc'), (poloniex, 'btc_eth'),
+                                      (coolcoin, 'eth_btc')]))
+    asyncio.run(_demo())
+
+if __name__ == '__main__':
+    main()
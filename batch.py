@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+并发批量执行请求，例如批量下单和批量撤单
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# 撤单结果
+CANCELLED = 'cancelled'     # 撤单成功
+GONE = 'gone'               # 订单已经不存在(已成交或已撤销)
+FAILED = 'failed'           # 撤单失败，或者deadline之前没有发出
+# deadline时请求仍在执行，交易所可能已经执行也可能没有：需要用openOrders对账，不能直接重试，
+# 否则下单可能重复
+UNKNOWN = 'unknown'
+
+# 下单结果，失败时为FAILED，结果未知时为UNKNOWN
+PLACED = 'placed'
+
+class DeadlineExceeded(Exception):
+    """
+    :param started: 请求是否已经开始执行，True时交易所可能已经执行
+    """
+    def __init__(self, message, started=False):
+        Exception.__init__(self, message)
+        self.started = started
+
+def _status(error):
+    # 已经开始执行的请求超时，结果未知
+    if isinstance(error, DeadlineExceeded) and error.started:
+        return UNKNOWN
+    return FAILED
+
+def run_batch(fn, items, concurrency=5, deadline=None):
+    """
+    用线程池并发执行fn(item)
+    :param fn: 对每个item调用的函数
+    :param items: 参数list
+    :param concurrency: 最大并发数
+    :param deadline: 整批的最长等待秒数，None为不限制
+    :return: 与items顺序一致的[(result, error), ...]，超时未完成的error为DeadlineExceeded，
+             已经开始执行的started为True
+    """
+    items = list(items)
+    if not items:
+        return []
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = [executor.submit(fn, i) for i in items]
+        wait(futures, timeout=deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    outcomes = []
+    for f in futures:
+        if not f.done():
+            outcomes.append((None, DeadlineExceeded('deadline of {}s exceeded'.format(deadline), started=True)))
+        elif f.cancelled():
+            outcomes.append((None, DeadlineExceeded('not started before deadline')))
+        elif f.exception() is not None:
+            outcomes.append((None, f.exception()))
+        else:
+            outcomes.append((f.result(), None))
+    return outcomes
+
+def cancel_report(order_ids, outcomes, classify):
+    """
+    汇总撤单结果
+    :param order_ids: 订单ID list
+    :param outcomes: run_batch的返回值
+    :param classify: 把交易所响应归类为CANCELLED/GONE/FAILED的函数
+    :return: {'cancelled': [id], 'gone': [id], 'failed': [id], 'unknown': [id], 'results': {id: 响应或异常}}，
+             unknown为deadline时仍在执行的撤单
+    """
+    report = {CANCELLED: [], GONE: [], FAILED: [], UNKNOWN: [], 'results': {}}
+    for order_id, (result, error) in zip(order_ids, outcomes):
+        if error is not None:
+            status = _status(error)
+            report['results'][order_id] = error
+        else:
+            status = classify(result)
+            report['results'][order_id] = result
+        report[status].append(order_id)
+    return report
+
+def cancel_orders(cancel, order_ids, classify, concurrency=5, deadline=None):
+    """
+    并发撤单
+    :param cancel: cancel(order_id)，返回交易所响应
+    :param order_ids: 订单ID list
+    :param classify: 把交易所响应归类为CANCELLED/GONE/FAILED的函数
+    :param concurrency: 最大并发数
+    :param deadline: 整批的最长等待秒数
+    :return: cancel_report的返回值，另有'elapsed'秒数
+    """
+    order_ids = list(order_ids)
+    start = time.time()
+    report = cancel_report(order_ids, run_batch(cancel, order_ids, concurrency, deadline), classify)
+    report['elapsed'] = time.time() - start
+    return report
+
+def order_args(order):
+    """
+    :param order: (trade_type, amount, price, symbol)，或者trade()参数名组成的dict
+    :return: (args, kwargs)
+    """
+    if isinstance(order, dict):
+        return (), order
+    return tuple(order), {}
+
+def place_report(orders, outcomes, describe):
+    """
+    汇总下单结果
+    :param orders: 订单list
+    :param outcomes: run_batch的返回值
+    :param describe: 把交易所响应转换成(order_id, error)的函数，成功时error为None
+    :return: {'placed': [序号], 'failed': [序号], 'unknown': [序号],
+              'results': 与orders顺序一致的[{'order', 'id', 'error', 'response'}]}，
+             unknown为deadline时仍在执行的订单，可能已经挂单，需要对账而不是重新下单
+    """
+    report = {PLACED: [], FAILED: [], UNKNOWN: [], 'results': []}
+    for index, (order, (result, error)) in enumerate(zip(orders, outcomes)):
+        order_id = None
+        if error is None:
+            order_id, error = describe(result)
+            status = PLACED if error is None else FAILED
+        else:
+            status = _status(error)
+        report[status].append(index)
+        report['results'].append({'order': order, 'id': order_id, 'error': error, 'response': result})
+    return report
+
+def place_orders(place, orders, describe, concurrency=5, deadline=None):
+    """
+    并发下单，一个订单失败不影响其他订单
+    :param place: place(order)，返回交易所响应
+    :param orders: 订单list
+    :param describe: 把交易所响应转换成(order_id, error)的函数
+    :param concurrency: 最大并发数
+    :param deadline: 整批的最长等待秒数
+    :return: place_report的返回值，另有'elapsed'秒数
+    """
+    orders = list(orders)
+    start = time.time()
+    report = place_report(orders, run_batch(place, orders, concurrency, deadline), describe)
+    report['elapsed'] = time.time() - start
+    return report
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+离线benchmark，使用本地MockExchange，不访问真实交易所
+
+    python benchmark.py                         # 全部场景
+    python benchmark.py depth cancel --latency 0.02 --error-rate 0.01
+    python benchmark.py --save base.json        # 保存结果
+    python benchmark.py --compare base.json     # p50/p99比保存的结果慢超过tolerance时返回1
+    python benchmark.py startup                 # import时间超过STARTUP_BUDGET_MS时返回1
+    python benchmark.py nonce                   # NonceGenerator重试后仍有nonce错误时返回1
+
+每个场景报告p50/p99延迟(ms)，每秒请求数，每次调用的内存分配峰值(KiB)和出错次数。
+"""
+
+import argparse
+import contextlib
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import requests
+import arbScanner
+import depthArray
+import jsonCodec
+import poloniexSDK
+import coocoinSDK
+import nonce
+import paperExchange
+from mockExchange import MockExchange, make_book
+
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+
+ACCESS_KEY = 'bench-key'
+SECRET_KEY = 'bench-secret'
+ORDER = {'command': 'buy', 'currencyPair': 'USDT_BTC', 'rate': '100.00000000', 'Amount': '0.5'}
+COIN_ORDER = {'amount': 0.5, 'price': 100.0, 'type': 'buy', 'coin': 'eth'}
+
+def _naive_poloniex_sign(params):
+    # 改造前的签名方式：每次重新生成HMAC key
+    payload = {'nonce': int(time.time() * 1000)}
+    payload.update(params)
+    paybytes = urlencode(payload).encode('utf8')
+    return hmac.new(SECRET_KEY.encode('utf-8'), paybytes, hashlib.sha512).hexdigest()
+
+def _naive_coolcoin_sign(params):
+    # 改造前的签名方式：每次计算md5(私钥)
+    query = urlencode(params) + "&nonce={}&key={}".format(int(time.time() * 1000), ACCESS_KEY)
+    md5 = hashlib.md5(SECRET_KEY.encode('utf-8')).hexdigest()
+    return hmac.new(md5.encode('utf-8'), query.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def _cached_sign(signer, paybytes):
+    mac = signer.copy()
+    mac.update(paybytes)
+    return mac.hexdigest()
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+def _is_error(result):
+    if result is None or isinstance(result, Exception):
+        return True
+    return isinstance(result, dict) and bool(result.get('error') or result.get('code'))
+
+def allocations(fn, n=20):
+    """
+    :return: 每次调用的内存分配峰值(KiB)
+    """
+    def _call():
+        try:
+            fn()
+        except Exception:
+            pass
+    _call()
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(n):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            _call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024
+
+def measure(name, fn, n, threads=1, alloc=True):
+    """
+    :param fn: 被测函数，返回交易所的响应
+    :param n: 总调用次数，平均分给threads个线程
+    :return: 结果dict
+    """
+    samples = []
+    errors = []
+    per_thread = max(1, n // threads)
+
+    def _worker():
+        local, failed = [], 0
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            try:
+                failed += _is_error(fn())
+            except Exception:
+                failed += 1
+            local.append((time.perf_counter() - start) * 1e3)
+        samples.extend(local)
+        errors.append(failed)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=_worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return {'name': name, 'calls': len(samples), 'p50': percentile(samples, 0.5),
+            'p99': percentile(samples, 0.99), 'rps': len(samples) / elapsed,
+            'alloc_kib': allocations(fn) if alloc else None, 'errors': sum(errors)}
+
+def _clients(exchange):
+    return (poloniexSDK.Client_Poloniex(ACCESS_KEY, SECRET_KEY, endpoint=exchange.url),
+            coocoinSDK.Client_Coolcoin(ACCESS_KEY, SECRET_KEY, endpoint=exchange.url))
+
+# ---- 场景 ----
+
+def scenario_signing(exchange, n, threads):
+    """
+    sign *为完整的_sign，包括nonce、urlencode和请求头；hmac *只比较每次新建HMAC和copy缓存的HMAC
+    """
+    poloniex, coolcoin = _clients(exchange)
+    paybytes = urlencode(dict(ORDER, nonce=int(time.time() * 1000))).encode('utf8')
+    md5 = hashlib.md5(SECRET_KEY.encode('utf-8')).hexdigest().encode('utf-8')
+    return [measure('hmac poloniex naive',
+                    lambda: hmac.new(SECRET_KEY.encode('utf-8'), paybytes, hashlib.sha512).hexdigest(), n * 10),
+            measure('hmac poloniex cached', lambda: _cached_sign(poloniex._keys()[1], paybytes), n * 10),
+            measure('hmac coolcoin naive', lambda: hmac.new(hashlib.md5(SECRET_KEY.encode('utf-8')).hexdigest()
+                                                            .encode('utf-8'), paybytes, hashlib.sha256).hexdigest(),
+                    n * 10),
+            measure('hmac coolcoin cached', lambda: _cached_sign(coolcoin._keys()[1], paybytes), n * 10),
+            measure('sign poloniex naive', lambda: _naive_poloniex_sign(ORDER), n * 10),
+            measure('sign poloniex', lambda: poloniex._sign(ORDER), n * 10),
+            measure('sign coolcoin naive', lambda: _naive_coolcoin_sign(COIN_ORDER), n * 10),
+            measure('sign coolcoin', lambda: coolcoin._sign(COIN_ORDER), n * 10)]
+
+def scenario_depth(exchange, n, threads):
+    poloniex, coolcoin = _clients(exchange)
+
+    def _unpooled():
+        # 每个请求新建连接
+        return requests.get(exchange.url + '/api/v1/depth/', params={'coin': 'eth'}).json()
+    return [measure('depth coolcoin unpooled', _unpooled, n),
+            measure('depth poloniex', lambda: poloniex.get_depth('usd_btc'), n, threads),
+            measure('depth coolcoin', lambda: coolcoin.get_depth('eth_btc'), n, threads)]
+
+def scenario_order(exchange, n, threads):
+    poloniex, coolcoin = _clients(exchange)
+    return [measure('trade poloniex', lambda: poloniex.trade('buy_LIMIT', 0.5, 100.0, 'usd_btc'),
+                    n, threads),
+            measure('trade coolcoin', lambda: coolcoin.trade('buy_LIMIT', 0.5, 100.0, 'eth_btc'),
+                    n, threads),
+            measure('balance poloniex', poloniex.balance, n, threads)]
+
+def _timed(fn, samples):
+    """
+    :return: 调用fn并把每次耗时(ms)加入samples的函数
+    """
+    def _call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append((time.perf_counter() - start) * 1e3)
+    return _call
+
+def scenario_cancel(exchange, n, threads):
+    """
+    先挂n个单，再用cancel_all全部撤销；p50/p99为每个撤单请求的耗时，rps按整批耗时计算
+    """
+    poloniex, coolcoin = _clients(exchange)
+    results = []
+    for name, client, pair in [('poloniex', poloniex, 'usd_btc'), ('coolcoin', coolcoin, 'eth_btc')]:
+        exchange.orders.clear()
+        for _ in range(n):
+            try:
+                client.trade('buy_LIMIT', 0.5, 100.0, pair)
+            except Exception:
+                pass
+        ids = list(exchange.orders)
+        samples = []
+        # cancel_all对每个订单调用self.cancel
+        client.cancel = _timed(client.cancel, samples)
+        start = time.perf_counter()
+        report = client.cancel_all(ids, pair, concurrency=threads)
+        elapsed = time.perf_counter() - start
+        results.append({'name': 'cancel storm ' + name, 'calls': len(samples),
+                        'p50': percentile(samples, 0.5) if samples else 0.0,
+                        'p99': percentile(samples, 0.99) if samples else 0.0,
+                        'rps': len(ids) / elapsed, 'alloc_kib': None,
+                        'errors': len(report['failed']) + len(report['unknown'])})
+    return results
+
+def scenario_decode(exchange, n, threads):
+    """
+    解码returnOpenOrders all的大响应(20个市场 x 500个订单)，只取orderNumber
+    """
+    orders = {'BTC_{}'.format(m): [{'orderNumber': str(m * 1000 + i), 'type': 'buy', 'rate': '0.00012345',
+                                    'startingAmount': '10.0', 'amount': '10.0', 'total': '0.0012345',
+                                    'date': '2018-01-01 00:00:00', 'margin': 0} for i in range(500)]
+              for m in range(20)}
+    content = json.dumps(orders).encode('utf-8')
+
+    def _stdlib():
+        return [o['orderNumber'] for v in json.loads(content.decode('utf-8')).values() for o in v]
+
+    def _backend():
+        return [o['orderNumber'] for v in jsonCodec.loads(content).values() for o in v]
+
+    def _lazy():
+        return [o['orderNumber'] for _, o in jsonCodec.iter_markets(jsonCodec.Raw(content))]
+    return [measure('decode openOrders json', _stdlib, n // 10),
+            measure('decode openOrders ' + jsonCodec.BACKEND, _backend, n // 10),
+            measure('decode openOrders lazy', _lazy, n // 10)]
+
+# killSwitch从启动到可以发出撤单请求的import时间上限(ms)，不包括解释器本身的启动
+STARTUP_BUDGET_MS = 100.0
+# 启动时不应该import的模块：只在第一次请求、as_array、asyncio client或读取accountConfig时需要
+HEAVY_MODULES = ('requests', 'urllib3', 'numpy', 'asyncio', 'aiohttp', 'accountConfig')
+STARTUP_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import credentialProvider, killSwitch
+killSwitch.make_client({venue!r}, credentialProvider.static('k', 's'))
+ms = (time.perf_counter() - start) * 1e3
+print(json.dumps({{'ms': ms, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def _startup(venue):
+    env = dict(os.environ)
+    here = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [here, env.get('PYTHONPATH')]))
+    code = STARTUP_CODE.format(venue=venue, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True).stdout
+    return json.loads(output)
+
+def scenario_startup(exchange, n, threads):
+    """
+    在新进程中import killSwitch并创建client；超过STARTUP_BUDGET_MS或import了HEAVY_MODULES的次数计为errors
+    """
+    results = []
+    runs = max(5, n // 30)
+    for venue in ('poloniex', 'coolcoin'):
+        # 第一次可能需要编译.pyc
+        _startup(venue)
+        samples, failed, heavy = [], 0, set()
+        start = time.perf_counter()
+        for _ in range(runs):
+            r = _startup(venue)
+            samples.append(r['ms'])
+            heavy.update(r['heavy'])
+            failed += r['ms'] > STARTUP_BUDGET_MS or bool(r['heavy'])
+        elapsed = time.perf_counter() - start
+        if heavy:
+            print("startup {} imported {}".format(venue, ', '.join(sorted(heavy))))
+        results.append({'name': 'startup ' + venue, 'calls': runs, 'p50': percentile(samples, 0.5),
+                        'p99': percentile(samples, 0.99), 'rps': runs / elapsed, 'alloc_kib': None,
+                        'errors': failed})
+    return results
+
+def _naive_compatible(symbol):
+    # 改造前Client_Poloniex.compatible：每次都拆分、转大写
+    return '_'.join('USDT' if i == 'USD' else i for i in symbol.upper().split('_'))
+
+def scenario_symbols(exchange, n, threads):
+    """
+    交易对名字转换和下单参数检查，不发请求
+    """
+    poloniex, coolcoin = _clients(exchange)
+    market = poloniex.markets.get('usd_btc')
+    return [measure('symbol poloniex naive', lambda: _naive_compatible('usd_btc'), n * 10),
+            measure('symbol poloniex', lambda: poloniex.compatible('usd_btc'), n * 10),
+            measure('symbol coolcoin', lambda: coolcoin.compatible('eth_btc'), n * 10),
+            measure('validate poloniex', lambda: market.validate(0.5, 100.0), n * 10)]
+
+def scenario_paper(exchange, n, threads):
+    """
+    模拟交易的下单+撤单和带大量挂单时的feed，不发请求
+    """
+    paper = paperExchange.paper_service('poloniex', balances={'usd': 1e12, 'btc': 1e9}, record_fills=False)
+    paper.feed('usd_btc', make_book(as_string=False))
+    prices = itertools.cycle([99.0 - i * 0.01 for i in range(100)])
+
+    def _order():
+        result = paper.trade('buy_LIMIT', 0.01, next(prices), 'usd_btc')
+        return paper.cancel(result['orderNumber'], 'usd_btc')
+
+    def _feed():
+        return paper.feed('usd_btc', book) or book
+    results = [measure('paper place+cancel', _order, n * 10)]
+    for _ in range(10000):
+        paper.trade('buy_LIMIT', 0.01, next(prices), 'usd_btc')
+    book = make_book(as_string=False)
+    results.append(measure('paper feed 10k resting', _feed, n))
+    return results
+
+def _all_books(coins=100):
+    # poloniex currencyPair=all格式：USDT_BTC、BTC_ETH和每个币种的BTC_/USDT_/ETH_三个市场
+    def _book(mid):
+        book = make_book(mid=mid, tick=mid * 0.001)
+        book.update({'isFrozen': '0', 'seq': 1})
+        return book
+    data = {'USDT_BTC': _book(10000.0), 'BTC_ETH': _book(0.05), 'USDT_ETH': _book(500.0)}
+    for i in range(coins):
+        data['BTC_C{}'.format(i)] = _book(0.001)
+        data['USDT_C{}'.format(i)] = _book(10.0)
+        data['ETH_C{}'.format(i)] = _book(0.02)
+    return data
+
+def scenario_arb(exchange, n, threads):
+    """
+    每个交易对一次请求 vs 一次all请求，以及300个市场上的跨交易所+三角套利计算
+    """
+    poloniex, coolcoin = _clients(exchange)
+    pairs = ('usd_btc', 'btc_eth', 'btc_ltc', 'btc_etc')
+    data = _all_books()
+    bulk = depthArray.parse_all_depth(data)
+    scanner = arbScanner.ArbScanner(poloniex, coolcoin, coins=['eth', 'ltc', 'etc'])
+    cool = depthArray.stack([coolcoin.get_depth(coin) for coin in scanner.coins], scanner.coins)
+    results = [measure('arb depth per pair', lambda: [poloniex.get_depth(p, as_array=True) for p in pairs], n),
+               measure('arb depth all', lambda: poloniex.get_depth('all', as_array=True), n),
+               measure('arb parse all 303 markets', lambda: depthArray.parse_all_depth(data), max(10, n // 10)),
+               measure('arb evaluate 303 markets', lambda: scanner.evaluate(bulk, cool, 0.01, -1.0), n),
+               measure('arb scan', lambda: scanner.scan(0.5, -1.0), n)]
+    scanner.close()
+    return results
+
+SCENARIOS = {
+    'arb': scenario_arb,
+    'decode': scenario_decode,
+    'paper': scenario_paper,
+    'symbols': scenario_symbols,
+    'signing': scenario_signing,
+    'depth': scenario_depth,
+    'order': scenario_order,
+    'cancel': scenario_cancel,
+    'startup': scenario_startup,
+}
+
+class _ClockNonce():
+    # 改造前的nonce：直接使用毫秒数，不按顺序发送
+    def next(self):
+        return int(time.time() * 1000)
+
+    def ordered(self):
+        return contextlib.nullcontext()
+
+def stress_nonce(threads, calls):
+    """
+    多线程并发发送签名请求，检查nonce是否被交易所拒绝
+    :return: NonceGenerator重试之后仍然返回给调用者的nonce错误数
+    """
+    print("nonce stress ({} threads x {} calls)  rejected  failed".format(threads, calls))
+    for name, make in [("clock", _ClockNonce), ("NonceGenerator", nonce.NonceGenerator)]:
+        with MockExchange(secrets={ACCESS_KEY: SECRET_KEY}) as exchange:
+            nonces = make()
+            failed = []
+
+            def _worker():
+                client = coocoinSDK.Client_Coolcoin(ACCESS_KEY, SECRET_KEY, endpoint=exchange.url,
+                                                    nonces=nonces)
+                for _ in range(calls):
+                    data = client.signedRequest("POST", "/api/v1/balance/", {})
+                    if coocoinSDK.is_nonce_error(data):
+                        failed.append(data)
+            workers = [threading.Thread(target=_worker) for _ in range(threads)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            print("  {:32} {:8d} {:7d}".format(name, exchange.nonce_errors, len(failed)))
+    return len(failed)
+
+def report(results):
+    print("{:28} {:>7} {:>9} {:>9} {:>10} {:>9} {:>7}".format(
+        'scenario', 'calls', 'p50 ms', 'p99 ms', 'req/s', 'alloc KiB', 'errors'))
+    for r in results:
+        alloc = '-' if r['alloc_kib'] is None else '{:.1f}'.format(r['alloc_kib'])
+        print("{:28} {:7d} {:9.3f} {:9.3f} {:10.1f} {:>9} {:7d}".format(
+            r['name'], r['calls'], r['p50'], r['p99'], r['rps'], alloc, r['errors']))
+
+def compare(results, baseline, tolerance):
+    """
+    :return: 比baseline慢超过tolerance的场景
+    """
+    base = {r['name']: r for r in baseline}
+    slower = []
+    for r in results:
+        b = base.get(r['name'])
+        if b is None:
+            continue
+        for key in ('p50', 'p99'):
+            if r[key] > b[key] * (1 + tolerance):
+                slower.append("{} {} {:.3f}ms -> {:.3f}ms".format(r['name'], key, b[key], r[key]))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*',
+                        help='scenarios to run: {}, default all'.format(', '.join(sorted(SCENARIOS) + ['nonce'])))
+    parser.add_argument('-n', type=int, default=300, help='calls per measurement')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent callers')
+    parser.add_argument('--latency', type=float, default=0.0, help='mock server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='mock server random extra latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 502 responses')
+    parser.add_argument('--save', help='write results as json')
+    parser.add_argument('--compare', help='baseline json written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline')
+    args = parser.parse_args()
+
+    names = args.scenarios or sorted(SCENARIOS) + ['nonce']
+    unknown = [name for name in names if name not in SCENARIOS and name != 'nonce']
+    if unknown:
+        parser.error("unknown scenario: {}".format(', '.join(unknown)))
+    results = []
+    with MockExchange(secrets={ACCESS_KEY: SECRET_KEY}, latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate) as exchange:
+        for name in names:
+            if name in SCENARIOS:
+                results.extend(SCENARIOS[name](exchange, args.n, args.threads))
+    report(results)
+    nonce_failed = 0
+    if 'nonce' in names:
+        nonce_failed = stress_nonce(args.threads * 4, max(1, args.n // (args.threads * 4)))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for line in slower:
+            print("REGRESSION " + line)
+        if slower:
+            sys.exit(1)
+    over = [r['name'] for r in results if r['name'].startswith('startup ') and r['errors']]
+    if over:
+        print("STARTUP over {}ms budget: {}".format(STARTUP_BUDGET_MS, ', '.join(over)))
+        sys.exit(1)
+    if nonce_failed:
+        print("NONCE {} requests rejected after retries".format(nonce_failed))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
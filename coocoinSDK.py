@@ -1,9 +1,17 @@
-import accountConfig
-import requests
-import time
+import batch
+import credentialProvider
+import errors
+import marketCache
+import marketRegistry
+import rateLimit
+import retryPolicy
+import nonce
+from orderBook import OrderBook
 import hashlib
 import hmac
-import json
+import jsonCodec
+import logging
+import threading
 try:
     from urllib import urlencode
 except ImportError:
@@ -11,10 +19,21 @@ except ImportError:
 # coolcoin 网址
 ENDPOINT = "https://www.coolcoin.com"
 
-def coolcoin_service(key_index='USD_2'):
-    access_key = accountConfig.POLONIEX[key_index]['ACCESS_KEY']
-    secret_key = accountConfig.POLONIEX[key_index]['SECRET_KEY']
-    return Client_Coolcoin(access_key, secret_key)
+log = logging.getLogger(__name__)
+
+VENUE = 'coolcoin'
+
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# 并发请求乱序到达导致nonce被拒绝时，用新的nonce重试的次数
+NONCE_RETRIES = 2
+
+def coolcoin_service(key_index='USD_2', credentials=None):
+    """
+    :param key_index: 环境变量或accountConfig.POLONIEX中的key名，见credentialProvider.default
+    :param credentials: credentialProvider.Provider，设置时不使用key_index
+    """
+    return Client_Coolcoin(credentials=credentials or credentialProvider.default(key_index))
 
 def formatNumber(x):
     if isinstance(x, float):
@@ -22,26 +41,201 @@ def formatNumber(x):
     else:
         return str(x)
 
+def parse_depth(data):
+    """
+    把/api/v1/depth/的响应转换成 {'bids': [[price, qty]], 'asks': [...]}
+    :param data: 解码后的json响应
+    :return: depth dict
+    """
+    bids = []
+    asks = []
+    for i in data['bids']:
+        bids.append([float(i[0]), float(i[1])])
+    for i in data['asks']:
+        asks.append([float(i[0]), float(i[1])])
+    return {'bids': bids, 'asks': asks}
+
+def parse_balance(data):
+    """
+    把/api/v1/balance/的响应转换成统一的balance格式
+    :param data: 解码后的json响应
+    :return: balance dict
+    """
+    data = data['data']
+    # 本站返回balance无usd，cny
+    balance = {'asset': {'total': 0, 'net': 0},
+               'trade': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0},
+               'frozen': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0}}
+
+    # 获取键值
+    balance_trade_keys= balance['trade'].keys()
+    balance_frozen_keys = balance['frozen'].keys()
+
+    data['usd_balance'] = data['usd_lock'] = 0
+    data['cny_balance'] = data['cny_lock'] = 0
+    for i in balance_trade_keys:
+        balance['trade'][i] = data[i+'_balance']
+    for i in balance_frozen_keys:
+        balance['frozen'][i] = data[i+'_lock']
+    return balance
+
+def parse_open_order(order):
+    """
+    把/api/v1/trade_list/中的一个订单转换成统一格式
+    :return: {'id', 'side', 'price', 'amount'}，amount为剩余数量
+    """
+    return {'id': str(order['id']), 'side': order['type'],
+            'price': float(order['price']), 'amount': float(order['amount_outstanding'])}
+
+def classify_cancel(result):
+    """
+    把/api/v1/trade_cancel/的响应归类
+    :param result: 解码后的json响应
+    :return: batch.CANCELLED/GONE/FAILED
+    """
+    if isinstance(result, dict):
+        code = result.get('code')
+        if not code and result.get('result', True):
+            return batch.CANCELLED
+        if str(code) == '203':
+            # 订单不存在
+            return batch.GONE
+    return batch.FAILED
+
+# 错误码
+ERROR_CODES = {
+    '100': '必选参数不能为空',
+    '101': '非法参数',
+    '102': '请求的虚拟币不存在',
+    '103': '密钥不存在',
+    '104': '签名不匹配',
+    '105': '权限不足',
+    '106': '请求过期(nonce错误)',
+    '200': '余额不足',
+    '201': '买卖的数量小于最小买卖额度',
+    '202': '下单价格必须在0 - 1000000之间',
+    '203': '订单不存在',
+    '204': '挂单金额必须在 0.001BTC 以上',
+    '205': '限制挂单价格',
+    '206': '小数位错误',
+}
+
+def _codeErro(code):
+    return ERROR_CODES.get(str(code), "None")
+
+def describe_order(result):
+    """
+    把/api/v1/trade_add/的响应转换成(order_id, error)
+    :param result: 解码后的json响应
+    :return: 成功时error为None，失败时order_id为None，error为"code 说明"
+    """
+    if isinstance(result, dict):
+        code = result.get('code')
+        if code:
+            return None, '{} {}'.format(code, _codeErro(code))
+        if result.get('result', True) and result.get('id') is not None:
+            return str(result['id']), None
+    return None, 'unexpected response: {!r}'.format(result)
+
+def is_nonce_error(data):
+    """
+    :return: 响应是否为106 请求过期(nonce错误)，请求未被执行，可以安全重试
+    """
+    return isinstance(data, dict) and str(data.get('code')) == '106'
+
+def error_code(data):
+    """
+    :return: 响应中非0的code，没有错误时为None
+    """
+    if isinstance(data, dict) and data.get('code'):
+        return data['code']
+    return None
+
+def _decode(response):
+    return jsonCodec.loads(response.content)
+
+def _decode_lazy(response):
+    return jsonCodec.lazy_loads(response.content)
+
 class Client_Coolcoin():
-    def __init__(self, access_key, secret_key,):
-        self._public_key = access_key
-        self._private_key = secret_key
-        self.ssion = requests.Session()
-        self.adapter = requests.adapters.HTTPAdapter(pool_connections=5, pool_maxsize=5, max_retries=5)
-        self.ssion.mount('http://', self.adapter)
-        self.ssion.mount('https://', self.adapter)
+    def __init__(self, access_key=None, secret_key=None, endpoint=ENDPOINT, cache=None, limiter=None, nonces=None,
+                 instrument=None, retry=None, hedge=None, markets=None, credentials=None):
+        """
+        :param access_key: 只调用public接口时可以不传
+        :param cache: marketCache.TTLCache，缓存public接口的响应，可以在多个client之间共用
+        :param limiter: rateLimit.Scheduler，限制请求频率，可以在同一个key的多个client之间共用
+        :param nonces: nonce.NonceGenerator，默认使用同一个access key共用的生成器
+        :param instrument: instrument.Registry，记录每个接口的耗时、字节数和错误，None为不记录
+        :param retry: retryPolicy.RetryPolicy，默认最多尝试3次；private接口只重试确定没有被执行的请求
+        :param hedge: retryPolicy.Hedger，public接口慢于p95时发出对冲请求，None为不对冲
+        :param markets: marketRegistry.MarketRegistry，默认使用这个交易所共用的注册表
+        :param credentials: credentialProvider.Provider，第一次调用private接口时获取key，默认为access_key/secret_key
+        """
+        self.credentials = credentials or credentialProvider.static(access_key, secret_key)
+        self.endpoint = endpoint
+        self.cache = cache
+        self.limiter = limiter
+        self.instrument = instrument
+        self.retry = retry or retryPolicy.RetryPolicy()
+        self.hedge = hedge
+        self.markets = markets if markets is not None else marketRegistry.registry(VENUE)
+        self._nonces = nonces
+        self._signer = None         # (access_key, hmac)，第一次签名时创建
+        self._ssion = None
+        self.adapter = None
+        self._lock = threading.Lock()
+
+    @property
+    def ssion(self):
+        """
+        requests.Session，第一次发送请求时才创建，import requests也推迟到这时
+        """
+        if self._ssion is None:
+            with self._lock:
+                if self._ssion is None:
+                    import transport
+                    session, self.adapter = transport.new_session()
+                    self._ssion = session
+        return self._ssion
+
+    @property
+    def nonces(self):
+        """
+        nonce.NonceGenerator，默认使用同一个access key共用的生成器
+        """
+        if self._nonces is None:
+            self._nonces = nonce.nonce_for(self._keys()[0])
+        return self._nonces
+
+    def _keys(self):
+        """
+        :return: (access_key, hmac)，第一次调用时从self.credentials获取key
+        :raises credentialProvider.CredentialsError: 没有可用的key
+        """
+        signer = self._signer
+        if signer is None:
+            access_key, secret_key = self.credentials()
+            # 签名用的key为md5(私钥)，只需计算一次
+            md5 = hashlib.md5(secret_key.encode("utf-8")).hexdigest()
+            signer = self._signer = (access_key, hmac.new(md5.encode('utf-8'), digestmod=hashlib.sha256))
+        return signer
 
     def compatible(self,symbol):
         """
         调整数字货币名字
-        :param symbol: 传入的数字货币交易pair
-        :return: 输出符合poloniex交易平台命名规则的pair
+        :param symbol: 传入的数字货币交易pair，例如ETH_BTC
+        :return: coolcoin使用的币种名，例如eth，见marketRegistry.parse_coolcoin
         """
-        symbol = symbol.split('_')[0]
+        return self.markets.native(symbol)
+
+    def split_pair(self, symbol):
+        """
+        :param symbol: 交易对，例如eth_btc
+        :return: (asset, currency)，balance中的币种名，例如('eth', 'btc')：买入eth，支付btc
+        """
+        market = self.markets.get(symbol)
+        return market.asset, market.currency
 
-        if 'usd' in symbol:
-            symbol = symbol.replace('usd', 'usdt')
-        return symbol
     #http请求
     def http_request(self, method, path, params=None):
         """
@@ -51,12 +245,73 @@ class Client_Coolcoin():
         :param params: 请求参数dict
         :return: 返回json格式的响应
         """
-        #print("params: \n {}".format(params))
-        path = ENDPOINT + path
-        response = self.ssion.request(method, path, params=params)
-        return response.json()
+        if self.cache is not None:
+            key = marketCache.request_key(self.endpoint, method, path, params)
+            return self.cache.get(path, key, lambda: self._http_request(method, path, params))
+        return self._http_request(method, path, params)
+
+    def _http_request(self, method, path, params=None):
+        def _fetch():
+            if self.limiter is not None:
+                self.limiter.acquire(rateLimit.PUBLIC)
+            return self._send(path, lambda: self.ssion.request(method, self.endpoint + path, params=params),
+                              _decode)
+        if self.hedge is not None:
+            return self.retry.call(lambda: self.hedge.call(path, _fetch))
+        return self.retry.call(_fetch)
+
+    def _send(self, endpoint, send, decode):
+        """
+        :param send: 发送请求，返回requests.Response
+        :param decode: 把Response解码成json
+        :return: decode(send())，设置了instrument时记录耗时
+        :raises errors.ExchangeError: 网络错误、429、5xx或响应不是json
+        """
+        def _checked(response):
+            errors.check_status(response.status_code, VENUE, endpoint, response.headers)
+            try:
+                return decode(response)
+            except ValueError as e:
+                raise errors.ServerError(VENUE, endpoint, 'invalid json: {!r}'.format(response.content[:80]),
+                                         code=response.status_code) from e
+        try:
+            if self.instrument is None:
+                return _checked(send())
+            return self.instrument.request(endpoint, send, _checked, error_code)
+        except Exception as e:
+            if not errors.is_request_exception(e):
+                raise
+            raise errors.from_request_exception(e, VENUE, endpoint) from e
+
+    def _process(self, endpoint, parse, data):
+        """
+        :return: parse(data)，设置了instrument时记录耗时
+        """
+        if self.instrument is None:
+            return parse(data)
+        return self.instrument.process(endpoint, parse, data)
+
+    def _sign(self, params):
+        """
+        对params签名
+        :param params: 请求参数dict
+        :return: 已经urlencode的POST数据bytes，包含nonce，key和signature
+        """
+        access_key, signer = self._keys()
+        _nonce = self.nonces.next()
+        query = urlencode(params)
+        query += "&nonce={}".format(_nonce)
+        query += "&key={}".format(access_key)
+        query = query.strip('&')
 
-    def signedRequest(self, method="POST", path='', params={}):
+        mac = signer.copy()
+        mac.update(query.encode('utf-8'))
+        query += "&signature={}".format(mac.hexdigest())
+        log.debug("signed %s", query)
+        return query.encode('utf-8')
+
+    def signedRequest(self, method="POST", path='', params={}, priority=rateLimit.PRIORITY_NORMAL,
+                      lazy=False):
         """
         nonce 可以理解为一个递增的整数：http://zh.wikipedia.org/wiki/Nonce
         key 是申请到的公钥
@@ -65,40 +320,28 @@ class Client_Coolcoin():
         :param method:
         :param path:
         :param params:
+        :param priority: 限速时的优先级
+        :param lazy: True时较大的响应不解码，返回jsonCodec.Raw；使用orjson时总是完整解码，见jsonCodec.lazy_loads
         :return:
         """
-        _nonce = int(time.time() * 1000)
-        query = urlencode(params)
-        query += "&nonce={}".format(_nonce)
-        query += "&key={}".format(self._public_key)
+        url = self.endpoint + path
 
-        query = query.strip('&')
-        print(query)
-        # md5(私钥)
-        def _getHash(s):
-            m = hashlib.md5()
-            m.update(s)
-            return m.hexdigest()
-        secret = bytes(self._private_key.encode("utf-8"))
-        md5 = _getHash(secret)
-        #print(type(md5))
-        msg = query.encode('utf-8')
-        key = md5.encode('utf-8')
-
-        signature = hmac.new(key, msg,
-                             digestmod=hashlib.sha256).hexdigest()
-        #print(signature, '\n')
-
-        params['nonce'] = _nonce
-        params['key'] = self._public_key
-        params['signature'] = signature
-        path = ENDPOINT + path
-        print(params, '\n',path)
-        response = requests.request(method, path, data=params)
-        data = json.loads(response.content)
+        def _send():
+            with self.nonces.ordered():
+                body = self._sign(params)
+                return self.ssion.request(method, url, data=body, headers=FORM_HEADERS)
 
-        return data
-    def get_depth(self, coinPairs, **kwargs):
+        def _attempt():
+            for attempt in range(NONCE_RETRIES + 1):
+                if self.limiter is not None:
+                    self.limiter.acquire(rateLimit.PRIVATE, priority)
+                data = self._send(path, _send, _decode_lazy if lazy else _decode)
+                if not is_nonce_error(data):
+                    break
+                log.debug("nonce rejected, retry %s: %s", attempt + 1, data)
+            return data
+        return self.retry.call(_attempt, idempotent=False)
+    def get_depth(self, coinPairs, as_array=False, **kwargs):
         """
         Path：/api/v1/depth/
 
@@ -107,62 +350,59 @@ class Client_Coolcoin():
         asks - 委买单[价格, 委单量]，价格从高到低排序
         bids - 委卖单[价格, 委单量]，价格从高到低排序
         :param coinPairs: 
+        :param as_array: True时bids/asks为(n, 2)的numpy float64数组，见depthArray
         :param kwargs: 
         :return: 
+        :raises errors.ExchangeError: 获取失败
         """
-        coin, orderType = coinPairs.split('_')
+        coin = self.compatible(coinPairs)
+        if as_array:
+            # numpy只在需要时import
+            import depthArray
+            depthArray.require_numpy()
 
-        #coin = self.compatible(coin)
-        try:
-            params = {
-                "coin": coin,
-                }
-            params.update(kwargs)
-            data = self.http_request("GET", "/api/v1/depth/", params)
-            #print(data)
-            bids = []
-            asks = []
-            #isFrozen = []
-            for i in data['bids']:
-                bids.append([float(i[0]), float(i[1])])
-            for i in data['asks']:
-                asks.append([float(i[0]), float(i[1])])
-            depth = {'bids': bids, 'asks': asks}
-            return depth
-        except Exception as e:
-            time.sleep(0.1)
-            print(e)
+        params = {
+            "coin": coin,
+            }
+        params.update(kwargs)
+        data = self.http_request("GET", "/api/v1/depth/", params)
+        #print(data)
+        code = error_code(data)
+        if code is not None:
+            raise errors.APIError(VENUE, "/api/v1/depth/", _codeErro(code), code=code)
+        if as_array:
+            return self._process("/api/v1/depth/", depthArray.parse_depth, data)
+        return self._process("/api/v1/depth/", parse_depth, data)
+
+    def get_book(self, coinPairs, book=None, **kwargs):
+        """
+        获取深度快照并更新到本地OrderBook
+        :param coinPairs:
+        :param book: 已有的OrderBook，为None时新建
+        :return: OrderBook
+        :raises errors.ExchangeError: 获取失败，传入的book不变
+        """
+        depth = self.get_depth(coinPairs, **kwargs)
+        if book is None:
+            return OrderBook.from_depth(depth)
+        book.apply_snapshot(depth)
+        return book
 
     def balance(self):
         """
         Used to retrieve all balances from your account
+        :return: 统一格式的balance
+        :raises errors.ExchangeError: 请求失败或交易所返回错误
         """
-        try:
-            params = {
-            }
-            path = "/api/v1/balance/"
-            data = self.signedRequest("POST", path, params=params)
-            data = data['data']
-            # print(data)
-            # 本站返回balance无usd，cny
-            balance = {'asset': {'total': 0, 'net': 0},
-                       'trade': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0},
-                       'frozen': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0}}
-
-            # 获取键值
-            balance_trade_keys= balance['trade'].keys()
-            balance_frozen_keys = balance['frozen'].keys()
-
-            data['usd_balance'] = data['usd_lock'] = 0
-            data['cny_balance'] = data['usd_lock'] = 0
-            for i in balance_trade_keys:
-                balance['trade'][i] = data[i+'_balance']
-            for i in balance_frozen_keys:
-                balance['frozen'][i] = data[i+'_lock']
-                #print(balance)
-                return balance
-        except Exception as e:
-            return e
+        params = {
+        }
+        path = "/api/v1/balance/"
+        data = self.signedRequest("POST", path, params=params, priority=rateLimit.PRIORITY_LOW)
+        # print(data)
+        code = error_code(data)
+        if code is not None:
+            raise errors.APIError(VENUE, path, _codeErro(code), code=code)
+        return self._process(path, parse_balance, data)
 
     def trade(self, trade_type, amount, price, coin, test=False):
         """
@@ -189,42 +429,46 @@ class Client_Coolcoin():
         :param test:
         :return:
         """
-        #symbol = self.compatible(symbol)
-        coin = coin.split('_')[0]
+        data = self._trade(trade_type, amount, price, coin)
+        if not data['code']:
+            return data
+        else:
+            return data['code']
+
+    def _trade(self, trade_type, amount, price, coin, test=False):
+        """
+        :return: /api/v1/trade_add/的完整响应
+        :raises errors.ValidationError: 参数不符合交易对的限制，请求没有发出
+        """
+        market = self.markets.get(coin).validate(amount, price)
         side, type = trade_type.split('_')
+        amount, price = market.format(amount, price)
 
         params = {
             'amount': amount,
             'price': price,
             'type': side,
-            'coin': coin,
+            'coin': market.native,
         }
         #print(params)
         path = "/api/v1/trade_add/"
-        data = self.signedRequest("POST", path, params)
-        def _codeErro(code):
-            switcher = {
-                '100': '必选参数不能为空',
-                '101': '非法参数',
-                '102': '请求的虚拟币不存在',
-                '103': '密钥不存在',
-                '104': '签名不匹配',
-                '105': '权限不足',
-                '106': '请求过期(nonce错误)',
-                '200': '余额不足',
-                '201': '买卖的数量小于最小买卖额度',
-                '202': '下单价格必须在0 - 1000000之间',
-                '203': '订单不存在',
-                '204': '挂单金额必须在 0.001BTC 以上',
-                '205': '限制挂单价格',
-                '206': '小数位错误',
+        return self.signedRequest("POST", path, params)
 
-            }
-            return switcher.get(code, "None")
-        if not data['code']:
-            return data
-        else:
-            return data['code']
+    def place_orders(self, orders, concurrency=5, deadline=None):
+        """
+        并发下单，请求仍按nonce顺序发出，一个订单失败不影响其他订单
+        :param orders: [(trade_type, amount, price, coin), ...]，或者trade()参数名组成的dict的list
+        :param concurrency: 最大并发数，即同时使用的keep-alive连接数
+        :param deadline: 整批的最长等待秒数，None为不限制
+        :return: {'placed': [序号], 'failed': [序号], 'unknown': [序号], 'elapsed': 秒,
+                  'results': 与orders顺序一致的[{'order', 'id', 'error', 'response'}]}，
+                 unknown的订单可能已经挂单，需要用openOrders对账，不能重新下单
+        """
+        def _place(order):
+            args, kwargs = batch.order_args(order)
+            return self._trade(*args, **kwargs)
+        return batch.place_orders(_place, orders, describe_order,
+                                  concurrency=concurrency, deadline=deadline)
 
     def cancel(self, orderID, coin, **kwargs):
         """
@@ -237,7 +481,7 @@ class Client_Coolcoin():
         :return:
         """
 
-        coin = coin.split('_')[0]
+        coin = self.compatible(coin)
 
         params = {
             'id': int(orderID),
@@ -245,10 +489,10 @@ class Client_Coolcoin():
         }
         #print(params)
         path = "/api/v1/trade_cancel/"
-        data = self.signedRequest("POST", path, params)
+        data = self.signedRequest("POST", path, params, priority=rateLimit.PRIORITY_HIGH)
         return data
 
-    def openOrders(self, coin, **kwargs):
+    def openOrders(self, coin, lazy=False, **kwargs):
         """
                 您指定时间后的挂单，可以根据类型查询，比如查看正在挂单和全部挂单
         Path：/api/v1/trade_list/
@@ -269,10 +513,12 @@ class Client_Coolcoin():
         amount_original - 下单时数量
         amount_outstanding - 当前剩余数量
         :param symbol:
+        :param lazy: True时返回逐个解码订单的iterator，price等小数为Decimal(使用orjson时为float)，
+                     见jsonCodec.lazy_loads
         :param kwargs:
         :return:
         """
-        coin = coin.split('_')[0]
+        coin = self.compatible(coin)
 
         params = {
             'coin': coin,
@@ -281,42 +527,56 @@ class Client_Coolcoin():
         #print(params)
         orderId = None
         path = "/api/v1/trade_list/"
-        data = self.signedRequest("POST", path, params)
+        data = self.signedRequest("POST", path, params, priority=rateLimit.PRIORITY_LOW, lazy=lazy)
+        if lazy:
+            if error_code(data):
+                return data
+            return jsonCodec.iter_array(data, 'data')
         data = data['data']
         if data:
             return data
         else:
             return None
 
-    def cancel_all(self, order_id_list=None, coin ='ETH_BTC'):
+    def open_orders(self, coin):
+        """
+        :param coin: 交易对，例如eth_btc
+        :return: parse_open_order格式的挂单list
+        :raises errors.APIError: 交易所返回错误
         """
+        orders = self.openOrders(coin, lazy=True)
+        if isinstance(orders, dict):
+            code = error_code(orders)
+            raise errors.APIError(VENUE, "/api/v1/trade_list/", _codeErro(code), code=code)
+        return [parse_open_order(i) for i in orders if isinstance(i, dict)]
 
-        :param order_id_list:
-        :param currencyPair:
-        :return:
+    def cancel_all(self, order_id_list=None, coin ='ETH_BTC', concurrency=5, deadline=None):
+        """
+        并发撤单
+        :param order_id_list: 要撤的订单ID，为空时撤销coin的全部挂单
+        :param coin:
+        :param concurrency: 最大并发数
+        :param deadline: 整批的最长等待秒数，None为不限制
+        :return: {'cancelled': [id], 'gone': [id], 'failed': [id], 'unknown': [id], 'results': {id: 响应},
+                  'elapsed': 秒}，unknown为deadline时仍在执行、结果未知的撤单，见batch.UNKNOWN
+        :raises errors.APIError: order_id_list为空且获取挂单失败，没有撤任何单
         """
         coin = self.compatible(coin)
 
-        if order_id_list:
-            for i in order_id_list:
-                try:
-                    result = self.cancel(orderID=i, coin=coin)
-                    print(result)
-                except:
-                    continue
-        else:
-            order_id_list=[]
-            openOrders = self.openOrders(coin)
-            for i in openOrders:
+        if not order_id_list:
+            order_id_list = []
+            orders = self.openOrders(coin, lazy=True)
+            if isinstance(orders, dict):
+                code = error_code(orders)
+                raise errors.APIError(VENUE, "/api/v1/trade_list/", _codeErro(code), code=code)
+            for i in orders:
                 if type(i) == type({}):
                     order_id_list.append(i['id'])
-                    #print(order_id_list)
-            for i in order_id_list:
-                try:
-                    result = self.cancel(orderID=i, coin=coin)
-                    print(result)
-                except Exception as e:
-                    print(e)
+
+        def _cancel(orderID):
+            return self.cancel(orderID=orderID, coin=coin)
+        return batch.cancel_orders(_cancel, order_id_list, classify_cancel,
+                                   concurrency=concurrency, deadline=deadline)
 
 
 def main():
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+API key的来源，client在第一次调用private接口时才获取，只查询public接口时不需要key
+
+provider() -> (access_key, secret_key)，第一次调用后缓存：
+
+    from_env('USD_1')           环境变量EXCHANGE_USD_1_ACCESS_KEY/EXCHANGE_USD_1_SECRET_KEY
+    from_file(path, 'USD_1')    json文件{"USD_1": {"ACCESS_KEY": ..., "SECRET_KEY": ...}}
+    from_config('USD_1')        accountConfig.POLONIEX['USD_1']
+    from_callable(fn)           fn() -> (access_key, secret_key)，例如从密钥管理服务获取
+    default('USD_1')            依次尝试环境变量和accountConfig
+
+    client = Client_Poloniex(credentials=from_env('USD_1'))
+"""
+
+import json
+import os
+import threading
+
+ENV_PREFIX = 'EXCHANGE_'
+
+
+class CredentialsError(Exception):
+    pass
+
+
+class Provider():
+    """
+    :param load: load() -> (access_key, secret_key)，找不到时返回None或抛出CredentialsError
+    :param name: 用于错误信息，不包含key本身
+    """
+    def __init__(self, load, name):
+        self._load = load
+        self.name = name
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        keys = self._keys
+        if keys is None:
+            with self._lock:
+                if self._keys is None:
+                    keys = self._load()
+                    if keys is None or keys[0] is None or keys[1] is None:
+                        raise CredentialsError("no credentials from {}".format(self.name))
+                    self._keys = (keys[0], keys[1])
+                keys = self._keys
+        return keys
+
+    def __repr__(self):
+        return "Provider({})".format(self.name)
+
+
+def static(access_key, secret_key):
+    return Provider(lambda: (access_key, secret_key), 'arguments')
+
+def from_env(key_index, prefix=ENV_PREFIX):
+    """
+    :param key_index: 例如USD_1，对应{prefix}USD_1_ACCESS_KEY和{prefix}USD_1_SECRET_KEY
+    """
+    name = '{}{}_'.format(prefix, key_index.upper())
+    return Provider(lambda: (os.environ.get(name + 'ACCESS_KEY'), os.environ.get(name + 'SECRET_KEY')),
+                    'env {}*'.format(name))
+
+def from_file(path, key_index):
+    """
+    :param path: json文件，格式与accountConfig.POLONIEX相同
+    """
+    def _load():
+        try:
+            with open(path) as f:
+                entry = json.load(f).get(key_index)
+        except (OSError, ValueError) as e:
+            raise CredentialsError("cannot read {}: {}".format(path, e))
+        if entry is None:
+            return None
+        return entry.get('ACCESS_KEY'), entry.get('SECRET_KEY')
+    return Provider(_load, 'file {} [{}]'.format(path, key_index))
+
+def from_config(key_index, section='POLONIEX'):
+    """
+    :param section: accountConfig中的dict名
+    """
+    def _load():
+        try:
+            import accountConfig
+        except ImportError:
+            raise CredentialsError("accountConfig is not importable")
+        entry = getattr(accountConfig, section, {}).get(key_index)
+        if entry is None:
+            return None
+        return entry['ACCESS_KEY'], entry['SECRET_KEY']
+    return Provider(_load, 'accountConfig.{}[{}]'.format(section, key_index))
+
+def from_callable(fn):
+    return Provider(fn, getattr(fn, '__name__', repr(fn)))
+
+def chain(*providers):
+    """
+    :return: 依次尝试providers，使用第一个找到的
+    """
+    def _load():
+        for provider in providers:
+            try:
+                return provider()
+            except CredentialsError:
+                continue
+        return None
+    return Provider(_load, ' / '.join(p.name for p in providers))
+
+def default(key_index):
+    """
+    poloniex_service()/coolcoin_service()使用的来源：环境变量优先，其次accountConfig
+    """
+    return chain(from_env(key_index), from_config(key_index))
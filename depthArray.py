@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+基于numpy的深度表示
+
+每一侧是一个(n, 2)的float64数组，第0列为价格，第1列为数量，
+顺序与get_depth相同(最优价在前)。prices()/sizes()返回的是视图，不复制数据。
+
+多个市场的深度(poloniex currencyPair=all)放在一个(m, levels, 2)数组中，见BulkDepth，
+不足levels档的部分价格和数量为0；*_many函数对所有市场一次计算，每个市场一个结果。
+"""
+
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def require_numpy():
+    if np is None:
+        raise ImportError("as_array=True requires numpy")
+
+def to_array(levels):
+    """
+    把[[price, qty], ...](价格可以是字符串)直接转换成(n, 2) float64数组
+    """
+    require_numpy()
+    if not len(levels):
+        return np.empty((0, 2), dtype=np.float64)
+    return np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+
+def parse_depth(data):
+    """
+    从解码后的json响应生成depth，不经过中间的list
+    :return: {'bids': ndarray, 'asks': ndarray}，poloniex的响应同时保留'seq'
+    """
+    depth = {'bids': to_array(data['bids']), 'asks': to_array(data['asks'])}
+    if 'seq' in data:
+        depth['seq'] = data['seq']
+    return depth
+
+def prices(side):
+    return side[:, 0]
+
+def sizes(side):
+    return side[:, 1]
+
+def cumulative(side):
+    """
+    :return: 从最优价开始的累计数量
+    """
+    return np.cumsum(side[:, 1])
+
+def fill(side, size):
+    """
+    按最优价开始吃单，每一档成交的数量
+    :param size: 总成交数量
+    :return: 与side行数相同的数组
+    """
+    qty = side[:, 1]
+    before = np.cumsum(qty) - qty
+    return np.clip(size - before, 0, qty)
+
+def vwap(side, size):
+    """
+    成交size数量的成交均价
+    :return: 深度不足以成交size时为nan
+    """
+    filled = fill(side, size)
+    total = filled.sum()
+    if total <= 0 or total < size * (1 - 1e-12):
+        return np.nan
+    return float(np.dot(filled, side[:, 0]) / total)
+
+def mid(depth):
+    bids, asks = depth['bids'], depth['asks']
+    if not len(bids) or not len(asks):
+        return np.nan
+    return float((bids[0, 0] + asks[0, 0]) / 2)
+
+def spread(depth):
+    bids, asks = depth['bids'], depth['asks']
+    if not len(bids) or not len(asks):
+        return np.nan
+    return float(asks[0, 0] - bids[0, 0])
+
+def slippage(side, size):
+    """
+    成交size数量的均价相对于最优价的偏离比例
+    """
+    if not len(side):
+        return np.nan
+    best = side[0, 0]
+    return float(abs(vwap(side, size) - best) / best)
+
+def proceeds(side, size):
+    """
+    按最优价开始卖出(吃bids)或买入(吃asks)size数量的成交金额
+    :return: 深度不足时只计算能成交的部分
+    """
+    return float(np.dot(fill(side, size), side[:, 0]))
+
+def spend(side, notional):
+    """
+    用notional金额从最优价开始吃单，可以得到的数量，例如用usd在USDT_BTC的asks买btc
+    :return: 深度不足时只计算能成交的部分
+    """
+    amounts = side[:, 0] * side[:, 1]
+    before = np.cumsum(amounts) - amounts
+    return float(np.sum(np.clip(notional - before, 0, amounts) / side[:, 0]))
+
+
+# ---- 多个市场 ----
+
+class BulkDepth(namedtuple('BulkDepth', 'markets index bids asks nbids nasks seq frozen')):
+    """
+    多个市场的深度，第0维为市场
+    :param markets: 交易所的交易对名字tuple
+    :param index: {交易对名字: 行号}
+    :param bids: (m, levels, 2) float64，不足levels档的部分为0
+    :param asks: (m, levels, 2) float64
+    :param nbids: 每个市场bids的档位数
+    :param nasks: 每个市场asks的档位数
+    :param seq: 每个市场的seq，没有时为0
+    :param frozen: 每个市场是否暂停交易
+    """
+    __slots__ = ()
+
+    def depth(self, market):
+        """
+        :return: parse_depth格式的一个市场的深度，bids/asks为视图
+        """
+        i = self.index[market]
+        return {'bids': self.bids[i, :self.nbids[i]], 'asks': self.asks[i, :self.nasks[i]],
+                'seq': int(self.seq[i])}
+
+    def rows(self, markets):
+        """
+        :return: markets对应的行号数组，不存在的市场为-1
+        """
+        return np.fromiter((self.index.get(m, -1) for m in markets), dtype=np.intp, count=len(markets))
+
+    def __len__(self):
+        return len(self.markets)
+
+def _pack(books, key, levels):
+    # 所有市场的一侧先拼成一个list统一转换，再按行号和档位写入(m, levels, 2)
+    counts = np.fromiter((len(book[key]) for book in books), dtype=np.intp, count=len(books))
+    side = np.zeros((len(books), levels, 2), dtype=np.float64)
+    if counts.sum():
+        flat = [level[:2] for book in books for level in book[key]]
+        values = np.asarray(flat, dtype=np.float64).reshape(-1, 2)
+        rows = np.repeat(np.arange(len(books)), counts)
+        cols = np.arange(len(values)) - np.repeat(np.cumsum(counts) - counts, counts)
+        side[rows, cols] = values
+    return side, counts
+
+def stack(depths, markets=None):
+    """
+    把多个depth(list或数组格式)合并成BulkDepth
+    :param depths: depth list，或者{market: depth}
+    :param markets: depths为list时的市场名字，默认为序号
+    """
+    require_numpy()
+    if isinstance(depths, dict):
+        markets, depths = list(depths), list(depths.values())
+    markets = tuple(range(len(depths)) if markets is None else markets)
+    levels = max([1] + [max(len(d['bids']), len(d['asks'])) for d in depths])
+    bids, nbids = _pack(depths, 'bids', levels)
+    asks, nasks = _pack(depths, 'asks', levels)
+    seq = np.fromiter((int(d.get('seq') or 0) for d in depths), dtype=np.int64, count=len(depths))
+    frozen = np.fromiter((str(d.get('isFrozen', '0')) != '0' for d in depths), dtype=bool, count=len(depths))
+    return BulkDepth(markets, {m: i for i, m in enumerate(markets)}, bids, asks, nbids, nasks, seq, frozen)
+
+def parse_all_depth(data):
+    """
+    从poloniex currencyPair=all的响应生成BulkDepth，价格字符串在一次asarray中转换
+    :param data: 解码后的json响应，{market: {'bids', 'asks', 'seq', 'isFrozen'}}
+    """
+    return stack({market: book for market, book in data.items() if isinstance(book, dict)})
+
+def best(sides):
+    """
+    :param sides: (m, levels, 2)
+    :return: 每个市场的最优价，没有深度时为nan
+    """
+    top = sides[:, 0, 0]
+    return np.where(sides[:, 0, 1] > 0, top, np.nan)
+
+def _complete(filled, wanted, result):
+    # 深度不足以成交全部数量时为nan
+    return np.where(filled >= wanted * (1 - 1e-12), result, np.nan)
+
+def proceeds_many(sides, amounts):
+    """
+    每个市场从最优价开始成交amounts数量的金额：吃bids为卖出所得，吃asks为买入成本
+    :param sides: (m, levels, 2)
+    :param amounts: 每个市场的数量，或者所有市场相同的数量
+    :return: (m,)，深度不足时为nan
+    """
+    amounts = np.broadcast_to(np.asarray(amounts, dtype=np.float64), sides.shape[:1])
+    qty = sides[:, :, 1]
+    before = np.cumsum(qty, axis=1) - qty
+    filled = np.clip(amounts[:, None] - before, 0, qty)
+    return _complete(filled.sum(axis=1), amounts, np.einsum('ij,ij->i', filled, sides[:, :, 0]))
+
+def spend_many(sides, notionals):
+    """
+    每个市场用notionals金额从最优价开始吃asks，可以得到的数量
+    :return: (m,)，深度不足时为nan
+    """
+    notionals = np.broadcast_to(np.asarray(notionals, dtype=np.float64), sides.shape[:1])
+    price = sides[:, :, 0]
+    amounts = price * sides[:, :, 1]
+    before = np.cumsum(amounts, axis=1) - amounts
+    filled = np.clip(notionals[:, None] - before, 0, amounts)
+    # 补齐的档位价格为0，filled也为0
+    received = np.divide(filled, price, out=np.zeros_like(filled), where=price > 0).sum(axis=1)
+    return _complete(filled.sum(axis=1), notionals, received)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+后台深度轮询
+
+DepthPoller在后台线程中按固定间隔调用各client的get_depth，每次结果发布为一个新的Snapshot。
+Snapshot发布后不再修改，发布只是替换dict中的引用，读取不加锁也不发请求。
+
+    poller = DepthPoller({'poloniex': poloniex, 'coolcoin': coolcoin},
+                         {'poloniex': ['usd_btc'], 'coolcoin': ['eth_btc']}, interval=0.5)
+    poller.start()
+    poller.depth('poloniex', 'usd_btc', max_age=2.0)
+    poller.stats()
+
+统计：
+    age         读取时距离收到响应的秒数(staleness)
+    latency     get_depth的耗时
+    lag         收到响应的时间比计划刷新时间晚了多少秒，即按interval应有的数据与实际数据之差
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import instrument
+
+log = logging.getLogger(__name__)
+
+# lag和latency直方图的上界(秒)
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 上一次刷新还没完成时，再次检查的间隔秒数
+POLL_BUSY = 0.005
+
+
+class StaleError(Exception):
+    pass
+
+
+class Snapshot(namedtuple('Snapshot', 'depth ts seq latency lag')):
+    """
+    一次get_depth的结果，发布后不再修改
+    :param depth: get_depth的返回值
+    :param ts: 收到响应的时间戳(time.time())
+    :param seq: 这个交易对的第几次刷新，从1开始
+    :param latency: get_depth耗时秒数
+    :param lag: 收到响应比计划刷新时间晚的秒数
+    """
+    __slots__ = ()
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.ts
+
+
+class _Stats():
+    def __init__(self):
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error = None
+        self.latency = instrument.Histogram(BUCKETS)
+        self.lag = instrument.Histogram(BUCKETS)
+        self.lag_max = 0.0
+
+
+class DepthPoller():
+    """
+    :param clients: {venue: client}
+    :param pairs: {venue: [交易对]}，或者所有交易所共用的[交易对]
+    :param interval: 默认刷新间隔秒数
+    :param intervals: {(venue, pair): 秒}，单独设置某个交易对的刷新间隔
+    :param max_workers: 同时进行的get_depth数，默认每个交易对一个
+    :param on_update: on_update(venue, pair, snapshot)，在轮询线程中调用，需要很快返回
+    :param kwargs: 传给get_depth的参数，例如as_array=True
+    """
+    def __init__(self, clients, pairs, interval=1.0, intervals=None, max_workers=None, on_update=None,
+                 **kwargs):
+        self.clients = dict(clients)
+        if not isinstance(pairs, dict):
+            pairs = {venue: pairs for venue in self.clients}
+        self.keys = [(venue, pair) for venue in self.clients for pair in pairs.get(venue, ())]
+        self.interval = interval
+        self.intervals = dict(intervals or {})
+        self.on_update = on_update
+        self.kwargs = kwargs
+        # (venue, pair) -> Snapshot；只替换不修改，读取不加锁
+        self._snapshots = {}
+        self._stats = {key: _Stats() for key in self.keys}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.keys)))
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _interval(self, key):
+        return self.intervals.get(key, self.interval)
+
+    # ---- 读取 ----
+
+    def snapshot(self, venue, pair):
+        """
+        :return: 最新的Snapshot，还没有成功刷新过时为None
+        """
+        return self._snapshots.get((venue, pair))
+
+    def depth(self, venue, pair, max_age=None):
+        """
+        :param max_age: 最大允许的秒数，None为不检查
+        :return: 最新的depth
+        :raises StaleError: 还没有数据，或者数据比max_age旧
+        """
+        snapshot = self._snapshots.get((venue, pair))
+        if snapshot is None:
+            raise StaleError("no depth for {} {}".format(venue, pair))
+        if max_age is not None and snapshot.age() > max_age:
+            raise StaleError("depth for {} {} is {:.3f}s old".format(venue, pair, snapshot.age()))
+        return snapshot.depth
+
+    def wait_ready(self, timeout=None):
+        """
+        等待所有交易对至少刷新一次
+        :return: 是否全部就绪
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            while len(self._snapshots) < len(self.keys):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._ready.wait(remaining)
+        return True
+
+    # ---- 刷新 ----
+
+    def refresh(self, venue, pair, due=None):
+        """
+        立即刷新一个交易对并发布
+        :param due: 计划刷新的时间戳，用于计算lag，默认为调用时
+        :return: Snapshot
+        :raises errors.ExchangeError: 获取失败，原来的Snapshot保持不变
+        """
+        key = (venue, pair)
+        stats = self._stats[key]
+        start = time.time()
+        try:
+            depth = self.clients[venue].get_depth(pair, **self.kwargs)
+        except Exception as e:
+            with self._lock:
+                stats.errors += 1
+                stats.last_error = repr(e)
+            raise
+        now = time.time()
+        with self._ready:
+            previous = self._snapshots.get(key)
+            snapshot = Snapshot(depth, now, (previous.seq if previous else 0) + 1, now - start,
+                                max(0.0, now - (start if due is None else due)))
+            self._snapshots[key] = snapshot
+            stats.refreshes += 1
+            stats.latency.observe(snapshot.latency)
+            stats.lag.observe(snapshot.lag)
+            stats.lag_max = max(stats.lag_max, snapshot.lag)
+            self._ready.notify_all()
+        if self.on_update is not None:
+            self.on_update(venue, pair, snapshot)
+        return snapshot
+
+    def _poll(self, key, due):
+        try:
+            self.refresh(key[0], key[1], due)
+        except Exception as e:
+            log.warning("depth %s %s failed: %r", key[0], key[1], e)
+
+    def _run(self):
+        # (检查时间, 计划刷新时间, key)；同一个交易对上一次刷新未完成时不会重复提交
+        now = time.time()
+        schedule = [(now, now, key) for key in self.keys]
+        heapq.heapify(schedule)
+        running = {}
+        while schedule and not self._stop.is_set():
+            at, due, key = schedule[0]
+            delay = at - time.time()
+            if delay > 0:
+                if self._stop.wait(delay):
+                    return
+                continue
+            heapq.heappop(schedule)
+            future = running.get(key)
+            if future is not None and not future.done():
+                # 比interval慢，等这次刷新完成，lag仍按原来的计划时间计算
+                heapq.heappush(schedule, (time.time() + POLL_BUSY, due, key))
+                continue
+            running[key] = self._executor.submit(self._poll, key, due)
+            # 固定频率：下一次按计划时间而不是完成时间排，已经落后时从现在开始
+            due = max(due + self._interval(key), time.time())
+            heapq.heappush(schedule, (due, due, key))
+
+    def start(self):
+        """
+        启动后台轮询线程
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """
+        :return: {(venue, pair): {'refreshes', 'errors', 'last_error', 'seq', 'age',
+                  'latency_p50', 'latency_p99', 'lag_p50', 'lag_p99', 'lag_max'}}，
+                 p50/p99为所在直方图bucket的上界
+        """
+        now = time.time()
+        result = {}
+        with self._lock:
+            for key, stats in self._stats.items():
+                snapshot = self._snapshots.get(key)
+                result[key] = {'refreshes': stats.refreshes, 'errors': stats.errors,
+                               'last_error': stats.last_error,
+                               'seq': snapshot.seq if snapshot else 0,
+                               'age': snapshot.age(now) if snapshot else None,
+                               'latency_p50': stats.latency.quantile(0.5),
+                               'latency_p99': stats.latency.quantile(0.99),
+                               'lag_p50': stats.lag.quantile(0.5),
+                               'lag_p99': stats.lag.quantile(0.99),
+                               'lag_max': stats.lag_max}
+        return result
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+深度录制和回放
+
+DepthRecorder把带时间戳的get_depth结果追加到定长的二进制文件中，
+DepthReader用np.memmap打开文件，可以按时间范围切片或逐条回放，不需要把整个文件读入内存。
+
+文件格式：64字节文件头(magic, version, levels)，之后每条记录为定长的numpy structured record：
+    ts        float64               时间戳(秒)
+    nbids     uint16                有效的bids档位数
+    nasks     uint16                有效的asks档位数
+    bids      float64[levels, 2]    [price, qty]，最优价在前，无效档位为nan
+    asks      float64[levels, 2]
+按行而不是按列存储：回放总是同时需要一条快照的ts、bids和asks，一次write追加一整条记录，
+写了一半时只有最后一条不完整；records['ts']是memmap上的跨步视图，between的二分查找只读取少量页。
+DepthRecorder追加打开时截掉不完整的最后一条记录，之后的记录仍然对齐。
+"""
+
+import os
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'DEPTHREC'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+HEADER_SIZE = 64
+
+def record_dtype(levels):
+    return np.dtype([
+        ('ts', '<f8'),
+        ('nbids', '<u2'),
+        ('nasks', '<u2'),
+        ('_pad', '<u4'),
+        ('bids', '<f8', (levels, 2)),
+        ('asks', '<f8', (levels, 2)),
+    ])
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, levels = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a depth recording".format(path))
+    return levels
+
+
+class DepthRecorder():
+    """
+    :param path: 录制文件，已存在时追加
+    :param levels: 每侧保存的档位数，超过的档位丢弃
+    """
+    def __init__(self, path, levels=25):
+        if np is None:
+            raise ImportError("DepthRecorder requires numpy")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size >= HEADER_SIZE:
+            levels = _read_header(path)
+            torn = (size - HEADER_SIZE) % record_dtype(levels).itemsize
+            if torn:
+                os.truncate(path, size - torn)
+        else:
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, levels).ljust(HEADER_SIZE, b'\0'))
+        self.path = path
+        self.levels = levels
+        self.dtype = record_dtype(levels)
+        self._record = np.zeros(1, dtype=self.dtype)
+        self._file = open(path, 'ab')
+
+    def append(self, depth, ts=None):
+        """
+        :param depth: get_depth返回的{'bids', 'asks'}，可以是list或as_array=True的数组
+        :param ts: 时间戳，默认为当前时间
+        """
+        rec = self._record[0]
+        rec['ts'] = time.time() if ts is None else ts
+        for side, count in (('bids', 'nbids'), ('asks', 'nasks')):
+            levels = np.asarray(depth[side], dtype=np.float64).reshape(-1, 2)[:self.levels]
+            n = len(levels)
+            rec[count] = n
+            rec[side][:n] = levels
+            rec[side][n:] = np.nan
+        self._file.write(self._record.tobytes())
+
+    def record(self, client, pair, **kwargs):
+        """
+        调用client.get_depth并录制结果
+        :return: depth
+        :raises errors.ExchangeError: 获取失败，不录制
+        """
+        depth = client.get_depth(pair, **kwargs)
+        self.append(depth)
+        return depth
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DepthReader():
+    """
+    :param path: DepthRecorder生成的文件
+    """
+    def __init__(self, path):
+        if np is None:
+            raise ImportError("DepthReader requires numpy")
+        self.path = path
+        self.levels = _read_header(path)
+        self.dtype = record_dtype(self.levels)
+        # 忽略写了一半的最后一条记录
+        count = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def ts(self):
+        return self.records['ts']
+
+    def between(self, start=None, end=None):
+        """
+        :return: 时间戳在[start, end)之间的记录，是memmap的视图
+        """
+        ts = self.records['ts']
+        lo = 0 if start is None else int(np.searchsorted(ts, start, 'left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, 'left'))
+        return self.records[lo:hi]
+
+    @staticmethod
+    def to_depth(rec):
+        """
+        把一条记录转换成get_depth(as_array=True)格式的{'bids', 'asks'}，数组为memmap的视图
+        """
+        return {'bids': rec['bids'][:rec['nbids']], 'asks': rec['asks'][:rec['nasks']]}
+
+    def replay(self, start=None, end=None):
+        """
+        逐条回放
+        :return: 生成(ts, depth)
+        """
+        for rec in self.between(start, end):
+            yield float(rec['ts']), self.to_depth(rec)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+client抛出的异常
+
+    ExchangeError               所有异常的基类
+    ├── NetworkError            连接失败、超时、连接被断开
+    ├── RateLimitError          HTTP 429
+    ├── ServerError             HTTP 5xx，或响应不是json
+    └── APIError                交易所返回的错误，例如交易对不存在
+        └── ValidationError     下单参数在本地检查不通过，见marketRegistry
+
+safe为True表示请求确定没有被交易所执行(例如连接没有建立)，private接口也可以重试。
+requests在转换它的异常时才import，见is_request_exception。
+"""
+
+
+class ExchangeError(Exception):
+    """
+    :param venue: 交易所
+    :param endpoint: 接口名
+    :param message: 错误描述
+    :param code: 交易所或HTTP的错误码
+    :param safe: 请求确定没有被执行
+    """
+    retryable = False
+
+    def __init__(self, venue, endpoint, message, code=None, safe=False):
+        Exception.__init__(self, "{} {}: {}".format(venue, endpoint, message))
+        self.venue = venue
+        self.endpoint = endpoint
+        self.message = message
+        self.code = code
+        self.safe = safe
+
+
+class NetworkError(ExchangeError):
+    retryable = True
+
+
+class RateLimitError(ExchangeError):
+    retryable = True
+
+    def __init__(self, venue, endpoint, message, code=429, retry_after=None):
+        ExchangeError.__init__(self, venue, endpoint, message, code, safe=True)
+        self.retry_after = retry_after
+
+
+class ServerError(ExchangeError):
+    retryable = True
+
+
+class APIError(ExchangeError):
+    pass
+
+
+class ValidationError(APIError):
+    """
+    下单参数在本地检查时不符合交易对的限制，请求没有发出
+    """
+    def __init__(self, venue, endpoint, message, code=None):
+        APIError.__init__(self, venue, endpoint, message, code, safe=True)
+
+
+TYPES = {cls.__name__: cls for cls in (ExchangeError, NetworkError, RateLimitError, ServerError, APIError,
+                                        ValidationError)}
+
+def to_dict(e):
+    """
+    :param e: ExchangeError
+    :return: 可json序列化的dict，例如通过gateway传给其他进程，见from_dict
+    """
+    return {'type': type(e).__name__, 'venue': e.venue, 'endpoint': e.endpoint, 'message': e.message,
+            'code': e.code, 'safe': e.safe, 'retry_after': getattr(e, 'retry_after', None)}
+
+def from_dict(data):
+    """
+    :return: to_dict的逆操作，类型、code和safe不变；未知类型为ExchangeError
+    """
+    cls = TYPES.get(data.get('type'), ExchangeError)
+    e = cls.__new__(cls)
+    ExchangeError.__init__(e, data.get('venue'), data.get('endpoint'), data.get('message'),
+                           code=data.get('code'), safe=bool(data.get('safe')))
+    if cls is RateLimitError:
+        e.retry_after = data.get('retry_after')
+    return e
+
+def check_status(status, venue, endpoint, headers=None):
+    """
+    HTTP状态码为429或5xx时抛出异常
+    :param status: HTTP状态码
+    :param headers: 响应头，用于读取Retry-After
+    """
+    if status == 429:
+        retry_after = (headers or {}).get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        raise RateLimitError(venue, endpoint, 'too many requests', retry_after=retry_after)
+    if status >= 500:
+        raise ServerError(venue, endpoint, 'http {}'.format(status), code=status)
+
+def is_request_exception(e):
+    """
+    :return: e是否为requests的异常；能收到这种异常时requests已经import过了
+    """
+    import requests
+    return isinstance(e, requests.RequestException)
+
+def from_request_exception(e, venue, endpoint):
+    """
+    把requests的异常转换成NetworkError
+    """
+    import requests
+    from urllib3.exceptions import NewConnectionError
+    # 连接没有建立时请求不可能被执行
+    reason = getattr(e.args[0], 'reason', None) if e.args else None
+    safe = isinstance(e, requests.exceptions.ConnectTimeout) or isinstance(reason, NewConnectionError)
+    return NetworkError(venue, endpoint, repr(e), safe=safe)
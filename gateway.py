@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+本地网关：一个进程持有交易所连接、签名、nonce和限速，多个策略进程通过Unix socket调用
+
+    # 网关进程
+    python gateway.py --poloniex USD_1 --coolcoin USD_2
+
+    # 策略进程
+    gw = gateway.GatewayClient()
+    poloniex = gw.client('poloniex')
+    poloniex.get_depth('usd_btc')
+    futures = [gw.submit('poloniex', 'cancel', i, 'usd_btc') for i in ids]
+
+协议：每帧为4字节长度(big endian) + json list，一帧中可以有多个请求或响应。
+    请求 {'id', 'client', 'method', 'args', 'kwargs'}
+    响应 {'id', 'result'} / {'id', 'returned': 异常描述} / {'id', 'error': 异常描述}
+         ExchangeError另外带有'exchange_error': errors.to_dict(e)，GatewayClient还原成同样的类型
+同一个连接上的请求并发执行，响应按完成顺序返回；等待发送的消息合并成一帧。
+一帧最长MAX_FRAME字节：收到更长的帧时关闭连接，超过长度的响应换成error响应。
+numpy数组以list返回。只能调用METHODS中的方法，credentials、signedRequest等不对外开放。
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+import errors
+import jsonCodec
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'exchange-gateway.sock')
+HEADER = struct.Struct('>I')
+# 一帧最多合并的消息数
+MAX_BATCH = 256
+# 一帧的最大字节数，不包括长度
+MAX_FRAME = 64 * 1024 * 1024
+# 可以通过socket调用的client方法
+METHODS = frozenset(['compatible', 'split_pair', 'get_depth', 'balance', 'trade', 'place_orders', 'cancel',
+                     'cancel_all', 'openOrders', 'open_orders'])
+
+
+class GatewayError(Exception):
+    pass
+
+
+def _default(obj):
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__iter__'):
+        # 例如openOrders(lazy=True)返回的iterator
+        return list(obj)
+    raise TypeError("{} is not json serializable".format(type(obj).__name__))
+
+def _encode(message):
+    return json.dumps(message, default=_default, separators=(',', ':')).encode('utf-8')
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+class _Channel():
+    """
+    一个socket连接。send()的消息由写线程合并成一帧发送；读线程对收到的每个消息调用on_message
+    """
+    def __init__(self, sock, on_message, on_close=None):
+        self.sock = sock
+        self.on_message = on_message
+        self.on_close = on_close
+        self.frames_sent = 0
+        self.frames_received = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def send(self, message):
+        """
+        :param message: 可json序列化的dict
+        :raises ValueError: 编码后超过MAX_FRAME
+        """
+        payload = _encode(message)
+        if len(payload) + 2 > MAX_FRAME:
+            raise ValueError("message of {} bytes exceeds MAX_FRAME".format(len(payload)))
+        self._queue.put(payload)
+
+    def _write_loop(self):
+        carry = None                # 上一帧放不下的消息
+        while True:
+            payload = self._queue.get() if carry is None else carry
+            carry = None
+            if payload is None:
+                return
+            parts = [payload]
+            size = len(payload) + 2
+            while len(parts) < MAX_BATCH:
+                try:
+                    payload = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if payload is None:
+                    self._queue.put(None)
+                    break
+                if size + len(payload) + 1 > MAX_FRAME:
+                    carry = payload
+                    break
+                parts.append(payload)
+                size += len(payload) + 1
+            frame = b'[' + b','.join(parts) + b']'
+            try:
+                self.sock.sendall(HEADER.pack(len(frame)) + frame)
+            except OSError:
+                return
+            self.frames_sent += 1
+
+    def _read_loop(self):
+        try:
+            while True:
+                header = _recv_exact(self.sock, HEADER.size)
+                if header is None:
+                    break
+                length = HEADER.unpack(header)[0]
+                if length > MAX_FRAME:
+                    log.warning("frame of %d bytes exceeds MAX_FRAME, closing connection", length)
+                    break
+                body = _recv_exact(self.sock, length)
+                if body is None:
+                    break
+                self.frames_received += 1
+                for message in jsonCodec.loads(body):
+                    self.on_message(self, message)
+        except OSError:
+            pass
+        finally:
+            self.close()
+            if self.on_close is not None:
+                self.on_close(self)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class Gateway():
+    """
+    :param clients: {name: client}，例如{'poloniex': poloniex_service('USD_1')}
+    :param path: Unix socket路径，权限为0600
+    :param max_workers: 同时执行的请求数
+    """
+    def __init__(self, clients, path=DEFAULT_PATH, max_workers=32):
+        self.clients = dict(clients)
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._channels = set()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+        self.requests = 0
+        self.errors = 0
+        # 已关闭连接的帧数
+        self._frames = [0, 0]
+
+    def start(self):
+        """
+        在后台线程中接受连接
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old = os.umask(0o177)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old)
+        self._sock.listen(64)
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.start()
+        self._thread.join()
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        with self._lock:
+            channels = list(self._channels)
+        for channel in channels:
+            channel.close()
+        self._executor.shutdown(wait=False)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            channel = _Channel(conn, self._on_message, self._on_close)
+            with self._lock:
+                self._channels.add(channel)
+
+    def _on_close(self, channel):
+        with self._lock:
+            if channel in self._channels:
+                self._channels.discard(channel)
+                self._frames[0] += channel.frames_received
+                self._frames[1] += channel.frames_sent
+
+    def _on_message(self, channel, message):
+        with self._lock:
+            self.requests += 1
+        self._executor.submit(self._call, channel, message)
+
+    def _call(self, channel, message):
+        response = {'id': message.get('id')}
+        try:
+            client = self.clients.get(message.get('client'))
+            method = message.get('method') or ''
+            if client is None:
+                raise GatewayError("unknown client {!r}".format(message.get('client')))
+            if method not in METHODS or not callable(getattr(client, method, None)):
+                raise GatewayError("method {!r} is not available".format(method))
+            result = getattr(client, method)(*message.get('args', ()), **message.get('kwargs', {}))
+            if isinstance(result, Exception):
+                # 返回而不是抛出的异常
+                response['returned'] = repr(result)
+                if isinstance(result, errors.ExchangeError):
+                    response['exchange_error'] = errors.to_dict(result)
+            else:
+                response['result'] = result
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            response['error'] = repr(e)
+            if isinstance(e, errors.ExchangeError):
+                response['exchange_error'] = errors.to_dict(e)
+        try:
+            channel.send(response)
+        except (TypeError, ValueError) as e:
+            channel.send({'id': response['id'], 'error': repr(e)})
+
+    def stats(self):
+        """
+        :return: {'connections', 'requests', 'errors', 'frames_received', 'frames_sent'}
+        """
+        with self._lock:
+            channels = list(self._channels)
+            return {'connections': len(channels), 'requests': self.requests, 'errors': self.errors,
+                    'frames_received': self._frames[0] + sum(c.frames_received for c in channels),
+                    'frames_sent': self._frames[1] + sum(c.frames_sent for c in channels)}
+
+
+class GatewayClient():
+    """
+    连接到Gateway，线程安全，多个线程的请求在一个连接上并发
+    :param path: Gateway的Unix socket路径
+    :param timeout: call()等待响应的最长秒数
+    """
+    def __init__(self, path=DEFAULT_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        self._channel = _Channel(sock, self._on_message, self._on_close)
+
+    def _on_message(self, channel, message):
+        with self._lock:
+            future = self._pending.pop(message.get('id'), None)
+        if future is None:
+            return
+        if 'exchange_error' in message:
+            error = errors.from_dict(message['exchange_error'])
+        else:
+            error = GatewayError(message.get('error', message.get('returned')))
+        if 'error' in message:
+            future.set_exception(error)
+        elif 'returned' in message:
+            future.set_result(error)
+        else:
+            future.set_result(message.get('result'))
+
+    def _on_close(self, channel):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(GatewayError("connection to gateway closed"))
+
+    def submit(self, client, method, *args, **kwargs):
+        """
+        :param client: Gateway中的client名字
+        :param method: client的方法名
+        :return: concurrent.futures.Future
+        """
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if self._channel._closed:
+                raise GatewayError("connection to gateway closed")
+            self._pending[request_id] = future
+        self._channel.send({'id': request_id, 'client': client, 'method': method,
+                            'args': args, 'kwargs': kwargs})
+        return future
+
+    def call(self, client, method, *args, **kwargs):
+        """
+        :return: client.method(*args, **kwargs)的结果
+        :raises errors.ExchangeError: client抛出的异常，类型、code和safe不变
+        :raises GatewayError: 方法不在METHODS中、其他异常或连接断开
+        """
+        return self.submit(client, method, *args, **kwargs).result(self.timeout)
+
+    def client(self, name):
+        """
+        :return: 与client用法相同的代理对象
+        """
+        return RemoteClient(self, name)
+
+    def close(self):
+        self._channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RemoteClient():
+    """
+    Gateway中某个client的代理，方法调用转发到Gateway
+    """
+    def __init__(self, gateway, name):
+        self._gateway = gateway
+        self._name = name
+
+    def __getattr__(self, method):
+        if method not in METHODS:
+            raise AttributeError(method)
+        return functools.partial(self._gateway.call, self._name, method)
+
+
+def main():
+    import marketCache
+    import poloniexSDK
+    import coocoinSDK
+    import rateLimit
+
+    parser = argparse.ArgumentParser(description="local exchange gateway")
+    parser.add_argument('--path', default=DEFAULT_PATH, help='unix socket path')
+    parser.add_argument('--poloniex', metavar='KEY_INDEX', help='accountConfig.POLONIEX key index')
+    parser.add_argument('--coolcoin', metavar='KEY_INDEX', help='accountConfig.POLONIEX key index')
+    parser.add_argument('--rate', type=float, default=rateLimit.DEFAULT_RATE, help='requests per second per key')
+    parser.add_argument('--ttl', type=float, default=0.0,
+                        help='public cache ttl; 0 only merges identical concurrent requests')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # 所有策略进程共用一个缓存，同时到达的相同行情请求只发一次
+    cache = marketCache.TTLCache(ttl=args.ttl)
+    clients = {}
+    if args.poloniex:
+        clients['poloniex'] = poloniexSDK.poloniex_service(args.poloniex)
+    if args.coolcoin:
+        clients['coolcoin'] = coocoinSDK.coolcoin_service(args.coolcoin)
+    if not clients:
+        parser.error("at least one of --poloniex/--coolcoin is required")
+    for client in clients.values():
+        client.cache = cache
+        client.limiter = rateLimit.Scheduler(args.rate, args.rate)
+    log.info("gateway for %s listening on %s", ', '.join(clients), args.path)
+    Gateway(clients, args.path).serve_forever()
+
+if __name__ == '__main__':
+    main()
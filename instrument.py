@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+请求耗时统计
+
+client传入instrument=Registry()后，每个接口记录：
+    connect     建立连接(TCP+TLS)，复用连接时为0
+    wait        发出请求到收完响应，包括服务器处理、按nonce顺序排队和传输
+    decode      json解码
+    process     get_depth/balance中把响应转换成返回格式
+以及发送/接收的字节数和错误码次数。instrument为None时client不做任何统计。
+
+    registry = instrument.Registry()
+    client = Client_Poloniex(key, secret, instrument=registry)
+    registry.snapshot()     # 进程内读取
+    registry.expose()       # Prometheus text格式
+"""
+
+import bisect
+import threading
+import time
+import transport
+
+CONNECT = 'connect'
+WAIT = 'wait'
+DECODE = 'decode'
+PROCESS = 'process'
+PHASES = (CONNECT, WAIT, DECODE, PROCESS)
+
+# 直方图上界(秒)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    """
+    :param buckets: 递增的上界，最后隐含+Inf
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        :return: 第q分位数所在bucket的上界，没有数据时为None，落在+Inf时为最大上界
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry():
+    """
+    :param buckets: 直方图上界
+    :param prefix: expose()输出的指标名前缀
+    """
+    def __init__(self, buckets=BUCKETS, prefix='exchange_sdk'):
+        self.buckets = buckets
+        self.prefix = prefix
+        self._histograms = {}
+        self._bytes = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, phase, seconds):
+        with self._lock:
+            histogram = self._histograms.get((endpoint, phase))
+            if histogram is None:
+                histogram = self._histograms[(endpoint, phase)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def add_bytes(self, endpoint, sent, received):
+        with self._lock:
+            s, r = self._bytes.get(endpoint, (0, 0))
+            self._bytes[endpoint] = (s + sent, r + received)
+
+    def error(self, endpoint, code):
+        key = (endpoint, str(code))
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def request(self, endpoint, send, decode, error_code=None):
+        """
+        执行一次请求并记录connect/wait/decode耗时、字节数和错误
+        :param endpoint: 接口名
+        :param send: 发送请求，返回requests.Response
+        :param decode: 把Response解码成json
+        :param error_code: 从解码后的响应中取错误码，没有错误时返回None
+        :return: decode(response)
+        """
+        transport.pop_connect_time()
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception as e:
+            self.error(endpoint, type(e).__name__)
+            raise
+        received = time.perf_counter()
+        connect = transport.pop_connect_time()
+        self.observe(endpoint, CONNECT, connect)
+        self.observe(endpoint, WAIT, received - start - connect)
+        body = response.request.body
+        self.add_bytes(endpoint, len(body) if body else 0, len(response.content))
+        if response.status_code != 200:
+            self.error(endpoint, 'http_{}'.format(response.status_code))
+        try:
+            data = decode(response)
+        except Exception as e:
+            self.error(endpoint, type(e).__name__)
+            raise
+        finally:
+            self.observe(endpoint, DECODE, time.perf_counter() - received)
+        if error_code is not None:
+            code = error_code(data)
+            if code is not None:
+                self.error(endpoint, code)
+        return data
+
+    def process(self, endpoint, parse, data):
+        """
+        :return: parse(data)，并记录process耗时
+        """
+        start = time.perf_counter()
+        try:
+            return parse(data)
+        finally:
+            self.observe(endpoint, PROCESS, time.perf_counter() - start)
+
+    def quantile(self, endpoint, phase, q):
+        """
+        :return: endpoint的phase耗时的第q分位数，见Histogram.quantile
+        """
+        with self._lock:
+            histogram = self._histograms.get((endpoint, phase))
+            return histogram.quantile(q) if histogram is not None else None
+
+    def snapshot(self):
+        """
+        :return: {'latency': {endpoint: {phase: {'count', 'sum', 'p50', 'p99'}}},
+                  'bytes': {endpoint: {'sent', 'received'}},
+                  'errors': {endpoint: {code: count}}}
+        """
+        with self._lock:
+            latency = {}
+            for (endpoint, phase), h in self._histograms.items():
+                latency.setdefault(endpoint, {})[phase] = {
+                    'count': h.count, 'sum': h.sum, 'p50': h.quantile(0.5), 'p99': h.quantile(0.99)}
+            errors = {}
+            for (endpoint, code), count in self._errors.items():
+                errors.setdefault(endpoint, {})[code] = count
+            return {'latency': latency,
+                    'bytes': {endpoint: {'sent': s, 'received': r}
+                              for endpoint, (s, r) in self._bytes.items()},
+                    'errors': errors}
+
+    def expose(self):
+        """
+        :return: Prometheus text格式的全部指标
+        """
+        name = self.prefix + '_request_seconds'
+        lines = ['# TYPE {} histogram'.format(name)]
+        with self._lock:
+            for (endpoint, phase), h in sorted(self._histograms.items()):
+                labels = 'endpoint="{}",phase="{}"'.format(_label(endpoint), phase)
+                total = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    total += count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, total))
+                lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, h.count))
+                lines.append('{}_sum{{{}}} {}'.format(name, labels, h.sum))
+                lines.append('{}_count{{{}}} {}'.format(name, labels, h.count))
+
+            name = self.prefix + '_bytes_total'
+            lines.append('# TYPE {} counter'.format(name))
+            for endpoint, (sent, received) in sorted(self._bytes.items()):
+                for direction, value in (('sent', sent), ('received', received)):
+                    lines.append('{}{{endpoint="{}",direction="{}"}} {}'.format(
+                        name, _label(endpoint), direction, value))
+
+            name = self.prefix + '_errors_total'
+            lines.append('# TYPE {} counter'.format(name))
+            for (endpoint, code), count in sorted(self._errors.items()):
+                lines.append('{}{{endpoint="{}",code="{}"}} {}'.format(
+                    name, _label(endpoint), _label(code), count))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+紧急撤单：撤销一个账户在指定交易对上的全部挂单
+
+    python killSwitch.py poloniex                       # USD_1的全部挂单
+    python killSwitch.py coolcoin eth_btc etc_btc --key USD_2
+    python killSwitch.py poloniex usd_btc --file /etc/exchange/keys.json
+
+key默认依次从环境变量EXCHANGE_{KEY}_ACCESS_KEY/SECRET_KEY和accountConfig获取，见credentialProvider。
+启动时只import必要的模块，requests在第一次请求时才import，见benchmark.py startup。
+有撤单失败时退出码为1。
+"""
+
+import argparse
+import logging
+import sys
+import batch
+import credentialProvider
+
+log = logging.getLogger(__name__)
+
+# 默认的key名和交易对
+DEFAULTS = {'poloniex': ('USD_1', ['all']), 'coolcoin': ('USD_2', ['eth_btc'])}
+
+
+def make_client(venue, credentials):
+    """
+    :return: 只import venue对应的SDK
+    """
+    if venue == 'poloniex':
+        import poloniexSDK
+        return poloniexSDK.Client_Poloniex(credentials=credentials)
+    import coocoinSDK
+    return coocoinSDK.Client_Coolcoin(credentials=credentials)
+
+def credentials_for(args):
+    if args.file:
+        return credentialProvider.from_file(args.file, args.key)
+    if args.env:
+        return credentialProvider.from_env(args.key)
+    return credentialProvider.default(args.key)
+
+def kill(client, pairs, concurrency=10, deadline=None):
+    """
+    :return: {pair: client.cancel_all的返回值，或者获取挂单失败时的异常}
+    """
+    reports = {}
+    for pair in pairs:
+        try:
+            reports[pair] = client.cancel_all(None, pair, concurrency=concurrency, deadline=deadline)
+        except Exception as e:
+            log.error("cancel_all %s failed: %r", pair, e)
+            reports[pair] = e
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="cancel all open orders of one account")
+    parser.add_argument('venue', choices=sorted(DEFAULTS))
+    parser.add_argument('pairs', nargs='*', help='default: all for poloniex, eth_btc for coolcoin')
+    parser.add_argument('--key', help='key index, default USD_1 for poloniex and USD_2 for coolcoin')
+    parser.add_argument('--env', action='store_true', help='read keys only from environment variables')
+    parser.add_argument('--file', help='read keys from a json file in the accountConfig.POLONIEX format')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--deadline', type=float, default=None, help='seconds per pair')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    key, pairs = DEFAULTS[args.venue]
+    args.key = args.key or key
+    client = make_client(args.venue, credentials_for(args))
+    failed = 0
+    for pair, report in kill(client, args.pairs or pairs, args.concurrency, args.deadline).items():
+        if isinstance(report, Exception):
+            failed += 1
+            print("{} {}: error {!r}".format(args.venue, pair, report))
+            continue
+        # 结果未知的撤单需要人工确认
+        failed += len(report[batch.FAILED]) + len(report[batch.UNKNOWN])
+        print("{} {}: cancelled {} gone {} failed {} unknown {} in {:.3f}s".format(
+            args.venue, pair, len(report[batch.CANCELLED]), len(report[batch.GONE]),
+            len(report[batch.FAILED]), len(report[batch.UNKNOWN]), report['elapsed']))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+public行情接口的TTL缓存
+
+- 每个接口可以设置不同的TTL
+- 容量有限，按LRU淘汰
+- 同一个key的并发请求合并成一个HTTP请求
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Call():
+    """
+    正在进行中的请求，后来的调用者等待它的结果
+    """
+    def __init__(self):
+        self._done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache():
+    """
+    :param ttl: 默认TTL秒数
+    :param maxsize: 最多缓存的key数
+    :param ttls: {endpoint: ttl}，例如{'returnOrderBook': 0.2, '/api/v1/depth/': 0.5}；
+                 ttl为0时不缓存，但并发请求仍然合并
+    """
+    def __init__(self, ttl=0.5, maxsize=1024, ttls=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.ttls = dict(ttls or {})
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, endpoint, key, fetch):
+        """
+        :param endpoint: 接口名，用于选择TTL
+        :param key: 缓存key，需要可hash
+        :param fetch: 未命中时调用，返回要缓存的值
+        :return: 缓存的值或fetch()的结果
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.wait()
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.set(error=e)
+            raise
+        ttl = self.ttls.get(endpoint, self.ttl)
+        with self._lock:
+            self._inflight.pop(key, None)
+            if ttl > 0:
+                self._data[key] = (time.monotonic() + ttl, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        call.set(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        :return: {'hits', 'misses', 'coalesced', 'evictions', 'size'}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'evictions': self.evictions, 'size': len(self._data)}
+
+
+def request_key(base, method, path, params):
+    """
+    :return: 由请求生成的缓存key
+    """
+    return (base, method, path, tuple(sorted((params or {}).items())))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+交易对注册表：每个交易所一个，交易对第一次出现时解析一次，之后按传入的字符串直接查表
+
+    markets = registry('poloniex')
+    market = markets.get('usd_btc')       # 'usd_btc'/'USD_BTC'/'USDT_BTC'是同一个Market
+    market.id, market.native              # 0, 'USDT_BTC'
+    market.validate(0.1, 9000)            # 下单参数不符合时抛出errors.ValidationError
+    market.format(0.1 * 3, 9000)          # ('0.30000000', '9000.00000000')，按交易对的小数位发送
+
+命名规则：
+    poloniex    'usd_btc' -> 'USDT_BTC'，即currency_asset大写，USD换成USDT
+    coolcoin    'eth_btc' -> 'eth'，只用币种小写，所有交易对以btc计价
+
+validate的错误码与coolcoin一致：
+    201 数量小于最小买卖额度    202 价格超出范围    204 挂单金额小于最小值    206 小数位错误
+float的二进制误差(0.1 * 3 = 0.30000000000000004)不算小数位错误，下单时按小数位四舍五入，
+只有舍入后变化超过DECIMALS_TOLERANCE(相对值)或者舍入成0时才返回206。
+"""
+
+import threading
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+import errors
+
+# poloniex返回的币种名与balance中的币种名不同
+POLONIEX_NAMES = {'usdt': 'usd', 'bitcny': 'cny'}
+
+# 舍入到交易对小数位后允许的相对变化
+DECIMALS_TOLERANCE = Decimal('0.0001')
+
+LIMIT_NAMES = ('price_decimals', 'amount_decimals', 'min_amount', 'min_total', 'max_price')
+
+# 每个交易所的默认下单限制，可以用MarketRegistry.configure按交易对覆盖
+LIMITS = {
+    'poloniex': {'price_decimals': 8, 'amount_decimals': 8, 'min_amount': 0.0, 'min_total': 0.0001,
+                 'max_price': None},
+    'coolcoin': {'price_decimals': 8, 'amount_decimals': 8, 'min_amount': 0.0, 'min_total': 0.001,
+                 'max_price': 1000000},
+}
+
+
+def parse_poloniex(symbol):
+    """
+    :param symbol: 交易对，例如usd_btc
+    :return: (native, asset, currency)，例如('USDT_BTC', 'btc', 'usd')
+    """
+    parts = ['USDT' if i == 'USD' else i for i in symbol.upper().split('_')]
+    if len(parts) != 2:
+        raise ValueError("invalid poloniex pair {!r}".format(symbol))
+    currency, asset = (i.lower() for i in parts)
+    return '_'.join(parts), POLONIEX_NAMES.get(asset, asset), POLONIEX_NAMES.get(currency, currency)
+
+def parse_coolcoin(symbol):
+    """
+    :param symbol: 交易对或币种，例如eth_btc、ETH
+    :return: (native, asset, currency)，例如('eth', 'eth', 'btc')
+    """
+    coin = symbol.split('_')[0].lower()
+    if not coin:
+        raise ValueError("invalid coolcoin pair {!r}".format(symbol))
+    return ('usdt' if coin == 'usd' else coin), coin, 'btc'
+
+PARSERS = {'poloniex': parse_poloniex, 'coolcoin': parse_coolcoin}
+
+
+def _quantize(value, decimals):
+    """
+    :return: value按decimals位小数四舍五入后的Decimal，float按repr的最短表示转换
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(repr(value) if isinstance(value, float) else str(value))
+    return value.quantize(Decimal(1).scaleb(-decimals), rounding=ROUND_HALF_EVEN)
+
+def _decimals_ok(value, decimals):
+    """
+    :return: 舍入到decimals位小数后value没有明显变化
+    """
+    try:
+        if not isinstance(value, Decimal):
+            value = Decimal(repr(value) if isinstance(value, float) else str(value))
+        rounded = _quantize(value, decimals)
+    except InvalidOperation:
+        return False
+    if value == rounded:
+        return True
+    return rounded != 0 and abs(value - rounded) <= abs(value) * DECIMALS_TOLERANCE
+
+
+class Market():
+    """
+    一个交易对
+    :param id: 在所属MarketRegistry中的序号，从0开始
+    :param native: 交易所的交易对名字
+    :param asset: 买入的币种，balance中的名字
+    :param currency: 支付的币种，balance中的名字
+    """
+    __slots__ = ('id', 'venue', 'native', 'asset', 'currency', 'price_decimals', 'amount_decimals',
+                 'min_amount', 'min_total', 'max_price')
+
+    def __init__(self, id, venue, native, asset, currency, price_decimals=8, amount_decimals=8,
+                 min_amount=0.0, min_total=0.0, max_price=None):
+        self.id = id
+        self.venue = venue
+        self.native = native
+        self.asset = asset
+        self.currency = currency
+        self.price_decimals = price_decimals
+        self.amount_decimals = amount_decimals
+        self.min_amount = min_amount
+        self.min_total = min_total
+        self.max_price = max_price
+
+    @property
+    def tick(self):
+        """
+        价格最小变动单位
+        """
+        return 10 ** -self.price_decimals
+
+    def validate(self, amount, price):
+        """
+        在发出请求之前检查下单参数
+        :param amount: 数量，可以是float、str或Decimal
+        :param price: 价格
+        :return: self
+        :raises errors.ValidationError: 参数不符合交易对的限制，请求没有发出
+        """
+        if not _decimals_ok(price, self.price_decimals) or not _decimals_ok(amount, self.amount_decimals):
+            self._reject('206', 'price {} or amount {} has too many decimals'.format(price, amount))
+        amount, price = float(amount), float(price)
+        if amount <= 0 or amount < self.min_amount:
+            self._reject('201', 'amount {} is below minimum {}'.format(amount, self.min_amount))
+        if price <= 0 or (self.max_price is not None and price >= self.max_price):
+            self._reject('202', 'price {} is out of range'.format(price))
+        if amount * price < self.min_total:
+            self._reject('204', 'total {} is below minimum {}'.format(amount * price, self.min_total))
+        return self
+
+    def format(self, amount, price):
+        """
+        :return: (amount, price)，按交易对的小数位四舍五入后的字符串，例如('0.30000000', '9000.00000000')
+        """
+        return (str(_quantize(amount, self.amount_decimals)), str(_quantize(price, self.price_decimals)))
+
+    def _reject(self, code, message):
+        raise errors.ValidationError(self.venue, self.native, message, code=code)
+
+    def __repr__(self):
+        return "Market({}, {!r}, {!r})".format(self.id, self.venue, self.native)
+
+
+class MarketRegistry():
+    """
+    一个交易所的交易对，线程安全
+    :param venue: 交易所，决定命名规则和默认限制
+    :param parse: parse(symbol) -> (native, asset, currency)，默认按venue选择
+    :param limits: 默认下单限制，见LIMITS
+    """
+    def __init__(self, venue, parse=None, limits=None):
+        self.venue = venue
+        self.parse = parse or PARSERS[venue]
+        self.limits = dict(LIMITS.get(venue, {}) if limits is None else limits)
+        self.markets = []           # 按id
+        self._by_native = {}
+        self._lookup = {}           # 传入的字符串 -> Market
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        """
+        :param symbol: 任意写法的交易对
+        :return: Market，同一个交易对总是返回同一个对象
+        """
+        market = self._lookup.get(symbol)
+        if market is None:
+            market = self._intern(symbol)
+        return market
+
+    def _intern(self, symbol):
+        native, asset, currency = self.parse(symbol)
+        with self._lock:
+            market = self._by_native.get(native)
+            if market is None:
+                market = Market(len(self.markets), self.venue, native, asset, currency, **self.limits)
+                self.markets.append(market)
+                self._by_native[native] = market
+            self._lookup[symbol] = market
+        return market
+
+    def native(self, symbol):
+        """
+        :return: 交易所的交易对名字，'all'保持不变
+        """
+        if symbol == 'all':
+            return symbol
+        return self.get(symbol).native
+
+    def id(self, symbol):
+        return self.get(symbol).id
+
+    def configure(self, symbol, **limits):
+        """
+        设置交易对的下单限制，例如configure('eth_btc', min_amount=0.01, price_decimals=6)
+        :return: Market
+        """
+        market = self.get(symbol)
+        for name, value in limits.items():
+            if name not in LIMIT_NAMES:
+                raise TypeError("unknown market limit {!r}".format(name))
+            setattr(market, name, value)
+        return market
+
+    def __getitem__(self, market_id):
+        return self.markets[market_id]
+
+    def __len__(self):
+        return len(self.markets)
+
+    def __iter__(self):
+        return iter(list(self.markets))
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def registry(venue):
+    """
+    :return: venue共用的MarketRegistry
+    """
+    with _registries_lock:
+        markets = _registries.get(venue)
+        if markets is None:
+            markets = _registries[venue] = MarketRegistry(venue)
+        return markets
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+本地模拟交易所，用于离线测试和benchmark
+
+同时模拟poloniex的 /public，/tradingApi 和coolcoin的 /api/v1/* 接口，
+可以把Client_Poloniex/Client_Coolcoin的endpoint指向MockExchange.url。
+
+MockPushServer模拟poloniex的Push API(WebSocket)，用于测试pushFeed；
+传入MockExchange时，returnOrderBook返回推送服务器中同一个深度和seq。
+"""
+
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+COINS = ['btc', 'usd', 'cny', 'eth', 'ltc', 'etc']
+
+def make_book(levels=25, mid=100.0, tick=0.01, as_string=True):
+    """
+    生成一个以mid为中间价的深度
+    :param levels: 档位数
+    :param as_string: 价格是否为字符串(poloniex的格式)
+    :return: {'bids': [[price, qty]], 'asks': [...]}
+    """
+    fmt = (lambda x: "{:.8f}".format(x)) if as_string else (lambda x: round(x, 8))
+    bids = [[fmt(mid - tick * (i + 1)), 1.0 + i] for i in range(levels)]
+    asks = [[fmt(mid + tick * (i + 1)), 1.0 + i] for i in range(levels)]
+    return {'bids': bids, 'asks': asks}
+
+
+class MockExchange():
+    """
+    :param secrets: {access_key: secret_key}，设置后校验签名
+    :param strict_nonce: 与真实交易所一样，拒绝不大于该key上一个nonce的请求
+    :param latency: 每个请求处理前等待的秒数
+    :param jitter: 在latency之外随机增加0~jitter秒
+    :param error_rate: 以该概率返回502错误(请求不会被执行)
+    """
+    def __init__(self, host='127.0.0.1', port=0, secrets=None, strict_nonce=True,
+                 latency=0.0, jitter=0.0, error_rate=0.0):
+        self.secrets = secrets or {}
+        self.strict_nonce = strict_nonce
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.orders = {}
+        self.requests = 0
+        self.nonce_errors = 0
+        self.injected_errors = 0
+        self._nonces = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        # MockPushServer，设置后returnOrderBook使用推送服务器的深度
+        self.push = None
+        exchange = self
+
+        class _Handler(_MockHandler):
+            pass
+        _Handler.exchange = exchange
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self):
+        """
+        记录一个请求，并按配置模拟延迟
+        :return: 是否注入错误
+        """
+        with self._lock:
+            self.requests += 1
+            fail = self.error_rate > 0 and random.random() < self.error_rate
+            if fail:
+                self.injected_errors += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+    # ---- 签名校验 ----
+    def check_poloniex(self, headers, body):
+        secret = self.secrets.get(headers.get('Key'))
+        if secret is None:
+            return not self.secrets
+        sign = hmac.new(secret.encode('utf-8'), body, hashlib.sha512).hexdigest()
+        return hmac.compare_digest(sign, headers.get('Sign', ''))
+
+    def check_coolcoin(self, body):
+        query, _, signature = body.decode('utf-8').rpartition('&signature=')
+        key = dict(parse_qsl(query)).get('key')
+        secret = self.secrets.get(key)
+        if secret is None:
+            return not self.secrets
+        md5 = hashlib.md5(secret.encode('utf-8')).hexdigest().encode('utf-8')
+        sign = hmac.new(md5, query.encode('utf-8'), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(sign, signature)
+
+    def check_nonce(self, key, nonce):
+        if not self.strict_nonce:
+            return True
+        with self._lock:
+            if int(nonce) <= self._nonces.get(key, 0):
+                self.nonce_errors += 1
+                return False
+            self._nonces[key] = int(nonce)
+            return True
+
+    # ---- 订单 ----
+    def add_order(self, pair, side, price, amount):
+        with self._lock:
+            order_id = next(self._ids)
+            self.orders[order_id] = {'pair': pair, 'type': side,
+                                     'price': price, 'amount': amount}
+        return order_id
+
+    def remove_order(self, order_id):
+        with self._lock:
+            return self.orders.pop(int(order_id), None)
+
+    def open_orders(self, pair):
+        with self._lock:
+            return [(k, v) for k, v in self.orders.items() if pair in ('all', v['pair'])]
+
+    # ---- poloniex ----
+    def poloniex_public(self, params):
+        if params.get('command') != 'returnOrderBook':
+            return {'error': 'Invalid command.'}
+        if self.push is not None and params.get('currencyPair') in self.push.books:
+            return self.push.snapshot(params['currencyPair'], int(params.get('depth', 25)))
+        book = make_book(int(params.get('depth', 25)))
+        book.update({'isFrozen': '0', 'seq': next(self._seq)})
+        if params.get('currencyPair') == 'all':
+            return {pair: book for pair in ('USDT_BTC', 'BTC_ETH', 'BTC_LTC', 'BTC_ETC')}
+        return book
+
+    def poloniex_private(self, headers, body):
+        if not self.check_poloniex(headers, body):
+            return {'error': 'Invalid API key/secret pair.'}
+        params = dict(parse_qsl(body.decode('utf-8')))
+        if not self.check_nonce(headers.get('Key'), params.get('nonce', 0)):
+            return {'error': 'Nonce must be greater than {}. You provided {}.'.format(
+                self._nonces.get(headers.get('Key')), params.get('nonce'))}
+        command = params.get('command')
+        if command == 'returnCompleteBalances':
+            names = {'usd': 'USDT', 'cny': 'BITCNY'}
+            return {names.get(c, c.upper()): {'available': '10.00000000', 'onOrders': '0.00000000',
+                                              'btcValue': '0.00000000'} for c in COINS}
+        if command in ('buy', 'sell'):
+            if float(params['rate']) * float(params.get('Amount', params.get('amount', 0))) < 0.0001:
+                return {'error': 'Total must be at least 0.0001.'}
+            order_id = self.add_order(params['currencyPair'], command,
+                                      params['rate'], params.get('Amount', params.get('amount')))
+            return {'orderNumber': str(order_id), 'resultingTrades': []}
+        if command == 'cancelOrder':
+            # 与真实交易所一样，交易对不对时订单视为不存在
+            order = self.orders.get(int(params['orderNumber']))
+            if order is None or params.get('currencyPair') not in (None, order['pair']) \
+                    or self.remove_order(params['orderNumber']) is None:
+                return {'success': 0, 'error': 'Invalid order number, or you are not the person '
+                                               'who placed the order.'}
+            return {'success': 1, 'amount': '0.00000000',
+                    'message': 'Order #{} canceled.'.format(params['orderNumber'])}
+        if command == 'returnOpenOrders':
+            pair = params.get('currencyPair', 'all')
+            orders = [(v['pair'], {'orderNumber': str(k), 'type': v['type'], 'rate': v['price'],
+                                   'amount': v['amount']}) for k, v in self.open_orders(pair)]
+            if pair != 'all':
+                return [order for _, order in orders]
+            # all时按市场返回
+            result = {}
+            for market, order in orders:
+                result.setdefault(market, []).append(order)
+            return result
+        return {'error': 'Invalid command.'}
+
+    # ---- coolcoin ----
+    def coolcoin_public(self, path, params):
+        if path == '/api/v1/depth/':
+            return make_book(int(params.get('size', 25)), as_string=False)
+        return {'result': False, 'code': '101'}
+
+    def coolcoin_private(self, path, body):
+        if not self.check_coolcoin(body):
+            return {'result': False, 'code': '104'}
+        params = dict(parse_qsl(body.decode('utf-8')))
+        if not self.check_nonce(params.get('key'), params.get('nonce', 0)):
+            return {'result': False, 'code': '106'}
+        if path == '/api/v1/balance/':
+            data = {}
+            for c in COINS:
+                if c not in ('usd', 'cny'):
+                    data[c + '_balance'] = 10.0
+                    data[c + '_lock'] = 0.0
+            return {'result': True, 'code': 0, 'data': data}
+        if path == '/api/v1/trade_add/':
+            if not 0 < float(params['price']) < 1000000:
+                return {'result': False, 'code': '202'}
+            if float(params['amount']) <= 0:
+                return {'result': False, 'code': '201'}
+            order_id = self.add_order(params['coin'], params['type'], params['price'], params['amount'])
+            return {'result': True, 'code': 0, 'id': str(order_id)}
+        if path == '/api/v1/trade_cancel/':
+            if self.remove_order(params['id']) is None:
+                return {'result': False, 'code': '203'}
+            return {'result': True, 'code': 0}
+        if path == '/api/v1/trade_list/':
+            return {'result': True, 'code': 0,
+                    'data': [{'id': str(k), 'coin': v['pair'], 'type': v['type'], 'price': v['price'],
+                              'amount_original': v['amount'], 'amount_outstanding': v['amount']}
+                             for k, v in self.open_orders(params.get('coin'))]}
+        return {'result': False, 'code': '101'}
+
+
+class MockPushServer():
+    """
+    poloniex Push API，每个交易对一个深度，update/trade时推送给订阅者
+    :param exchange: MockExchange，设置后它的returnOrderBook返回这里的深度
+    :param pairs: poloniex命名的交易对
+    """
+    def __init__(self, exchange=None, host='127.0.0.1', port=0, pairs=('USDT_BTC', 'BTC_ETH')):
+        if websockets is None:
+            raise ImportError("MockPushServer requires websockets")
+        self.host = host
+        self.port = port
+        self.books = {}
+        self.seq = {}
+        self.channel_ids = {}
+        for i, pair in enumerate(pairs):
+            book = make_book()
+            self.books[pair] = {side: {p: float(q) for p, q in book[side]} for side in ('bids', 'asks')}
+            self.seq[pair] = 1
+            self.channel_ids[pair] = 100 + i
+        self.subscriptions = 0
+        self._drop = {}
+        self._trade_ids = itertools.count(1)
+        self._connections = {}      # websocket -> (asyncio.Queue, set(pair))
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        if exchange is not None:
+            exchange.push = self
+
+    @property
+    def url(self):
+        return "ws://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._server.wait_closed()
+
+    async def _handler(self, ws, path=None):
+        queue = asyncio.Queue()
+        pairs = set()
+        self._connections[ws] = (queue, pairs)
+        writer = asyncio.get_running_loop().create_task(self._write(ws, queue))
+        try:
+            async for message in ws:
+                command = json.loads(message)
+                pair = command.get('channel')
+                if command.get('command') == 'subscribe' and pair in self.books:
+                    with self._lock:
+                        pairs.add(pair)
+                        self.subscriptions += 1
+                        book = self.books[pair]
+                        snapshot = [self.channel_ids[pair], self.seq[pair], [['i', {
+                            'currencyPair': pair,
+                            'orderBook': [{p: "{:.8f}".format(q) for p, q in book['asks'].items()},
+                                          {p: "{:.8f}".format(q) for p, q in book['bids'].items()}]}]]]
+                    queue.put_nowait(json.dumps(snapshot))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            del self._connections[ws]
+            writer.cancel()
+
+    async def _write(self, ws, queue):
+        try:
+            while True:
+                await ws.send(await queue.get())
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def _fan_out(self, pair, text):
+        # 在事件循环中执行，与订阅的快照按顺序发出
+        for queue, pairs in self._connections.values():
+            if pair in pairs:
+                queue.put_nowait(text)
+
+    def _publish(self, pair, updates):
+        with self._lock:
+            self.seq[pair] += 1
+            message = [self.channel_ids[pair], self.seq[pair], updates]
+            if self._drop.get(pair):
+                self._drop[pair] -= 1
+                return
+        self._loop.call_soon_threadsafe(self._fan_out, pair, json.dumps(message))
+
+    def update(self, pair, side, price, size):
+        """
+        修改一个档位并推送
+        :param side: 'bids'/'asks'
+        :param price: 价格字符串，例如'100.01000000'
+        :param size: 新的数量，0为删除
+        """
+        with self._lock:
+            if size:
+                self.books[pair][side][price] = float(size)
+            else:
+                self.books[pair][side].pop(price, None)
+        self._publish(pair, [['o', 1 if side == 'bids' else 0, price, "{:.8f}".format(size)]])
+
+    def trade(self, pair, side, price, size):
+        """
+        推送一笔成交，不改变深度
+        :param side: 'buy'/'sell'
+        """
+        self._publish(pair, [['t', str(next(self._trade_ids)), 1 if side == 'buy' else 0, price,
+                              "{:.8f}".format(size), int(time.time())]])
+
+    def drop(self, pair, n=1):
+        """
+        之后n条推送只消耗seq和修改深度，不发出，用于模拟丢包
+        """
+        with self._lock:
+            self._drop[pair] = self._drop.get(pair, 0) + n
+
+    def heartbeat(self):
+        for queue, _ in list(self._connections.values()):
+            self._loop.call_soon_threadsafe(queue.put_nowait, json.dumps([1010]))
+
+    def disconnect(self):
+        """
+        断开所有连接
+        """
+        for ws in list(self._connections):
+            asyncio.run_coroutine_threadsafe(ws.close(), self._loop)
+
+    def snapshot(self, pair, depth=25):
+        """
+        :return: returnOrderBook格式的深度，seq与推送一致
+        """
+        with self._lock:
+            book = self.books[pair]
+            bids = sorted(book['bids'].items(), key=lambda i: -float(i[0]))[:depth]
+            asks = sorted(book['asks'].items(), key=lambda i: float(i[0]))[:depth]
+            return {'bids': [[p, q] for p, q in bids], 'asks': [[p, q] for p, q in asks],
+                    'isFrozen': '0', 'seq': self.seq[pair]}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+    exchange = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self._send(body, status, 'application/json')
+
+    def _send(self, body, status, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fail(self):
+        self._send(b'<html>502 Bad Gateway</html>', 502, 'text/html')
+
+    def do_GET(self):
+        if self.exchange.count():
+            return self._fail()
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == '/public':
+            self._reply(self.exchange.poloniex_public(params))
+        else:
+            self._reply(self.exchange.coolcoin_public(url.path, params))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.exchange.count():
+            return self._fail()
+        url = urlparse(self.path)
+        if url.path == '/tradingApi':
+            self._reply(self.exchange.poloniex_private(self.headers, body))
+        else:
+            self._reply(self.exchange.coolcoin_private(url.path, body))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="local mock exchange")
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 502 responses')
+    args = parser.parse_args()
+    with MockExchange(port=args.port, latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate) as exchange:
+        print("mock exchange listening on {}".format(exchange.url))
+        while True:
+            time.sleep(3600)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+nonce生成器
+
+交易所要求每个key的nonce严格递增。time.time()*1000在多线程下同一毫秒内会重复，
+这里每个key共用一个加锁的生成器，保证并发时也严格递增，并且可以把状态保存到文件，
+进程重启后不会回退。
+
+只保证nonce递增还不够：并发的请求可能乱序到达交易所。transport.ClientAdapter让同一个key的
+请求按nonce顺序写入socket(相邻两个请求间隔send_gap)，等待响应仍然是并发的；
+偶尔仍然乱序被拒绝的请求由client用新的nonce重试。
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class NonceGenerator():
+    """
+    :param path: 保存状态的文件，None为不保存
+    :param reserve: 每次写文件时预留的nonce数量，减少写文件的次数
+    :param send_timeout: 按顺序发送时，等待前一个nonce发出的最长秒数
+    :param send_gap: 按顺序发送时，一个请求发出后到下一个请求可以发出的间隔秒数
+    """
+    def __init__(self, path=None, reserve=1000, send_timeout=5.0, send_gap=0.001):
+        self.path = path
+        self.reserve = reserve
+        self.send_timeout = send_timeout
+        self.send_gap = send_gap
+        self.last = 0
+        self._reserved = 0
+        self._pending = set()
+        self._cond = threading.Condition()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                content = f.read().strip()
+            if content:
+                # 文件中是上次预留的上限，重启后从这里继续，保证不会重复
+                self.last = self._reserved = int(content)
+
+    def next(self):
+        """
+        :return: 比之前所有返回值都大的nonce，通常是当前毫秒数
+        """
+        with self._cond:
+            n = max(int(time.time() * 1000), self.last + 1)
+            self.last = n
+            if self.path and n >= self._reserved:
+                self._reserved = n + self.reserve
+                self._save(self._reserved)
+            if getattr(_local, 'ordering', None) is self:
+                self._pending.add(n)
+                _local.pending = (self, n)
+            return n
+
+    def _save(self, value):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(str(value))
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def ordered(self):
+        """
+        在with中生成的nonce，经过transport.ClientAdapter发送时会等待更小的nonce先发出
+        """
+        _local.ordering = self
+        try:
+            yield
+        finally:
+            _local.ordering = None
+            self._release()
+
+    def _wait_turn(self, n):
+        with self._cond:
+            self._cond.wait_for(lambda: min(self._pending) == n, timeout=self.send_timeout)
+
+    def _release(self):
+        pending = getattr(_local, 'pending', None)
+        if pending is None or pending[0] is not self:
+            return
+        _local.pending = None
+        with self._cond:
+            self._pending.discard(pending[1])
+            self._cond.notify_all()
+
+
+def send_in_order(send):
+    """
+    在NonceGenerator.ordered()中调用时，等待更小的nonce发出后再执行send()
+    :param send: 把请求写入socket的函数
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        return send()
+    generator, n = pending
+    generator._wait_turn(n)
+    try:
+        return send()
+    finally:
+        # 请求已经写入socket，等待send_gap后之后的nonce才可以发送，
+        # 给交易所留出按顺序处理的时间
+        if generator.send_gap:
+            time.sleep(generator.send_gap)
+        generator._release()
+
+
+_generators = {}
+_generators_lock = threading.Lock()
+
+def nonce_for(key, path=None):
+    """
+    获取key对应的生成器，同一个进程中使用同一个key的client共用一个生成器
+    :param key: access key
+    :param path: 第一次创建时使用的状态文件
+    """
+    with _generators_lock:
+        generator = _generators.get(key)
+        if generator is None:
+            generator = _generators[key] = NonceGenerator(path)
+        return generator
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+本地order book
+
+用get_depth的快照初始化，之后用增量(diff)或新的快照更新，
+不需要每次都重新解析整个深度。
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+BIDS = 'bids'
+ASKS = 'asks'
+
+
+class BookSide():
+    """
+    一侧的价格档位，价格从低到高保存在array中，累计数量用按档位序号的Fenwick树计算
+
+    复杂度(n为档位数)：
+        set()只改数量          O(log n)，同时更新Fenwick树
+        set()新增或删除档位    O(n)，array插入/删除需要移动后面的元素，Fenwick树在下次volume()时O(n)重建
+        volume()               O(log n)
+    增量更新大多只改数量，新增和删除档位通常在最优价附近，移动的元素不多。
+    :param descending: True为bids(最优价在末尾)，False为asks(最优价在开头)
+    """
+    def __init__(self, descending):
+        self.descending = descending
+        self.prices = array('d')
+        self.sizes = array('d')
+        self._tree = None           # Fenwick树，None为需要重建
+
+    def __len__(self):
+        return len(self.prices)
+
+    def replace(self, levels):
+        """
+        用[[price, size], ...]替换全部档位
+        """
+        levels = sorted((float(p), float(s)) for p, s in levels if float(s) > 0)
+        self.prices = array('d', [p for p, s in levels])
+        self.sizes = array('d', [s for p, s in levels])
+        self._tree = None
+
+    def set(self, price, size):
+        """
+        更新一个档位，size为0时删除该档位
+        """
+        price = float(price)
+        size = float(size)
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            if size > 0:
+                if self._tree is not None:
+                    self._add(i, size - self.sizes[i])
+                self.sizes[i] = size
+                return
+            del self.prices[i]
+            del self.sizes[i]
+        elif size > 0:
+            self.prices.insert(i, price)
+            self.sizes.insert(i, size)
+        else:
+            return
+        # 档位序号变化
+        self._tree = None
+
+    def best(self):
+        """
+        :return: (price, size)，没有档位时为None
+        """
+        if not self.prices:
+            return None
+        i = -1 if self.descending else 0
+        return self.prices[i], self.sizes[i]
+
+    def size_at(self, price):
+        """
+        :return: 该价格档位的数量，不存在时为0
+        """
+        price = float(price)
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            return self.sizes[i]
+        return 0.0
+
+    # ---- Fenwick树，tree[i]为sizes[i & (i + 1)]到sizes[i]的和 ----
+
+    def _build(self):
+        tree = array('d', self.sizes)
+        n = len(tree)
+        for i in range(n):
+            j = i | (i + 1)
+            if j < n:
+                tree[j] += tree[i]
+        self._tree = tree
+        return tree
+
+    def _add(self, i, delta):
+        tree = self._tree
+        n = len(tree)
+        while i < n:
+            tree[i] += delta
+            i |= i + 1
+
+    def _prefix(self, i):
+        """
+        :return: sizes[:i]的和
+        """
+        tree = self._tree
+        total = 0.0
+        while i > 0:
+            total += tree[i - 1]
+            i &= i - 1
+        return total
+
+    def volume(self, price):
+        """
+        从最优价到price(包含)的累计数量
+        """
+        if self._tree is None:
+            self._build()
+        if not self.sizes:
+            return 0.0
+        price = float(price)
+        if self.descending:
+            i = bisect_left(self.prices, price)
+            return max(self._prefix(len(self.sizes)) - self._prefix(i), 0.0)
+        return self._prefix(bisect_right(self.prices, price))
+
+    def levels(self, n=None):
+        """
+        :return: 按最优价在前排序的[[price, size], ...]
+        """
+        pairs = zip(self.prices, self.sizes)
+        if self.descending:
+            pairs = reversed(list(pairs))
+        levels = [[p, s] for p, s in pairs]
+        return levels if n is None else levels[:n]
+
+
+class OrderBook():
+    def __init__(self, seq=None):
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.seq = seq
+
+    @classmethod
+    def from_depth(cls, depth, seq=None):
+        """
+        :param depth: get_depth返回的{'bids': [[price, qty]], 'asks': [...]}
+        :param seq: 快照的序列号，默认取depth['seq']
+        """
+        book = cls()
+        book.apply_snapshot(depth, seq)
+        return book
+
+    def side(self, side):
+        return self.bids if side == BIDS else self.asks
+
+    def _stale(self, seq, allow_equal=False):
+        if seq is None or self.seq is None:
+            return False
+        return int(seq) < self.seq if allow_equal else int(seq) <= self.seq
+
+    def apply_snapshot(self, depth, seq=None):
+        """
+        用新的快照替换本地深度
+        :return: 快照比本地旧时忽略并返回False
+        """
+        if seq is None:
+            seq = depth.get('seq')
+        if self._stale(seq):
+            return False
+        self.bids.replace(depth['bids'])
+        self.asks.replace(depth['asks'])
+        if seq is not None:
+            self.seq = int(seq)
+        return True
+
+    def apply_diff(self, side, price, size, seq=None):
+        """
+        更新一个档位
+        :param side: 'bids'/'asks'
+        :param size: 新的数量，0为删除
+        :param seq: 同一个seq的多个diff可以依次应用
+        :return: diff比本地旧时忽略并返回False
+        """
+        if self._stale(seq, allow_equal=True):
+            return False
+        self.side(side).set(price, size)
+        if seq is not None:
+            self.seq = int(seq)
+        return True
+
+    def apply_diffs(self, diffs, seq=None):
+        """
+        :param diffs: [(side, price, size), ...]，同一个seq的一组更新
+        """
+        if self._stale(seq):
+            return False
+        for side, price, size in diffs:
+            self.side(side).set(price, size)
+        if seq is not None:
+            self.seq = int(seq)
+        return True
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def size_at(self, side, price):
+        return self.side(side).size_at(price)
+
+    def volume(self, side, price):
+        """
+        从最优价到price的累计数量，例如volume('asks', p)为以不高于p的价格能买到的数量
+        """
+        return self.side(side).volume(price)
+
+    def to_depth(self, n=None):
+        """
+        :return: 与get_depth相同格式的{'bids', 'asks'}
+        """
+        return {BIDS: self.bids.levels(n), ASKS: self.asks.levels(n)}
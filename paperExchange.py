@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+模拟交易：与Client_Poloniex/Client_Coolcoin相同的接口，订单在进程内撮合，不发任何请求
+
+    paper = paper_service('poloniex', balances={'usd': 10000, 'btc': 1})
+    paper.feed('usd_btc', poloniex.get_depth('usd_btc'))       # 实时深度
+    paper.trade('buy_LIMIT', 0.1, 9000, 'usd_btc')
+    paper.balance()
+
+    # 回测：按时间顺序回放录制的深度
+    for ts, pair, depth in paper.replay({'usd_btc': DepthReader('usd_btc.rec')}):
+        strategy.on_depth(paper, pair, depth)
+
+撮合规则：
+    - 外部深度由feed()/replay()提供，每次feed替换该交易对的外部深度
+    - 新订单先按价格吃外部深度(taker，成交价为外部档位价格)，剩余部分挂单
+    - 挂单按价格优先、时间优先排队；新的外部深度越过挂单价格时按挂单价格成交(maker)
+    - 同一份外部深度被吃掉的数量在下一次feed之前不会再次成交
+    - 自己的买单和卖单之间不撮合
+余额与balance()格式相同，下单时冻结，成交和撤单时解冻。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+import batch
+import coocoinSDK
+import marketRegistry
+import poloniexSDK
+from orderBook import OrderBook
+
+COINS = ('btc', 'usd', 'cny', 'eth', 'ltc', 'etc')
+
+# 小于这个数量视为0
+EPS = 1e-12
+# 冻结余额小于这个数时视为0
+FROZEN_EPS = 1e-9
+
+BUY = 'buy'
+SELL = 'sell'
+
+
+class Order():
+    __slots__ = ('id', 'book', 'side', 'price', 'amount', 'remaining', 'ts', 'taken')
+
+    def __init__(self, id, book, side, price, amount, ts):
+        self.id = id
+        self.book = book
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.remaining = amount
+        self.ts = ts
+        self.taken = None           # 下单时立即成交(taker)的fill list
+
+
+def _split(levels):
+    # get_depth的list或(n, 2)数组 -> (prices, qtys)
+    if hasattr(levels, 'tolist'):
+        levels = levels.tolist()
+    return [float(l[0]) for l in levels], [float(l[1]) for l in levels]
+
+
+class _Book():
+    """
+    一个交易对的撮合：自己的挂单(价格优先、时间优先)和最近一次feed的外部深度
+    """
+    def __init__(self, exchange, market):
+        self.exchange = exchange
+        self.market = market
+        self.bid_prices = []        # 自己的买单价格，从低到高，最优价在末尾
+        self.ask_prices = []        # 自己的卖单价格，从低到高，最优价在开头
+        self.bids = {}              # price -> deque(Order)
+        self.asks = {}
+        self.depth = None
+        # 外部深度，最优价在前；*_i为第一个还有剩余数量的档位
+        self.ext_bid_p, self.ext_bid_q, self.ext_bid_i = [], [], 0
+        self.ext_ask_p, self.ext_ask_q, self.ext_ask_i = [], [], 0
+
+    def feed(self, depth):
+        self.depth = depth
+        self.ext_bid_p, self.ext_bid_q = _split(depth['bids'])
+        self.ext_ask_p, self.ext_ask_q = _split(depth['asks'])
+        self.ext_bid_i = self.ext_ask_i = 0
+        self._match_resting()
+
+    def _consume(self, order, maker):
+        """
+        order吃外部深度，直到order成交完或者外部深度不再越过order的价格
+        """
+        buy = order.side == BUY
+        if buy:
+            prices, qtys, i = self.ext_ask_p, self.ext_ask_q, self.ext_ask_i
+        else:
+            prices, qtys, i = self.ext_bid_p, self.ext_bid_q, self.ext_bid_i
+        limit = order.price
+        n = len(prices)
+        fill = self.exchange._fill
+        while order.remaining > EPS and i < n:
+            p = prices[i]
+            if (p > limit) if buy else (p < limit):
+                break
+            q = qtys[i]
+            take = q if q < order.remaining else order.remaining
+            qtys[i] = q - take
+            fill(order, limit if maker else p, take, maker)
+            if qtys[i] <= EPS:
+                i += 1
+        if buy:
+            self.ext_ask_i = i
+        else:
+            self.ext_bid_i = i
+
+    def _match_resting(self):
+        # 自己的最优买单越过外部卖一时成交，依次向后
+        while self.bid_prices and self.ext_ask_i < len(self.ext_ask_p) \
+                and self.bid_prices[-1] >= self.ext_ask_p[self.ext_ask_i]:
+            price = self.bid_prices[-1]
+            level = self.bids[price]
+            order = level[0]
+            self._consume(order, maker=True)
+            if order.remaining > EPS:
+                break
+            level.popleft()
+            self.exchange._done(order)
+            if not level:
+                del self.bids[price]
+                self.bid_prices.pop()
+        while self.ask_prices and self.ext_bid_i < len(self.ext_bid_p) \
+                and self.ask_prices[0] <= self.ext_bid_p[self.ext_bid_i]:
+            price = self.ask_prices[0]
+            level = self.asks[price]
+            order = level[0]
+            self._consume(order, maker=True)
+            if order.remaining > EPS:
+                break
+            level.popleft()
+            self.exchange._done(order)
+            if not level:
+                del self.asks[price]
+                del self.ask_prices[0]
+
+    def submit(self, order):
+        """
+        :return: 是否还有剩余数量在挂单
+        """
+        self._consume(order, maker=False)
+        if order.remaining <= EPS:
+            return False
+        if order.side == BUY:
+            prices, levels = self.bid_prices, self.bids
+        else:
+            prices, levels = self.ask_prices, self.asks
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = deque()
+            insort(prices, order.price)
+        level.append(order)
+        return True
+
+    def remove(self, order):
+        if order.side == BUY:
+            prices, levels = self.bid_prices, self.bids
+        else:
+            prices, levels = self.ask_prices, self.asks
+        level = levels[order.price]
+        level.remove(order)
+        if not level:
+            del levels[order.price]
+            del prices[bisect_left(prices, order.price)]
+
+
+class PaperExchange():
+    """
+    撮合和余额，与交易所无关；PaperPoloniex/PaperCoolcoin提供各自的响应格式
+    :param balances: 初始可用余额，例如{'usd': 10000, 'btc': 1}
+    :param fee: 手续费率，从收到的币种中扣除
+    :param markets: marketRegistry.MarketRegistry，默认使用这个交易所共用的注册表
+    :param on_fill: on_fill(fill)，fill格式见fills
+    :param record_fills: 是否在fills中保存全部成交，长时间回测时可以只用on_fill
+    """
+    venue = None
+
+    def __init__(self, balances=None, fee=0.0, markets=None, on_fill=None, record_fills=True):
+        self.fee = fee
+        self.markets = markets if markets is not None else marketRegistry.registry(self.venue)
+        self.on_fill = on_fill
+        self.record_fills = record_fills
+        self.trade_balance = dict.fromkeys(COINS, 0.0)
+        self.frozen = dict.fromkeys(COINS, 0.0)
+        for coin, amount in (balances or {}).items():
+            self.trade_balance[coin] = float(amount)
+        self._books = []            # 按market.id
+        self._orders = {}           # 未完成的订单，id -> Order
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self.now = None
+        # (ts, order_id, pair, side, price, amount, maker)
+        self.fills = []
+        self.filled = 0
+        self.placed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    # ---- 交易对 ----
+
+    def compatible(self, symbol):
+        return self.markets.native(symbol)
+
+    def split_pair(self, symbol):
+        market = self.markets.get(symbol)
+        return market.asset, market.currency
+
+    def _book(self, symbol):
+        market = self.markets.get(symbol)
+        books = self._books
+        while len(books) <= market.id:
+            books.append(None)
+        book = books[market.id]
+        if book is None:
+            book = books[market.id] = _Book(self, market)
+            for coin in (market.asset, market.currency):
+                self.trade_balance.setdefault(coin, 0.0)
+                self.frozen.setdefault(coin, 0.0)
+        return book
+
+    # ---- 外部深度 ----
+
+    def feed(self, symbol, depth, ts=None):
+        """
+        更新外部深度，越过挂单价格的部分立即成交
+        :param depth: get_depth的返回值，list或as_array=True的数组
+        :param ts: 深度的时间戳，用作成交时间，默认为当前时间
+        """
+        with self._lock:
+            self.now = time.time() if ts is None else ts
+            self._book(symbol).feed(depth)
+
+    def replay(self, readers, start=None, end=None):
+        """
+        按时间顺序回放多个交易对的录制深度
+        :param readers: {pair: depthRecorder.DepthReader}
+        :return: 生成(ts, pair, depth)，生成时深度已经feed，挂单已经撮合
+        """
+        streams = [((ts, pair, depth) for ts, depth in reader.replay(start, end))
+                   for pair, reader in readers.items()]
+        for ts, pair, depth in heapq.merge(*streams, key=lambda item: item[0]):
+            self.feed(pair, depth, ts)
+            yield ts, pair, depth
+
+    def get_depth(self, symbol, as_array=False, **kwargs):
+        """
+        :param as_array: True时bids/asks为(n, 2)的numpy float64数组，与真实client相同，见depthArray
+        :return: 最近一次feed的外部深度(不包括自己的挂单)
+        """
+        if as_array:
+            # numpy只在需要时import
+            import depthArray
+            depthArray.require_numpy()
+        depth = self._book(symbol).depth
+        if depth is None:
+            raise ValueError("no depth fed for {}".format(symbol))
+        if as_array:
+            return depthArray.parse_depth(depth)
+        return depth
+
+    def get_book(self, symbol, book=None, **kwargs):
+        depth = self.get_depth(symbol)
+        if book is None:
+            return OrderBook.from_depth(depth)
+        book.apply_snapshot(depth)
+        return book
+
+    # ---- 撮合 ----
+
+    def _fill(self, order, price, amount, maker):
+        market = order.book.market
+        order.remaining -= amount
+        if order.side == BUY:
+            # 冻结按挂单价格计算，成交价更低时退回差额
+            self._unfreeze(market.currency, amount * order.price)
+            self.trade_balance[market.currency] += amount * (order.price - price)
+            self.trade_balance[market.asset] += amount * (1 - self.fee)
+        else:
+            self._unfreeze(market.asset, amount)
+            self.trade_balance[market.currency] += amount * price * (1 - self.fee)
+        fill = (self.now, order.id, market.native, order.side, price, amount, maker)
+        self.filled += 1
+        if self.record_fills:
+            self.fills.append(fill)
+        if not maker:
+            if order.taken is None:
+                order.taken = []
+            order.taken.append(fill)
+        if self.on_fill is not None:
+            self.on_fill(fill)
+
+    def _unfreeze(self, coin, quantity):
+        frozen = self.frozen[coin] - quantity
+        # 浮点误差，全部解冻后为0
+        self.frozen[coin] = frozen if abs(frozen) > FROZEN_EPS else 0.0
+
+    def _done(self, order):
+        self._orders.pop(order.id, None)
+
+    def submit(self, side, amount, price, symbol):
+        """
+        下单
+        :return: (Order, error)，余额不足时Order为None，error为不足的币种
+        :raises errors.ValidationError: 参数不符合交易对的限制
+        """
+        market = self.markets.get(symbol).validate(amount, price)
+        amount, price = float(amount), float(price)
+        with self._lock:
+            book = self._book(symbol)
+            if side == BUY:
+                coin, need = market.currency, amount * price
+            else:
+                coin, need = market.asset, amount
+            if self.trade_balance[coin] < need - EPS:
+                self.rejected += 1
+                return None, coin
+            self.trade_balance[coin] -= need
+            self.frozen[coin] += need
+            order = Order(str(next(self._ids)), book, side, price, amount, self.now)
+            self.placed += 1
+            if book.submit(order):
+                self._orders[order.id] = order
+            return order, None
+
+    def remove(self, order_id):
+        """
+        撤单并解冻剩余部分
+        :return: 撤销的Order，订单不存在或已经成交时为None
+        """
+        with self._lock:
+            order = self._orders.pop(str(order_id), None)
+            if order is None:
+                return None
+            order.book.remove(order)
+            market = order.book.market
+            if order.side == BUY:
+                coin, quantity = market.currency, order.remaining * order.price
+            else:
+                coin, quantity = market.asset, order.remaining
+            self._unfreeze(coin, quantity)
+            self.trade_balance[coin] += quantity
+            self.cancelled += 1
+            return order
+
+    def orders(self, symbol=None):
+        """
+        :return: 未完成的Order list，按下单顺序
+        """
+        with self._lock:
+            if symbol is None or symbol == 'all':
+                return list(self._orders.values())
+            market = self.markets.get(symbol)
+            return [o for o in self._orders.values() if o.book.market is market]
+
+    # ---- 与client相同的接口 ----
+
+    def balance(self):
+        with self._lock:
+            return {'asset': {'total': 0, 'net': 0},
+                    'trade': dict(self.trade_balance), 'frozen': dict(self.frozen)}
+
+    def open_orders(self, symbol):
+        """
+        :return: parse_open_order格式的挂单list
+        """
+        return [{'id': o.id, 'side': o.side, 'price': o.price, 'amount': o.remaining}
+                for o in self.orders(symbol)]
+
+    def _place(self, order):
+        args, kwargs = batch.order_args(order)
+        return self._trade(*args, **kwargs)
+
+    def place_orders(self, orders, concurrency=5, deadline=None):
+        """
+        按顺序下单，参数和返回值与client.place_orders相同
+        """
+        orders = list(orders)
+        start = time.time()
+        report = batch.place_report(orders, _outcomes(self._place, orders), self.describe_order)
+        report['elapsed'] = time.time() - start
+        return report
+
+    def _cancel_all(self, order_id_list, symbol):
+        if not order_id_list:
+            order_id_list = [o.id for o in self.orders(symbol)]
+        order_id_list = list(order_id_list)
+        start = time.time()
+        report = batch.cancel_report(order_id_list,
+                                     _outcomes(lambda i: self.cancel(i, symbol), order_id_list),
+                                     self.classify_cancel)
+        report['elapsed'] = time.time() - start
+        return report
+
+    def stats(self):
+        """
+        :return: {'placed', 'rejected', 'cancelled', 'fills', 'open'}
+        """
+        with self._lock:
+            return {'placed': self.placed, 'rejected': self.rejected, 'cancelled': self.cancelled,
+                    'fills': self.filled, 'open': len(self._orders)}
+
+
+def _outcomes(fn, items):
+    # 与batch.run_batch相同的格式，不需要线程
+    outcomes = []
+    for item in items:
+        try:
+            outcomes.append((fn(item), None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+class PaperPoloniex(PaperExchange):
+    """
+    响应格式与Client_Poloniex相同
+    """
+    venue = poloniexSDK.VENUE
+    describe_order = staticmethod(poloniexSDK.describe_order)
+    classify_cancel = staticmethod(poloniexSDK.classify_cancel)
+
+    def trade(self, trade_type, amount, price, symbol, test=False):
+        side = trade_type.split('_')[0]
+        order, short = self.submit(side, amount, price, symbol)
+        if order is None:
+            return {'error': 'Not enough {}.'.format(short.upper())}
+        trades = [{'amount': "{:.8f}".format(f[5]), 'date': f[0], 'rate': "{:.8f}".format(f[4]),
+                   'total': "{:.8f}".format(f[4] * f[5]), 'type': side}
+                  for f in order.taken or ()]
+        return {'orderNumber': order.id, 'resultingTrades': trades}
+
+    _trade = trade
+
+    def cancel(self, orderNumber, currencyPair, **kwargs):
+        if self.remove(orderNumber) is None:
+            return {'success': 0, 'error': 'Invalid order number, or you are not the person '
+                                           'who placed the order.'}
+        return {'success': 1, 'amount': '0.00000000', 'message': 'Order #{} canceled.'.format(orderNumber)}
+
+    def openOrders(self, symbol='all', lazy=False, **kwargs):
+        def _order(o):
+            return {'orderNumber': o.id, 'type': o.side, 'rate': "{:.8f}".format(o.price),
+                    'startingAmount': "{:.8f}".format(o.amount), 'amount': "{:.8f}".format(o.remaining),
+                    'total': "{:.8f}".format(o.remaining * o.price)}
+        if symbol != 'all':
+            return [_order(o) for o in self.orders(symbol)]
+        result = {}
+        for o in self.orders():
+            result.setdefault(o.book.market.native, []).append(_order(o))
+        return result
+
+    def cancel_all(self, order_id_list=None, currencyPair='ETH_BTC', concurrency=5, deadline=None):
+        return self._cancel_all(order_id_list, currencyPair)
+
+
+class PaperCoolcoin(PaperExchange):
+    """
+    响应格式与Client_Coolcoin相同
+    """
+    venue = coocoinSDK.VENUE
+    describe_order = staticmethod(coocoinSDK.describe_order)
+    classify_cancel = staticmethod(coocoinSDK.classify_cancel)
+
+    def _trade(self, trade_type, amount, price, coin, test=False):
+        order, short = self.submit(trade_type.split('_')[0], amount, price, coin)
+        if order is None:
+            # 余额不足
+            return {'result': False, 'code': '200'}
+        return {'result': True, 'code': 0, 'id': order.id}
+
+    def trade(self, trade_type, amount, price, coin, test=False):
+        data = self._trade(trade_type, amount, price, coin)
+        if not data['code']:
+            return data
+        else:
+            return data['code']
+
+    def cancel(self, orderID, coin, **kwargs):
+        if self.remove(orderID) is None:
+            return {'result': False, 'code': '203'}
+        return {'result': True, 'code': 0}
+
+    def openOrders(self, coin, lazy=False, **kwargs):
+        data = [{'id': o.id, 'coin': o.book.market.native, 'type': o.side, 'price': o.price,
+                 'amount_original': o.amount, 'amount_outstanding': o.remaining}
+                for o in self.orders(coin)]
+        return data or None
+
+    def cancel_all(self, order_id_list=None, coin='ETH_BTC', concurrency=5, deadline=None):
+        return self._cancel_all(order_id_list, coin)
+
+
+PAPER_CLIENTS = {poloniexSDK.VENUE: PaperPoloniex, coocoinSDK.VENUE: PaperCoolcoin}
+
+def paper_service(venue='poloniex', balances=None, fee=0.0, **kwargs):
+    """
+    代替poloniex_service()/coolcoin_service()
+    :param venue: 'poloniex'/'coolcoin'
+    :param kwargs: 传给PaperExchange
+    """
+    return PAPER_CLIENTS[venue](balances=balances, fee=fee, **kwargs)
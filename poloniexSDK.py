@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
 
-import requests
 import hmac
 import hashlib
-import urllib.parse
-import json
-import time
-import accountConfig
+import jsonCodec
+import logging
+import threading
+import re
+import batch
+import credentialProvider
+import errors
+import marketCache
+import marketRegistry
+import rateLimit
+import retryPolicy
+import nonce
+from orderBook import OrderBook
 
 try:
     from urllib import urlencode
@@ -17,38 +25,203 @@ except ImportError:
 # poloniex 网址
 ENDPOINT = "https://poloniex.com"
 
-def poloniex_service(key_index='USD_1'):
-    access_key = accountConfig.POLONIEX[key_index]['ACCESS_KEY']
-    secret_key = accountConfig.POLONIEX[key_index]['SECRET_KEY']
-    return Client_Poloniex(access_key, secret_key)
+log = logging.getLogger(__name__)
+
+VENUE = 'poloniex'
+
+# 并发请求乱序到达导致nonce被拒绝时，用新的nonce重试的次数
+NONCE_RETRIES = 2
+
+def poloniex_service(key_index='USD_1', credentials=None):
+    """
+    :param key_index: 环境变量或accountConfig.POLONIEX中的key名，见credentialProvider.default
+    :param credentials: credentialProvider.Provider，设置时不使用key_index
+    """
+    return Client_Poloniex(credentials=credentials or credentialProvider.default(key_index))
 def formatNumber(x):
     if isinstance(x, float):
         return "{:.8f}".format(x)
     else:
         return str(x)
 
+def parse_depth(data):
+    """
+    把returnOrderBook的响应转换成 {'bids': [[price, qty]], 'asks': [...], 'seq': seq}
+    :param data: 解码后的json响应
+    :return: depth dict
+    """
+    bids = []
+    asks = []
+    for i in data['bids']:
+        bids.append([float(i[0]), float(i[1])])
+    for i in data['asks']:
+        asks.append([float(i[0]), float(i[1])])
+    depth = {'bids': bids, 'asks': asks}
+    if 'seq' in data:
+        # 用于Push API和本地OrderBook的增量更新
+        depth['seq'] = data['seq']
+    return depth
+
+def parse_all_depth(data):
+    """
+    把currencyPair=all的returnOrderBook响应转换成 {market: parse_depth格式的depth}
+    :param data: 解码后的json响应
+    """
+    return {market: parse_depth(book) for market, book in data.items() if isinstance(book, dict)}
+
+def parse_balance(data):
+    """
+    把returnCompleteBalances的响应转换成统一的balance格式
+    :param data: 解码后的json响应
+    :return: balance dict
+    """
+    balance = {'asset': {'total': 0, 'net': 0},
+               'trade': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0},
+               'frozen': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0}}
+
+    #获取键值
+    balance_trade_keys= balance['trade'].keys()
+    balance_frozen_keys = balance['frozen'].keys()
+
+    data['USD'] = data.pop('USDT')
+    data['CNY'] = data.pop('BITCNY')
+    for i in balance_trade_keys:
+        balance['trade'][i] = data[i.upper()]['available']
+    for i in balance_frozen_keys:
+        balance['frozen'][i] = data[i.upper()]['onOrders']
+    return balance
+
+def parse_open_order(order):
+    """
+    把returnOpenOrders中的一个订单转换成统一格式
+    :return: {'id', 'side', 'price', 'amount'}，amount为剩余数量
+    """
+    return {'id': str(order['orderNumber']), 'side': order['type'],
+            'price': float(order['rate']), 'amount': float(order['amount'])}
+
+def classify_cancel(result):
+    """
+    把cancelOrder的响应归类
+    :param result: 解码后的json响应
+    :return: batch.CANCELLED/GONE/FAILED
+    """
+    if isinstance(result, dict):
+        if result.get('success') == 1:
+            return batch.CANCELLED
+        if 'Invalid order number' in str(result.get('error', '')):
+            return batch.GONE
+    return batch.FAILED
+
+def describe_order(result):
+    """
+    把buy/sell的响应转换成(orderNumber, error)
+    :param result: 解码后的json响应
+    :return: 成功时error为None，失败时orderNumber为None
+    """
+    if isinstance(result, dict):
+        if result.get('orderNumber'):
+            return str(result['orderNumber']), None
+        if result.get('error'):
+            return None, result['error']
+    return None, 'unexpected response: {!r}'.format(result)
+
+def is_nonce_error(data):
+    """
+    :return: 响应是否为nonce错误(请求未被执行，可以安全重试)
+    """
+    return isinstance(data, dict) and 'Nonce must be greater' in str(data.get('error', ''))
+
+def error_code(data):
+    """
+    :return: 响应中的错误信息，数字替换为#以免每个错误单独计数；没有错误时为None
+    """
+    if isinstance(data, dict) and data.get('error'):
+        return re.sub(r'\d+(\.\d+)?', '#', str(data['error']))
+    return None
+
+def _decode(response):
+    return jsonCodec.loads(response.content)
+
+def _decode_lazy(response):
+    return jsonCodec.lazy_loads(response.content)
+
 class Client_Poloniex():
-    def __init__(self, access_key, secret_key,):
-        self._public_key = access_key
-        self._private_key = secret_key
-        self.ssion = requests.Session()
-        self.adapter = requests.adapters.HTTPAdapter(pool_connections=5, pool_maxsize=5, max_retries=5)
-        self.ssion.mount('http://', self.adapter)
-        self.ssion.mount('https://', self.adapter)
+    def __init__(self, access_key=None, secret_key=None, endpoint=ENDPOINT, cache=None, limiter=None, nonces=None,
+                 instrument=None, retry=None, hedge=None, markets=None, credentials=None):
+        """
+        :param access_key: 只调用public接口时可以不传
+        :param cache: marketCache.TTLCache，缓存public接口的响应，可以在多个client之间共用
+        :param limiter: rateLimit.Scheduler，限制请求频率，可以在同一个key的多个client之间共用
+        :param nonces: nonce.NonceGenerator，默认使用同一个access key共用的生成器
+        :param instrument: instrument.Registry，记录每个接口的耗时、字节数和错误，None为不记录
+        :param retry: retryPolicy.RetryPolicy，默认最多尝试3次；private接口只重试确定没有被执行的请求
+        :param hedge: retryPolicy.Hedger，public接口慢于p95时发出对冲请求，None为不对冲
+        :param markets: marketRegistry.MarketRegistry，默认使用这个交易所共用的注册表
+        :param credentials: credentialProvider.Provider，第一次调用private接口时获取key，默认为access_key/secret_key
+        """
+        self.credentials = credentials or credentialProvider.static(access_key, secret_key)
+        self.endpoint = endpoint
+        self.cache = cache
+        self.limiter = limiter
+        self.instrument = instrument
+        self.retry = retry or retryPolicy.RetryPolicy()
+        self.hedge = hedge
+        self.markets = markets if markets is not None else marketRegistry.registry(VENUE)
+        self._nonces = nonces
+        self._signer = None         # (access_key, hmac)，第一次签名时创建
+        self._ssion = None
+        self.adapter = None
+        self._lock = threading.Lock()
+
+    @property
+    def ssion(self):
+        """
+        requests.Session，第一次发送请求时才创建，import requests也推迟到这时
+        """
+        if self._ssion is None:
+            with self._lock:
+                if self._ssion is None:
+                    import transport
+                    session, self.adapter = transport.new_session()
+                    self._ssion = session
+        return self._ssion
+
+    @property
+    def nonces(self):
+        """
+        nonce.NonceGenerator，默认使用同一个access key共用的生成器
+        """
+        if self._nonces is None:
+            self._nonces = nonce.nonce_for(self._keys()[0])
+        return self._nonces
+
+    def _keys(self):
+        """
+        :return: (access_key, hmac)，第一次调用时从self.credentials获取key
+        :raises credentialProvider.CredentialsError: 没有可用的key
+        """
+        signer = self._signer
+        if signer is None:
+            access_key, secret_key = self.credentials()
+            # HMAC-SHA512的key只与secret有关，每次签名时copy即可
+            signer = self._signer = (access_key, hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha512))
+        return signer
 
     def compatible(self,symbol):
         """
         调整数字货币名字
         :param symbol: 传入的数字货币交易pair
-        :return: 输出符合poloniex交易平台命名规则的pair
+        :return: 输出符合poloniex交易平台命名规则的pair，见marketRegistry.parse_poloniex
         """
-        if symbol == 'all':
-            return symbol
-        else:
-            symbol = symbol.upper()
-            if 'USD' in symbol:
-                symbol = symbol.replace('USD', 'USDT')
-            return symbol
+        return self.markets.native(symbol)
+
+    def split_pair(self, symbol):
+        """
+        :param symbol: 交易对，例如usd_btc
+        :return: (asset, currency)，balance中的币种名，例如('btc', 'usd')：买入btc，支付usd
+        """
+        market = self.markets.get(symbol)
+        return market.asset, market.currency
 
     #http请求
     def http_request(self, method, path, params=None):
@@ -59,11 +232,80 @@ class Client_Poloniex():
         :param params: 请求参数dict
         :return: 返回json格式的响应
         """
-        #print("params: \n {}".format(params))
-        response = self.ssion.request(method, ENDPOINT + path, params=params)
-        return response.json()
+        if self.cache is not None:
+            key = marketCache.request_key(self.endpoint, method, path, params)
+            endpoint = (params or {}).get('command', path)
+            return self.cache.get(endpoint, key, lambda: self._http_request(method, path, params))
+        return self._http_request(method, path, params)
+
+    def _http_request(self, method, path, params=None):
+        endpoint = (params or {}).get('command', path)
+
+        def _fetch():
+            if self.limiter is not None:
+                self.limiter.acquire(rateLimit.PUBLIC)
+            return self._send(endpoint, lambda: self.ssion.request(method, self.endpoint + path, params=params),
+                              _decode)
+        if self.hedge is not None:
+            return self.retry.call(lambda: self.hedge.call(endpoint, _fetch))
+        return self.retry.call(_fetch)
+
+    def _send(self, endpoint, send, decode):
+        """
+        :param send: 发送请求，返回requests.Response
+        :param decode: 把Response解码成json
+        :return: decode(send())，设置了instrument时记录耗时
+        :raises errors.ExchangeError: 网络错误、429、5xx或响应不是json
+        """
+        def _checked(response):
+            errors.check_status(response.status_code, VENUE, endpoint, response.headers)
+            try:
+                return decode(response)
+            except ValueError as e:
+                raise errors.ServerError(VENUE, endpoint, 'invalid json: {!r}'.format(response.content[:80]),
+                                         code=response.status_code) from e
+        try:
+            if self.instrument is None:
+                return _checked(send())
+            return self.instrument.request(endpoint, send, _checked, error_code)
+        except Exception as e:
+            if not errors.is_request_exception(e):
+                raise
+            raise errors.from_request_exception(e, VENUE, endpoint) from e
+
+    def _process(self, endpoint, parse, data):
+        """
+        :return: parse(data)，设置了instrument时记录耗时
+        """
+        if self.instrument is None:
+            return parse(data)
+        return self.instrument.process(endpoint, parse, data)
+
+    def _sign(self, params):
+        """
+        生成签名后的POST数据和请求头
+        :param params: 请求参数dict
+        :return: (body, headers)，body为已经urlencode的bytes，与签名内容完全一致
+        """
+        access_key, signer = self._keys()
+        payload = {
+            'nonce': self.nonces.next(), #要求的随机数，必须大于上一个请求参数nonce
+        }
+        payload.update(params)
+        paybytes = urlencode(payload).encode('utf8')
+        #使用hashlibsha512加密secret
+        mac = signer.copy()
+        mac.update(paybytes)
+        headers = {
+            'Key': access_key,
+            'Sign': mac.hexdigest(),
+            'Content-Type': 'application/x-www-form-urlencoded',
+        }
+        log.debug("signed %s", paybytes)
+        return paybytes, headers
     #apikey验证登录
-    def signedRequest(self, method="POST", path='/tradingApi', params={}):
+    def signedRequest(self, method="POST", path='/tradingApi', params={}, priority=rateLimit.PRIORITY_NORMAL,
+                      lazy=False):
         """
         All calls to the trading API are sent via HTTP POST to https://poloniex.com/
         tradingApi and must contain the following headers:
@@ -79,34 +321,35 @@ class Client_Poloniex():
         :param method: 请求方式：POST/GET,默认POST
         :param path: 请求路径
         :param params: 请求参数dict
+        :param priority: 限速时的优先级
+        :param lazy: True时较大的响应不解码，返回jsonCodec.Raw；使用orjson时总是完整解码，见jsonCodec.lazy_loads
         :return: 返回json格式的响应
         """
-        payload = {
-            'nonce': int(time.time() * 1000), #要求的随机数，必须大于上一个请求参数nonce
-        }
-        payload.update(params)
-        #print(payload)
-        paybytes = urllib.parse.urlencode(payload).encode('utf8')
-        # print(paybytes)
-        url = ENDPOINT + path
-        Key = self._public_key
-        secret = bytes(self._private_key.encode("utf-8"))
-        #使用hashlibsha512加密secret
-        sign = hmac.new(secret, paybytes, hashlib.sha512).hexdigest()
-        #print(sign)
-        headers = {
-            'Key': Key,
-            'Sign': sign,
-        }
-        response = self.ssion.request(method, url, headers=headers, data=payload)
-        data = json.loads(response.text)
-        return data
-    def get_depth(self, currencyPair, **kwargs):
+        url = self.endpoint + path
+
+        def _send():
+            with self.nonces.ordered():
+                body, headers = self._sign(params)
+                return self.ssion.request(method, url, headers=headers, data=body)
+
+        def _attempt():
+            for attempt in range(NONCE_RETRIES + 1):
+                if self.limiter is not None:
+                    self.limiter.acquire(rateLimit.PRIVATE, priority)
+                data = self._send(params.get('command', path), _send, _decode_lazy if lazy else _decode)
+                if not is_nonce_error(data):
+                    break
+                log.debug("nonce rejected, retry %s: %s", attempt + 1, data)
+            return data
+        return self.retry.call(_attempt, idempotent=False)
+    def get_depth(self, currencyPair, as_array=False, **kwargs):
         """
         get order book public
         :param currencyPair: symbol
+        :param as_array: True时bids/asks为(n, 2)的numpy float64数组，见depthArray
         :param kwargs:
-        :return:
+        :return: currencyPair为all时一次返回所有市场：{market: depth}，as_array时为depthArray.BulkDepth
+        :raises errors.ExchangeError: 获取失败
         """
         """
         Returns the order book for a given market, as well as a sequence number for
@@ -116,58 +359,55 @@ class Client_Poloniex():
         
         """
         currencyPair = self.compatible(currencyPair)
-        try:
-            params = {
-                "command":"returnOrderBook",
-                "currencyPair": currencyPair,
-                "depth": "25"}
-            params.update(kwargs)
-            data = self.http_request("GET", "/public", params)
-            #print(data)
-            bids = []
-            asks = []
-            #isFrozen = []
-            for i in data['bids']:
-                bids.append([float(i[0]), float(i[1])])
-            for i in data['asks']:
-                asks.append([float(i[0]), float(i[1])])
-            depth = {'bids': bids, 'asks': asks}
-            return depth
-        except Exception as e:
-            time.sleep(0.1)
-            print(e)
+        if as_array:
+            # numpy只在需要时import
+            import depthArray
+            depthArray.require_numpy()
+        params = {
+            "command":"returnOrderBook",
+            "currencyPair": currencyPair,
+            "depth": "25"}
+        params.update(kwargs)
+        data = self.http_request("GET", "/public", params)
+        #print(data)
+        if isinstance(data, dict) and data.get('error'):
+            raise errors.APIError(VENUE, "returnOrderBook", data['error'])
+        if currencyPair == 'all':
+            parse = depthArray.parse_all_depth if as_array else parse_all_depth
+        else:
+            parse = depthArray.parse_depth if as_array else parse_depth
+        return self._process("returnOrderBook", parse, data)
 
+    def get_book(self, currencyPair, book=None, **kwargs):
+        """
+        获取深度快照并更新到本地OrderBook
+        :param currencyPair: symbol
+        :param book: 已有的OrderBook，为None时新建
+        :return: OrderBook
+        :raises errors.ExchangeError: 获取失败，传入的book不变
+        """
+        depth = self.get_depth(currencyPair, **kwargs)
+        if book is None:
+            return OrderBook.from_depth(depth)
+        book.apply_snapshot(depth)
+        return book
 
     def balance(self):
         """
         Used to retrieve all balances from your account
+        :return: 统一格式的balance
+        :raises errors.ExchangeError: 请求失败或交易所返回错误
         """
-        try:
-            params = {
-                "command": "returnCompleteBalances",
-                "account": "all"
-            }
-            path = "/tradingApi"
-            data = self.signedRequest("POST", path, params=params)
-            #print(data)
-            balance = {'asset': {'total': 0, 'net': 0},
-                       'trade': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0},
-                       'frozen': {'btc': 0, 'usd': 0, 'cny': 0, 'eth': 0, 'ltc': 0, 'etc': 0}}
-
-            #获取键值
-            balance_trade_keys= balance['trade'].keys()
-            balance_frozen_keys = balance['frozen'].keys()
-
-            data['USD'] = data.pop('USDT')
-            data['CNY'] = data.pop('BITCNY')
-            for i in balance_trade_keys:
-                balance['trade'][i] = data[i.upper()]['available']
-            for i in balance_frozen_keys:
-                balance['frozen'][i] = data[i.upper()]['onOrders']
-            #print(balance)
-            return balance
-        except Exception as e:
-            return e
+        params = {
+            "command": "returnCompleteBalances",
+            "account": "all"
+        }
+        path = "/tradingApi"
+        data = self.signedRequest("POST", path, params=params, priority=rateLimit.PRIORITY_LOW)
+        #print(data)
+        if isinstance(data, dict) and data.get('error'):
+            raise errors.APIError(VENUE, "returnCompleteBalances", data['error'])
+        return self._process("returnCompleteBalances", parse_balance, data)
 
     def trade(self, trade_type, amount, price, symbol, test=False):
         """
@@ -178,20 +418,39 @@ class Client_Poloniex():
         :param symbol: 数字货币类型
         :param test:
         :return:
+        :raises errors.ValidationError: 参数不符合交易对的限制，请求没有发出
         """
-        symbol = self.compatible(symbol)
+        market = self.markets.get(symbol).validate(amount, price)
         side, orderType = trade_type.split('_')
         orderType = orderType.upper()
+        amount, price = market.format(amount, price)
         params = {
             'command': side,
-            'currencyPair': symbol,
-            'rate': formatNumber(price),
-            'Amount': str(amount),
+            'currencyPair': market.native,
+            'rate': price,
+            'Amount': amount,
         }
         #print(params)
         path = "/tradingApi"
         data = self.signedRequest("POST", path, params)
         return data
+
+    def place_orders(self, orders, concurrency=5, deadline=None):
+        """
+        并发下单，请求仍按nonce顺序发出，一个订单失败不影响其他订单
+        :param orders: [(trade_type, amount, price, symbol), ...]，或者trade()参数名组成的dict的list
+        :param concurrency: 最大并发数，即同时使用的keep-alive连接数
+        :param deadline: 整批的最长等待秒数，None为不限制
+        :return: {'placed': [序号], 'failed': [序号], 'unknown': [序号], 'elapsed': 秒,
+                  'results': 与orders顺序一致的[{'order', 'id', 'error', 'response'}]}，
+                 unknown的订单可能已经挂单，需要用openOrders对账，不能重新下单
+        """
+        def _place(order):
+            args, kwargs = batch.order_args(order)
+            return self.trade(*args, **kwargs)
+        return batch.place_orders(_place, orders, describe_order,
+                                  concurrency=concurrency, deadline=deadline)
+
     def cancel(self, orderNumber, currencyPair, **kwargs):
         """
         Cancel an active order.
@@ -216,15 +475,17 @@ class Client_Poloniex():
         params.update(kwargs)
         #print(params)
         path = "/tradingApi"
-        data = self.signedRequest("POST", path, params)
+        data = self.signedRequest("POST", path, params, priority=rateLimit.PRIORITY_HIGH)
         return data
 
-    def openOrders(self, symbol='all', **kwargs):
+    def openOrders(self, symbol='all', lazy=False, **kwargs):
         """
         Returns your open orders for a given market, specified by the "currencyPair"
         POST parameter, e.g. "BTC_XCP". Set "currencyPair" to "all" to return open
         orders for all markets
         :param symbol:
+        :param lazy: True时返回逐个解码订单的iterator，all时每个订单带有currencyPair，
+                     rate/amount等保持为字符串
         :param kwargs:
         :return:
         """
@@ -236,37 +497,58 @@ class Client_Poloniex():
         params.update(kwargs)
         #print(params)
         path = "/tradingApi"
-        data = self.signedRequest("POST", path, params)
+        data = self.signedRequest("POST", path, params, priority=rateLimit.PRIORITY_LOW, lazy=lazy)
+        if lazy and not error_code(data):
+            return self._iter_open_orders(data)
         return data
-    def cancel_all(self, order_id_list=None, currencyPair ='ETH_BTC'):
+
+    def open_orders(self, symbol):
+        """
+        :param symbol: 交易对
+        :return: parse_open_order格式的挂单list
+        :raises errors.APIError: 交易所返回错误
         """
+        orders = self.openOrders(symbol, lazy=True)
+        if isinstance(orders, dict):
+            raise errors.APIError(VENUE, "returnOpenOrders", orders.get('error', orders))
+        return [parse_open_order(i) for i in orders if isinstance(i, dict)]
 
-        :param order_id_list:
-        :param currencyPair:
-        :return:
+    @staticmethod
+    def _iter_open_orders(data):
+        for market, order in jsonCodec.iter_markets(data):
+            if market is not None:
+                order['currencyPair'] = market
+            yield order
+
+    def cancel_all(self, order_id_list=None, currencyPair ='ETH_BTC', concurrency=5, deadline=None):
+        """
+        并发撤单
+        :param order_id_list: 要撤的订单ID，为空时撤销currencyPair的全部挂单
+        :param currencyPair: all时每个挂单按它自己的交易对撤销；传入order_id_list时所有订单都使用这个交易对
+        :param concurrency: 最大并发数
+        :param deadline: 整批的最长等待秒数，None为不限制
+        :return: {'cancelled': [id], 'gone': [id], 'failed': [id], 'unknown': [id], 'results': {id: 响应},
+                  'elapsed': 秒}，unknown为deadline时仍在执行、结果未知的撤单，见batch.UNKNOWN
+        :raises errors.APIError: order_id_list为空且获取挂单失败，没有撤任何单
         """
         currencyPair = self.compatible(currencyPair)
+        markets = {}                # orderNumber -> 挂单所在的交易对
 
-        if order_id_list:
-            for i in order_id_list:
-                try:
-                    result = self.cancel(orderNumber=i, currencyPair=currencyPair)
-                    print(result)
-                except:
-                    continue
-        else:
-            order_id_list=[]
-            openorders = self.openOrders(currencyPair)
-            for i in openorders:
+        if not order_id_list:
+            order_id_list = []
+            orders = self.openOrders(currencyPair, lazy=True)
+            if isinstance(orders, dict):
+                raise errors.APIError(VENUE, "returnOpenOrders", orders.get('error', orders))
+            # 只需要orderNumber和交易对，逐个解码，all时不构建完整的对象树
+            for i in orders:
                 if type(i) == type({}):
-                    order_id_list.append(i['orderId'])
-                    #print(order_id_list)
-            for i in order_id_list:
-                try:
-                    result = self.cancel(orderNumber=i, currencyPair=currencyPair)
-                    print(result)
-                except Exception as e:
-                    continue
+                    order_id_list.append(i['orderNumber'])
+                    markets[i['orderNumber']] = i.get('currencyPair', currencyPair)
+
+        def _cancel(orderNumber):
+            return self.cancel(orderNumber=orderNumber, currencyPair=markets.get(orderNumber, currencyPair))
+        return batch.cancel_orders(_cancel, order_id_list, classify_cancel,
+                                   concurrency=concurrency, deadline=deadline)
 
 def main():
     #print(poloniex_service().get_depth("usd_btc"))
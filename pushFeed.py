@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+poloniex Push API深度推送
+
+一个WebSocket连接订阅多个交易对的book/trade频道，按seq顺序把增量应用到本地OrderBook。
+发现seq不连续时用client.get_depth的快照重新同步：同步期间收到的增量先缓存，
+快照到达后丢弃seq不大于快照的部分，其余按顺序应用。断线后重连并重新订阅。
+
+    feed = PushFeed(['usd_btc', 'btc_eth'], poloniex_service(), on_update=print)
+    feed.start()                        # 在后台线程中运行
+    feed.book('usd_btc').best_bid()
+
+    # 或者在asyncio中
+    async for update in feed:           # 需要另外运行feed.run()
+        ...
+
+消息格式(Push API v2)：
+    订阅    {"command": "subscribe", "channel": "USDT_BTC"}
+    推送    [channel_id, seq, [update, ...]]
+            ["i", {"currencyPair": "USDT_BTC", "orderBook": [{asks价格: 数量}, {bids价格: 数量}]}]
+            ["o", 1为bids/0为asks, "price", "size"]               size为0时删除该档位
+            ["t", "trade_id", 1为买/0为卖, "price", "size", timestamp]
+    心跳    [1010]
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import namedtuple
+import jsonCodec
+from orderBook import ASKS, BIDS, OrderBook
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+log = logging.getLogger(__name__)
+
+WS_URL = 'wss://api2.poloniex.com'
+HEARTBEAT = 1010
+
+SNAPSHOT = 'snapshot'
+BOOK = 'book'
+TRADE = 'trade'
+
+# 快照比已经收到的增量还旧时，重新获取快照前等待的秒数和最多次数
+RESYNC_DELAY = 0.2
+RESYNC_ATTEMPTS = 5
+
+
+class Update(namedtuple('Update', 'kind pair seq data')):
+    """
+    :param kind: SNAPSHOT/BOOK/TRADE
+    :param pair: 订阅时传入的交易对名字
+    :param seq: 推送的seq
+    :param data: SNAPSHOT为OrderBook；BOOK为[(side, price, size)]；
+                 TRADE为{'id', 'side', 'price', 'amount', 'ts'}
+    """
+    __slots__ = ()
+
+
+def _levels(side):
+    # orderBook中的{price: size}
+    return [[price, size] for price, size in side.items()]
+
+
+class _Channel():
+    """
+    一个交易对的同步状态
+    """
+    def __init__(self, pair, native):
+        self.pair = pair
+        self.native = native
+        self.book = OrderBook()
+        self.synced = False
+        self.buffer = None          # 重新同步期间缓存的(seq, updates)
+        self.depth = 0              # "i"快照的档位数
+
+
+class PushFeed():
+    """
+    :param pairs: 交易对list，例如['usd_btc', 'btc_eth']
+    :param client: Client_Poloniex或AsyncClient_Poloniex，用于交易对命名和重新同步
+    :param url: Push API地址
+    :param on_update: on_update(update)，在事件循环中调用，需要很快返回
+    :param queue_size: async for读取时缓存的最多更新数，满了以后丢弃最旧的
+    :param reconnect: 断线后重连前等待的秒数，None为不重连
+    :param kwargs: 重新同步时传给get_depth的参数，例如depth=100；
+                   没有depth时按"i"快照和本地深度中较多的档位数获取，不截断本地深度
+    """
+    def __init__(self, pairs, client, url=WS_URL, on_update=None, queue_size=10000, reconnect=1.0,
+                 **kwargs):
+        if websockets is None:
+            raise ImportError("PushFeed requires websockets")
+        self.client = client
+        self.url = url
+        self.on_update = on_update
+        self.queue_size = queue_size
+        self.reconnect = reconnect
+        self.kwargs = kwargs
+        self._channels = {}         # native -> _Channel
+        self._pairs = {}            # 订阅时的名字 -> _Channel
+        for pair in pairs:
+            native = client.compatible(pair)
+            channel = self._channels.setdefault(native, _Channel(pair, native))
+            self._pairs[pair] = channel
+        self._ids = {}              # channel_id -> _Channel，由"i"消息得到
+        self._queue = None
+        self._ws = None
+        self._closed = False
+        self._tasks = set()
+        self._loop = None
+        self._thread = None
+        self.messages = 0
+        self.heartbeats = 0
+        self.gaps = 0
+        self.resyncs = 0
+        self.reconnects = 0
+        self.dropped = 0
+        self.last_message = None
+
+    # ---- 读取 ----
+
+    def book(self, pair):
+        """
+        :return: pair的本地OrderBook；在其他线程中读取时可能看到正在应用的一组增量的中间状态
+        """
+        return self._pairs[pair].book
+
+    def synced(self, pair):
+        """
+        :return: pair的深度是否与交易所一致(已收到快照且没有未处理的gap)
+        """
+        return self._pairs[pair].synced
+
+    def __aiter__(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self
+
+    async def __anext__(self):
+        update = await self._queue.get()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+    def _emit(self, update):
+        if self.on_update is not None:
+            try:
+                self.on_update(update)
+            except Exception:
+                log.exception("on_update failed for %s", update.kind)
+        if self._queue is not None:
+            if self._queue.qsize() >= self.queue_size:
+                self._queue.get_nowait()
+                self.dropped += 1
+            self._queue.put_nowait(update)
+
+    # ---- 消息处理 ----
+
+    def on_message(self, message):
+        """
+        处理一条推送消息
+        :param message: str/bytes或已解码的list
+        """
+        if isinstance(message, (str, bytes)):
+            message = jsonCodec.loads(message)
+        self.messages += 1
+        self.last_message = time.time()
+        if message[0] == HEARTBEAT:
+            self.heartbeats += 1
+            return
+        if len(message) < 3 or not message[2]:
+            # 订阅确认等
+            return
+        channel_id, seq, updates = message[0], int(message[1]), message[2]
+        if updates[0][0] == 'i':
+            self._on_snapshot(channel_id, seq, updates[0][1])
+            return
+        channel = self._ids.get(channel_id)
+        if channel is not None:
+            self._process(channel, seq, updates)
+
+    def _process(self, channel, seq, updates):
+        if channel.buffer is not None:
+            channel.buffer.append((seq, updates))
+            return
+        if channel.book.seq is None:
+            # 还没有快照
+            return
+        if seq <= channel.book.seq:
+            # 重复或者早于快照的消息
+            return
+        if seq != channel.book.seq + 1:
+            self.gaps += 1
+            log.warning("%s seq gap: %s -> %s, resync", channel.native, channel.book.seq, seq)
+            channel.buffer = [(seq, updates)]
+            self._resync(channel)
+            return
+        self._apply(channel, seq, updates)
+
+    def _on_snapshot(self, channel_id, seq, data):
+        channel = self._channels.get(data['currencyPair'])
+        if channel is None:
+            return
+        self._ids[channel_id] = channel
+        asks, bids = data['orderBook']
+        channel.depth = max(len(asks), len(bids))
+        channel.book.seq = None
+        channel.book.apply_snapshot({ASKS: _levels(asks), BIDS: _levels(bids)}, seq)
+        channel.buffer = None
+        channel.synced = True
+        self._emit(Update(SNAPSHOT, channel.pair, seq, channel.book))
+
+    def _apply(self, channel, seq, updates):
+        diffs = []
+        trades = []
+        for u in updates:
+            if u[0] == 'o':
+                diffs.append((BIDS if u[1] == 1 else ASKS, float(u[2]), float(u[3])))
+            elif u[0] == 't':
+                trades.append({'id': str(u[1]), 'side': 'buy' if u[2] == 1 else 'sell',
+                               'price': float(u[3]), 'amount': float(u[4]), 'ts': u[5]})
+        channel.book.apply_diffs(diffs, seq)
+        if diffs:
+            self._emit(Update(BOOK, channel.pair, seq, diffs))
+        for trade in trades:
+            self._emit(Update(TRADE, channel.pair, seq, trade))
+
+    # ---- 重新同步 ----
+
+    def _resync(self, channel):
+        channel.synced = False
+        task = asyncio.get_running_loop().create_task(self._resync_task(channel))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _snapshot(self, channel):
+        kwargs = self.kwargs
+        if 'depth' not in kwargs:
+            book = channel.book
+            depth = max(channel.depth, len(book.side(BIDS)), len(book.side(ASKS)))
+            if depth:
+                kwargs = dict(kwargs, depth=str(depth))
+        get_depth = functools.partial(self.client.get_depth, channel.pair, **kwargs)
+        if inspect.iscoroutinefunction(self.client.get_depth):
+            return await get_depth()
+        return await asyncio.get_running_loop().run_in_executor(None, get_depth)
+
+    async def _resync_task(self, channel):
+        for attempt in range(RESYNC_ATTEMPTS):
+            try:
+                depth = await self._snapshot(channel)
+            except Exception as e:
+                log.warning("%s resync failed: %r", channel.native, e)
+                await asyncio.sleep(RESYNC_DELAY)
+                continue
+            if channel.buffer is None:
+                # 期间重连并收到了新的"i"快照
+                return
+            seq = int(depth['seq'])
+            pending = sorted(i for i in channel.buffer if i[0] > seq)
+            if pending and pending[0][0] != seq + 1:
+                # 快照比缓存的增量还旧，中间的增量已经丢失
+                await asyncio.sleep(RESYNC_DELAY)
+                continue
+            channel.book.seq = None
+            channel.book.apply_snapshot(depth, seq)
+            channel.buffer = None
+            self.resyncs += 1
+            self._emit(Update(SNAPSHOT, channel.pair, seq, channel.book))
+            channel.synced = True
+            for s, updates in pending:
+                # 缓存中还有gap时会再次重新同步
+                self._process(channel, s, updates)
+            return
+        log.error("%s resync gave up after %d attempts", channel.native, RESYNC_ATTEMPTS)
+        channel.buffer = None
+        channel.book.seq = None
+        # 等待重连后的"i"快照
+        if self._ws is not None:
+            await self._ws.close()
+
+    # ---- 连接 ----
+
+    async def run(self):
+        """
+        连接、订阅并处理推送，直到close()；reconnect为None时断线即返回
+        """
+        self._loop = asyncio.get_running_loop()
+        while not self._closed:
+            try:
+                async with websockets.connect(self.url, max_size=None) as ws:
+                    self._ws = ws
+                    for native in self._channels:
+                        await ws.send('{{"command": "subscribe", "channel": "{}"}}'.format(native))
+                    async for message in ws:
+                        self.on_message(message)
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                log.warning("push connection failed: %r", e)
+            finally:
+                self._ws = None
+                for channel in self._channels.values():
+                    channel.synced = False
+                    channel.buffer = None
+            if self._closed or self.reconnect is None:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect)
+        if self._queue is not None:
+            self._queue.put_nowait(None)
+
+    async def close(self):
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+
+    def start(self):
+        """
+        在后台线程中运行run()
+        """
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.close(), self._loop).result(timeout)
+        else:
+            self._closed = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait_synced(self, timeout=None):
+        """
+        等待所有交易对完成同步
+        :return: 是否全部同步
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(channel.synced for channel in self._channels.values()):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        """
+        :return: {'messages', 'heartbeats', 'gaps', 'resyncs', 'reconnects', 'dropped', 'age',
+                  'seq': {pair: seq}}，age为距离上一条消息的秒数
+        """
+        return {'messages': self.messages, 'heartbeats': self.heartbeats, 'gaps': self.gaps,
+                'resyncs': self.resyncs, 'reconnects': self.reconnects, 'dropped': self.dropped,
+                'age': None if self.last_message is None else time.time() - self.last_message,
+                'seq': {channel.pair: channel.book.seq for channel in self._channels.values()}}
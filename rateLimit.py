@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+客户端限速
+
+一个client的所有请求共用一个Scheduler：public和private接口各有一个token bucket，
+等待中的请求按优先级(撤单优先于查询余额)获得token。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# 优先级，数字越小越先执行
+PRIORITY_HIGH = 0       # cancel
+PRIORITY_NORMAL = 1     # trade
+PRIORITY_LOW = 2        # balance / openOrders 等查询
+
+PUBLIC = 'public'
+PRIVATE = 'private'
+
+# poloniex要求每秒不超过6个请求
+DEFAULT_RATE = 6
+
+
+class TokenBucket():
+    """
+    :param rate: 每秒产生的token数
+    :param burst: 最多积累的token数，默认1，即请求均匀分布，任意1秒内不超过rate个
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def wait_time(self, now):
+        """
+        :return: 距离有一个可用token的秒数，0表示现在就可以取
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Lane():
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.waiting = []
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue = 0
+        self.by_priority = {}
+
+
+class Scheduler():
+    """
+    :param public_rate: public接口每秒请求数
+    :param private_rate: private接口每秒请求数
+    """
+    def __init__(self, public_rate=DEFAULT_RATE, private_rate=DEFAULT_RATE, public_burst=1, private_burst=1):
+        self._lanes = {PUBLIC: _Lane(TokenBucket(public_rate, public_burst)),
+                       PRIVATE: _Lane(TokenBucket(private_rate, private_burst))}
+        self._cond = threading.Condition()
+        self._tickets = itertools.count()
+
+    def acquire(self, kind=PRIVATE, priority=PRIORITY_NORMAL):
+        """
+        阻塞直到可以发送一个请求
+        :param kind: PUBLIC/PRIVATE
+        :param priority: PRIORITY_HIGH/NORMAL/LOW
+        :return: 等待的秒数
+        """
+        lane = self._lanes[kind]
+        ticket = (priority, next(self._tickets))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(lane.waiting, ticket)
+            lane.max_queue = max(lane.max_queue, len(lane.waiting))
+            while True:
+                if lane.waiting[0] is ticket:
+                    delay = lane.bucket.wait_time(time.monotonic())
+                    if delay <= 0:
+                        lane.bucket.take()
+                        heapq.heappop(lane.waiting)
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+            waited = time.monotonic() - start
+            lane.requests += 1
+            lane.total_wait += waited
+            lane.max_wait = max(lane.max_wait, waited)
+            count, total = lane.by_priority.get(priority, (0, 0.0))
+            lane.by_priority[priority] = (count + 1, total + waited)
+        return waited
+
+    def metrics(self):
+        """
+        :return: {kind: {'requests', 'queue', 'max_queue', 'avg_wait', 'max_wait', 'avg_wait_by_priority'}}
+        """
+        with self._cond:
+            result = {}
+            for kind, lane in self._lanes.items():
+                result[kind] = {
+                    'requests': lane.requests,
+                    'queue': len(lane.waiting),
+                    'max_queue': lane.max_queue,
+                    'avg_wait': lane.total_wait / lane.requests if lane.requests else 0.0,
+                    'max_wait': lane.max_wait,
+                    'avg_wait_by_priority': {p: total / count for p, (count, total)
+                                             in lane.by_priority.items()},
+                }
+            return result
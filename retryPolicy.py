@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+重试和对冲请求
+
+RetryPolicy: 指数退避 + full jitter。public接口(幂等)重试所有retryable的错误；
+private接口(trade/cancel等)只重试确定没有被执行的请求(连接未建立、429)，
+连接断开或超时时无法知道订单是否已经提交，不重试，由调用方查询后决定。
+
+Hedger: 请求超过最近耗时的p95仍未返回时，再发一个相同的请求，使用先返回的结果。
+只用于public接口。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import errors
+
+
+class RetryPolicy():
+    """
+    :param attempts: 最多尝试次数(包括第一次)
+    :param base: 第一次重试的最长等待秒数，之后每次加倍
+    :param cap: 单次等待的上限秒数
+    """
+    def __init__(self, attempts=3, base=0.05, cap=1.0):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.retries = 0
+
+    def delay(self, attempt, error=None):
+        """
+        :param attempt: 已经失败的次数，从1开始
+        :return: 下次重试前等待的秒数
+        """
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            delay = max(delay, min(self.cap, retry_after))
+        return delay
+
+    def should_retry(self, error, idempotent):
+        if not isinstance(error, errors.ExchangeError) or not error.retryable:
+            return False
+        return idempotent or error.safe
+
+    def call(self, fn, idempotent=True):
+        """
+        :param fn: 无参数的函数，失败时抛出errors.ExchangeError
+        :param idempotent: False时只重试error.safe为True的错误
+        :return: fn()的结果
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except errors.ExchangeError as e:
+                attempt += 1
+                if attempt >= self.attempts or not self.should_retry(e, idempotent):
+                    raise
+                self.retries += 1
+                time.sleep(self.delay(attempt, e))
+
+    async def call_async(self, fn, idempotent=True):
+        """
+        call的asyncio版本
+        :param fn: 无参数的函数，返回coroutine
+        """
+        # 同步client不需要asyncio
+        import asyncio
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except errors.ExchangeError as e:
+                attempt += 1
+                if attempt >= self.attempts or not self.should_retry(e, idempotent):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.delay(attempt, e))
+
+
+# 不重试
+NO_RETRY = RetryPolicy(attempts=1)
+
+# 所有Hedger共用的线程池的线程数
+HEDGE_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _shared_executor():
+    """
+    :return: Hedger共用的线程池，第一次对冲时创建，进程退出时回收
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+        return _executor
+
+
+class Hedger():
+    """
+    :param quantile: 请求超过最近耗时的这个分位数仍未返回时发出第二个请求
+    :param window: 每个接口保留的最近耗时样本数
+    :param min_samples: 样本少于这个数时不对冲
+    :param max_workers: 执行请求的线程数，None为使用所有Hedger共用的线程池；
+                        指定时创建自己的线程池，不再使用时需要close()
+    """
+    def __init__(self, quantile=0.95, window=200, min_samples=20, max_workers=None):
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._own_executor = max_workers is not None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if self._own_executor else None
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _record(self, endpoint, seconds):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def threshold(self, endpoint):
+        """
+        :return: endpoint最近耗时的quantile分位数，样本不足时为None
+        """
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))]
+
+    def _submit(self, endpoint, fn):
+        start = time.monotonic()
+        future = (self._executor or _shared_executor()).submit(fn)
+
+        def _done(f):
+            # 每个请求各自的耗时，包括输掉的请求，避免对冲本身拉低p95
+            if not f.cancelled() and f.exception() is None:
+                self._record(endpoint, time.monotonic() - start)
+        future.add_done_callback(_done)
+        return future
+
+    def call(self, endpoint, fn):
+        """
+        :param endpoint: 接口名，每个接口单独统计耗时
+        :param fn: 无参数的函数，可能被并发调用两次
+        :return: 先成功返回的fn()结果；两个请求都失败时抛出后失败的异常
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.threshold(endpoint)
+        if delay is None:
+            start = time.monotonic()
+            result = fn()
+            self._record(endpoint, time.monotonic() - start)
+            return result
+        first = self._submit(endpoint, fn)
+        if wait([first], timeout=delay).done:
+            return first.result()
+        second = self._submit(endpoint, fn)
+        with self._lock:
+            self.hedged += 1
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    def stats(self):
+        """
+        :return: {'calls', 'hedged', 'hedge_wins', 'thresholds': {endpoint: 秒}}
+        """
+        thresholds = {endpoint: self.threshold(endpoint) for endpoint in list(self._samples)}
+        with self._lock:
+            return {'calls': self.calls, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins,
+                    'thresholds': thresholds}
+
+    def close(self):
+        """
+        关闭自己的线程池，共用的线程池不受影响
+        """
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
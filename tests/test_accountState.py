@@ -0,0 +1,116 @@
+# -*- coding:utf-8 -*-
+"""
+accountState：下单/撤单后立即冻结/解冻，对账期间有本地更新时放弃，drift分类，以及交易对写法统一
+"""
+
+import pytest
+import batch
+import paperExchange
+from accountState import AccountState
+from mockExchange import make_book
+
+
+def _state(**kwargs):
+    paper = paperExchange.paper_service('poloniex', balances={'usd': 10000, 'btc': 10})
+    paper.feed('usd_btc', make_book(5, as_string=True), ts=1)
+    return paper, AccountState(paper, ['usd_btc'], **kwargs)
+
+
+def test_place_and_cancel_update_local_state_without_requests():
+    paper, state = _state()
+    state.refresh()
+    result = state.trade('buy_LIMIT', 2, 99, 'USDT_BTC')
+    assert result['error'] is None
+    balance = state.balance()
+    assert balance['trade']['usd'] == pytest.approx(10000 - 198)
+    assert balance['frozen']['usd'] == pytest.approx(198)
+    # 调用方写成USDT_BTC，本地统一为self.pairs中的usd_btc
+    assert state.openOrders('usd_btc') == state.openOrders('USDT_BTC') == \
+        [{'id': result['id'], 'pair': 'usd_btc', 'side': 'buy', 'price': 99.0, 'amount': 2.0}]
+
+    report = state.cancel(result['id'], 'USDT_BTC')
+    assert report[batch.CANCELLED] == [result['id']]
+    assert state.openOrders() == []
+    assert state.balance()['frozen']['usd'] == pytest.approx(0)
+    # 本地状态与交易所一致
+    assert state.reconcile() is None
+    assert state.stats()['reconciles'] == 1
+
+
+def test_reconcile_matches_orders_fetched_under_tracked_spelling():
+    paper, state = _state()
+    state.refresh()
+    state.place_orders([('buy_LIMIT', 1, 99, 'USDT_BTC'), {'trade_type': 'sell_LIMIT', 'amount': 1,
+                                                           'price': 101, 'symbol': 'usd_btc'}])
+    assert state.reconcile() is None
+    assert sorted(o['pair'] for o in state.openOrders()) == ['usd_btc', 'usd_btc']
+
+
+def test_untracked_pair_is_rejected_before_any_request():
+    paper, state = _state()
+    state.refresh()
+    with pytest.raises(ValueError):
+        state.place_orders([('buy_LIMIT', 1, 99, 'usd_btc'), ('buy_LIMIT', 1, 0.01, 'btc_eth')])
+    assert paper.placed == 0
+    with pytest.raises(ValueError):
+        state.openOrders('btc_eth')
+
+
+def test_reconcile_skipped_while_order_is_in_flight():
+    paper, state = _state()
+    state.refresh()
+    place = paper.place_orders
+    seen = []
+
+    def _place(orders, **kwargs):
+        # 请求已经发出、结果还没更新到本地时对账
+        report = place(orders, **kwargs)
+        seen.append(state.reconcile())
+        return report
+    paper.place_orders = _place
+    state.trade('buy_LIMIT', 1, 99, 'usd_btc')
+    assert seen == [None]
+    assert state.stats()['skipped'] == 1 and state.stats()['reconciles'] == 0
+    assert len(state.openOrders()) == 1
+
+
+def test_reconcile_skipped_when_local_update_happens_during_fetch():
+    paper, state = _state()
+    state.refresh()
+    balance = paper.balance
+
+    def _balance():
+        result = balance()
+        state.trade('buy_LIMIT', 1, 99, 'usd_btc')
+        return result
+    paper.balance = _balance
+    assert state.reconcile() is None
+    paper.balance = balance
+    assert state.stats()['skipped'] == 1
+    # 下一次对账没有本地更新，以交易所为准且没有drift
+    assert state.reconcile() is None
+    assert state.stats()['reconciles'] == 1
+
+
+def test_drift_classification():
+    drifts = []
+    paper, state = _state(on_drift=drifts.append)
+    state.refresh()
+    kept = state.trade('buy_LIMIT', 2, 99.5, 'usd_btc')['id']
+    gone = state.trade('buy_LIMIT', 1, 99, 'usd_btc')['id']
+    # 绕过AccountState：在别处撤单、下单，以及部分成交
+    paper.cancel(gone, 'USDT_BTC')
+    other = paper.trade('sell_LIMIT', 1, 101, 'usd_btc')['orderNumber']
+    paper.feed('usd_btc', {'bids': [[98.0, 10]], 'asks': [[99.5, 0.5]]}, ts=2)
+
+    drift = state.reconcile()
+    assert drifts == [drift]
+    assert [o['id'] for o in drift['missing']] == [gone]
+    assert [o['id'] for o in drift['unknown']] == [other]
+    assert [(local['id'], local['amount'], remote['amount']) for local, remote in drift['changed']] == \
+        [(kept, 2.0, pytest.approx(1.5))]
+    assert 'frozen.btc' in drift['balance'] and 'trade.btc' in drift['balance']
+    # 以交易所为准，再次对账没有drift
+    assert sorted(o['id'] for o in state.openOrders()) == sorted([kept, other])
+    assert state.reconcile() is None
+    assert state.stats()['drifts'] == 1
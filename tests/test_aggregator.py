@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+"""
+aggregator：超时的交易所不拖住其他交易所，也不占满线程池；pair为dict时只查询其中的交易所
+"""
+
+import threading
+import time
+import aggregator
+
+
+class _Venue():
+    def __init__(self, name, price, release=None):
+        self.name = name
+        self.price = price
+        self.release = release
+        self.calls = 0
+
+    def compatible(self, pair):
+        return '{}:{}'.format(self.name, pair)
+
+    def get_depth(self, pair, **kwargs):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return {'bids': [[self.price - 1, 1.0]], 'asks': [[self.price + 1, 1.0]]}
+
+
+def _aggregator(release):
+    fast, slow = _Venue('fast', 100.0), _Venue('slow', 200.0, release)
+    return aggregator.Aggregator({'fast': fast, 'slow': slow}, timeout=0.05), fast, slow
+
+
+def test_timeout_keeps_other_venues_and_does_not_starve_pool():
+    release = threading.Event()
+    agg, fast, slow = _aggregator(release)
+    try:
+        for n in range(6):
+            book = agg.depth('eth_btc')
+            assert list(book['venues']) == ['fast']
+            assert book['bids'] == [[99.0, 1.0, 'fast']]
+            assert book['latency']['slow'] is None
+            expected = 'timeout' if n == 0 else 'skipped'
+            assert book['errors']['slow'].startswith(expected)
+        # 超时的请求还在执行时不再发新的请求
+        assert slow.calls == 1 and fast.calls == 6
+        # 超时的请求结束后恢复
+        release.set()
+        for _ in range(100):
+            if agg._abandoned['slow'] == 0:
+                break
+            time.sleep(0.01)
+        book = agg.depth('eth_btc')
+        assert book['errors'] == {}
+        assert [level[2] for level in book['asks']] == ['fast', 'slow']
+    finally:
+        release.set()
+        agg.close()
+
+
+def test_dict_pair_queries_only_listed_venues():
+    agg, fast, slow = _aggregator(None)
+    try:
+        assert agg.symbols({'fast': 'eth_btc'}) == {'fast': 'fast:eth_btc'}
+        book = agg.depth({'fast': 'eth_btc'})
+        assert book['symbols'] == {'fast': 'fast:eth_btc'}
+        assert list(book['venues']) == ['fast'] and book['errors'] == {}
+        assert slow.calls == 0
+    finally:
+        agg.close()
@@ -0,0 +1,102 @@
+# -*- coding:utf-8 -*-
+"""
+depthArray的批量吃单计算和arbScanner的跨交易所/三角套利价差
+"""
+
+import pytest
+import arbScanner
+import coocoinSDK
+import depthArray
+import poloniexSDK
+
+np = pytest.importorskip('numpy')
+
+
+def _random_books(rng, m):
+    books = []
+    for _ in range(m):
+        n = int(rng.integers(1, 8))
+        prices = 100 + np.cumsum(rng.uniform(0.01, 1, n))
+        books.append({'bids': [], 'asks': np.column_stack([prices, rng.uniform(0.1, 5, n)]).tolist()})
+    return books
+
+
+def test_proceeds_many_matches_scalar_proceeds():
+    rng = np.random.default_rng(1)
+    books = _random_books(rng, 50)
+    bulk = depthArray.stack(books)
+    totals = np.array([sum(q for _, q in book['asks']) for book in books])
+    amounts = totals * rng.uniform(0, 1, len(books))
+    expected = [depthArray.proceeds(np.asarray(book['asks']), a) for book, a in zip(books, amounts)]
+    assert depthArray.proceeds_many(bulk.asks, amounts) == pytest.approx(expected)
+    # 深度不足
+    assert np.isnan(depthArray.proceeds_many(bulk.asks, totals * 1.01)).all()
+
+
+def test_spend_many_matches_scalar_spend():
+    rng = np.random.default_rng(2)
+    books = _random_books(rng, 50)
+    bulk = depthArray.stack(books)
+    totals = np.array([sum(p * q for p, q in book['asks']) for book in books])
+    notionals = totals * rng.uniform(0, 1, len(books))
+    expected = [depthArray.spend(np.asarray(book['asks']), n) for book, n in zip(books, notionals)]
+    assert depthArray.spend_many(bulk.asks, notionals) == pytest.approx(expected)
+    assert np.isnan(depthArray.spend_many(bulk.asks, totals * 1.01)).all()
+
+
+def test_best_is_nan_without_depth():
+    bulk = depthArray.stack([{'bids': [[1.0, 2.0]], 'asks': []}, {'bids': [], 'asks': [[3.0, 1.0]]}])
+    assert np.isnan(depthArray.best(bulk.asks)[0])
+    assert depthArray.best(bulk.asks)[1] == 3.0
+
+
+def test_triangles():
+    markets = ('USDT_BTC', 'BTC_ETH', 'USDT_ETH', 'BTC_LTC')
+    assert arbScanner.triangles(markets, 'BTC') == [('USDT', 'USDT_BTC', False, 'ETH')]
+    assert arbScanner.triangles(markets, 'USDT') == [('BTC', 'USDT_BTC', True, 'ETH')]
+
+
+def test_cross_spreads_walks_both_books():
+    buy_asks = depthArray.stack([{'bids': [], 'asks': [[0.05, 10], [0.06, 100]]}]).asks
+    sell_bids = depthArray.stack([{'bids': [[0.07, 100]], 'asks': []}]).bids
+    spread, profit = arbScanner.cross_spreads(buy_asks, sell_bids, 1.0, 0.0, 0.01)
+    # 1 btc按最优价折算20 eth：10 eth @0.05 + 10 eth @0.06
+    cost, received = 0.5 + 0.6, 20 * 0.07 * 0.99
+    assert spread[0] == pytest.approx(received / cost - 1)
+    assert profit[0] == pytest.approx(received - cost)
+
+
+@pytest.fixture
+def scanner():
+    scanner = arbScanner.ArbScanner(poloniexSDK.Client_Poloniex('k', 's'), coocoinSDK.Client_Coolcoin('k', 's'),
+                                    coins=['eth'], fees={'poloniex': 0.0, 'coolcoin': 0.0})
+    yield scanner
+    scanner.close()
+
+
+POLONIEX = {
+    'USDT_BTC': {'bids': [[10000, 10]], 'asks': [[10010, 10]], 'isFrozen': '0'},
+    'USDT_ETH': {'bids': [[499, 100]], 'asks': [[500, 100]], 'isFrozen': '0'},
+    'BTC_ETH': {'bids': [[0.052, 100]], 'asks': [[0.0525, 100]], 'isFrozen': '0'},
+}
+
+
+def test_evaluate_triangles(scanner):
+    result = scanner.evaluate(depthArray.stack(POLONIEX), None, size=1.0, min_spread=-1)
+    assert [o.kind for o in result] == [arbScanner.TRIANGLE] * 2
+    forward, backward = result
+    # btc -> 10000 usdt -> 20 eth -> 1.04 btc
+    assert forward.path == ('sell USDT_BTC', 'buy USDT_ETH', 'sell BTC_ETH')
+    assert forward.spread == pytest.approx(0.04)
+    assert backward.path == ('buy BTC_ETH', 'sell USDT_ETH', 'buy USDT_BTC')
+    assert backward.spread == pytest.approx(1 / 0.0525 * 499 / 10010 - 1)
+
+
+def test_evaluate_cross_and_frozen_markets(scanner):
+    coolcoin = depthArray.stack([{'bids': [[0.0505, 100]], 'asks': [[0.051, 100]]}], ['eth'])
+    result = scanner.evaluate(depthArray.stack(POLONIEX), coolcoin, size=1.0, min_spread=0.01)
+    cross = [o for o in result if o.kind == arbScanner.CROSS]
+    assert [o.path for o in cross] == [('buy coolcoin eth', 'sell poloniex BTC_ETH')]
+    assert cross[0].spread == pytest.approx(0.052 / 0.051 - 1)
+    frozen = dict(POLONIEX, BTC_ETH=dict(POLONIEX['BTC_ETH'], isFrozen='1'))
+    assert scanner.evaluate(depthArray.stack(frozen), coolcoin, size=1.0, min_spread=-1) == []
@@ -0,0 +1,91 @@
+# -*- coding:utf-8 -*-
+"""
+asyncSDK：place_orders的结果与订单一一对应，部分失败和deadline时的UNKNOWN，以及签名请求不等响应就发送下一个
+"""
+
+import asyncio
+import time
+import pytest
+import asyncSDK
+import batch
+import errors
+import marketRegistry
+import nonce
+import retryPolicy
+from mockExchange import MockExchange
+
+
+def _place(exchange, orders, **kwargs):
+    async def _run():
+        async with asyncSDK.AsyncClient_Poloniex('k', 's', endpoint=exchange.url) as client:
+            return await client.place_orders(orders, **kwargs)
+    return asyncio.run(_run())
+
+
+def test_results_follow_order_positions_with_partial_failure():
+    # 价格各不相同，按交易所记录的价格确认id对应的订单；第2个金额太小，没有发出就被拒绝
+    orders = [('buy_LIMIT', 1, '{:.2f}'.format(90 + i), 'usd_btc') for i in range(6)]
+    orders[2] = ('buy_LIMIT', 0.00001, '1.00', 'usd_btc')
+    with MockExchange(secrets={'k': 's'}, jitter=0.001) as exchange:
+        report = _place(exchange, orders, concurrency=3)
+        assert report[batch.PLACED] == [0, 1, 3, 4, 5]
+        assert report[batch.FAILED] == [2]
+        assert report['results'][2]['id'] is None
+        assert isinstance(report['results'][2]['error'], errors.ValidationError)
+        assert len(exchange.orders) == 5
+        for index in report[batch.PLACED]:
+            result = report['results'][index]
+            assert result['order'] == orders[index]
+            assert float(exchange.orders[int(result['id'])]['price']) == float(orders[index][2])
+
+
+def test_deadline_reports_started_orders_as_unknown():
+    orders = [('buy_LIMIT', 1, '{:.2f}'.format(90 + i), 'usd_btc') for i in range(4)]
+    with MockExchange(secrets={'k': 's'}, strict_nonce=False, latency=0.5) as exchange:
+        report = _place(exchange, orders, concurrency=2, deadline=0.1)
+        # 已经发出的订单可能已经挂单，没有发出的确定失败
+        assert report[batch.UNKNOWN] == [0, 1]
+        assert report[batch.FAILED] == [2, 3]
+        assert all(isinstance(r['error'], batch.DeadlineExceeded) for r in report['results'])
+
+
+def test_signed_requests_overlap_on_one_key():
+    orders = [('buy_LIMIT', 1, '{:.2f}'.format(90 + i), 'usd_btc') for i in range(5)]
+    with MockExchange(secrets={'k': 's'}, strict_nonce=False, latency=0.3) as exchange:
+        start = time.time()
+        report = _place(exchange, orders, concurrency=5)
+        elapsed = time.time() - start
+    assert report[batch.PLACED] == [0, 1, 2, 3, 4]
+    # 逐个等待响应需要5 * 0.3秒
+    assert elapsed < 0.9
+
+
+def test_constructor_accepts_shared_options_and_rejects_sync_only():
+    markets, nonces, retry = marketRegistry.MarketRegistry('coolcoin'), nonce.NonceGenerator(), retryPolicy.NO_RETRY
+    client = asyncSDK.AsyncClient_Coolcoin('k', 's', nonces=nonces, retry=retry, markets=markets)
+    assert (client.markets, client.nonces, client.retry) == (markets, nonces, retry)
+    # 默认值None可以照样传入
+    asyncSDK.AsyncClient_Poloniex('k', 's', cache=None, hedge=None)
+    for name in asyncSDK.SYNC_ONLY:
+        with pytest.raises(TypeError, match=name):
+            asyncSDK.AsyncClient_Poloniex('k', 's', **{name: object()})
+    with pytest.raises(TypeError, match='unexpected'):
+        asyncSDK.AsyncClient_Coolcoin('k', 's', limiterr=None)
+
+
+def test_run_batch_waits_for_cancelled_tasks():
+    cleaned = []
+
+    async def _slow(i):
+        try:
+            await asyncio.sleep(5)
+        finally:
+            cleaned.append(i)
+
+    async def _run():
+        outcomes = await asyncSDK.run_batch(_slow, range(3), concurrency=2, deadline=0.05)
+        # 返回时被取消的task已经结束
+        return outcomes, list(cleaned)
+    outcomes, done = asyncio.run(_run())
+    assert sorted(done) == [0, 1]
+    assert [error.started for _, error in outcomes] == [True, True, False]
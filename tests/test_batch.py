@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+"""
+batch：deadline时的FAILED/UNKNOWN分类、撤单响应归类，以及poloniex按交易对撤销all的挂单
+"""
+
+import asyncio
+import threading
+import asyncSDK
+import batch
+import coocoinSDK
+import poloniexSDK
+from mockExchange import MockExchange
+
+
+def test_run_batch_returns_results_in_order():
+    outcomes = batch.run_batch(lambda i: i * 2, range(5), concurrency=3)
+    assert outcomes == [(0, None), (2, None), (4, None), (6, None), (8, None)]
+
+
+def test_run_batch_keeps_errors_per_item():
+    def _fn(i):
+        if i == 1:
+            raise ValueError('bad')
+        return i
+    outcomes = batch.run_batch(_fn, [0, 1, 2])
+    assert outcomes[0] == (0, None) and outcomes[2] == (2, None)
+    assert isinstance(outcomes[1][1], ValueError)
+
+
+def test_deadline_separates_started_from_not_started():
+    release = threading.Event()
+
+    def _slow(i):
+        release.wait(2)
+        return i
+    try:
+        outcomes = batch.run_batch(_slow, range(4), concurrency=2, deadline=0.1)
+    finally:
+        release.set()
+    errors = [error for _, error in outcomes]
+    assert all(isinstance(e, batch.DeadlineExceeded) for e in errors)
+    assert [e.started for e in errors] == [True, True, False, False]
+    report = batch.cancel_report(['a', 'b', 'c', 'd'], outcomes, poloniexSDK.classify_cancel)
+    assert report[batch.UNKNOWN] == ['a', 'b']
+    assert report[batch.FAILED] == ['c', 'd']
+
+
+def test_place_report_unknown_is_not_failed():
+    outcomes = [({'orderNumber': '7'}, None), ({'error': 'Not enough BTC.'}, None),
+                (None, batch.DeadlineExceeded('late', started=True))]
+    report = batch.place_report(['o1', 'o2', 'o3'], outcomes, poloniexSDK.describe_order)
+    assert (report[batch.PLACED], report[batch.FAILED], report[batch.UNKNOWN]) == ([0], [1], [2])
+    assert report['results'][0]['id'] == '7'
+    assert report['results'][1]['error'] == 'Not enough BTC.'
+
+
+def test_classify_cancel():
+    assert poloniexSDK.classify_cancel({'success': 1}) == batch.CANCELLED
+    assert poloniexSDK.classify_cancel({'success': 0, 'error': 'Invalid order number, or you are not '
+                                                              'the person who placed the order.'}) == batch.GONE
+    assert poloniexSDK.classify_cancel({'error': 'Nonce must be greater than 1.'}) == batch.FAILED
+    assert poloniexSDK.classify_cancel(None) == batch.FAILED
+    assert coocoinSDK.classify_cancel({'result': True, 'code': 0}) == batch.CANCELLED
+    assert coocoinSDK.classify_cancel({'result': False, 'code': '203'}) == batch.GONE
+    assert coocoinSDK.classify_cancel({'result': False, 'code': '104'}) == batch.FAILED
+
+
+def _orders_on_two_markets(exchange):
+    return [exchange.add_order('USDT_BTC', 'buy', '90.0', '1'), exchange.add_order('BTC_ETH', 'sell', '0.5', '2')]
+
+
+def test_cancel_all_markets_uses_each_orders_pair():
+    with MockExchange() as exchange:
+        ids = _orders_on_two_markets(exchange)
+        client = poloniexSDK.Client_Poloniex('k', 's', endpoint=exchange.url)
+        report = client.cancel_all(currencyPair='all')
+        assert sorted(report[batch.CANCELLED]) == sorted(str(i) for i in ids)
+        assert exchange.orders == {}
+
+
+def test_async_cancel_all_markets_uses_each_orders_pair():
+    with MockExchange() as exchange:
+        ids = _orders_on_two_markets(exchange)
+
+        async def _run():
+            async with asyncSDK.AsyncClient_Poloniex('k', 's', endpoint=exchange.url) as client:
+                return await client.cancel_all(currencyPair='all')
+        report = asyncio.run(_run())
+        assert sorted(report[batch.CANCELLED]) == sorted(str(i) for i in ids)
+        assert exchange.orders == {}
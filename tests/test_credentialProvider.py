@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+"""
+credentialProvider：default()中环境变量优先于accountConfig，chain跳过找不到的来源，
+第一次成功后缓存，错误信息不包含key
+"""
+
+import json
+import sys
+import types
+import pytest
+import credentialProvider
+from credentialProvider import CredentialsError
+
+
+@pytest.fixture
+def config(monkeypatch):
+    module = types.ModuleType('accountConfig')
+    module.POLONIEX = {'USD_1': {'ACCESS_KEY': 'config-access', 'SECRET_KEY': 'config-secret'}}
+    monkeypatch.setitem(sys.modules, 'accountConfig', module)
+    return module
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ('ACCESS_KEY', 'SECRET_KEY'):
+        monkeypatch.delenv('EXCHANGE_USD_1_' + name, raising=False)
+
+    def _set(access, secret):
+        monkeypatch.setenv('EXCHANGE_USD_1_ACCESS_KEY', access)
+        monkeypatch.setenv('EXCHANGE_USD_1_SECRET_KEY', secret)
+    return _set
+
+
+def test_default_prefers_env_over_config(env, config):
+    env('env-access', 'env-secret')
+    assert credentialProvider.default('usd_1')() == ('env-access', 'env-secret')
+
+
+def test_default_falls_back_to_config(env, config, monkeypatch):
+    assert credentialProvider.default('USD_1')() == ('config-access', 'config-secret')
+    # 只设置了一半的环境变量不算找到
+    monkeypatch.setenv('EXCHANGE_USD_1_ACCESS_KEY', 'env-access')
+    assert credentialProvider.default('USD_1')() == ('config-access', 'config-secret')
+
+
+def test_nothing_found(env, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'accountConfig', None)
+    provider = credentialProvider.default('USD_1')
+    with pytest.raises(CredentialsError) as raised:
+        provider()
+    assert 'EXCHANGE_USD_1_' in str(raised.value) and 'accountConfig' in str(raised.value)
+
+
+def test_chain_order_and_errors_are_skipped(tmp_path):
+    calls = []
+
+    def _vault():
+        calls.append('vault')
+        return 'vault-access', 'vault-secret'
+    broken = credentialProvider.from_file(str(tmp_path / 'missing.json'), 'USD_1')
+    path = tmp_path / 'keys.json'
+    path.write_text(json.dumps({'USD_1': {'ACCESS_KEY': 'file-access', 'SECRET_KEY': 'file-secret'}}))
+    provider = credentialProvider.chain(broken, credentialProvider.from_file(str(path), 'USD_1'),
+                                        credentialProvider.from_callable(_vault))
+    assert provider() == ('file-access', 'file-secret')
+    assert calls == []
+    provider = credentialProvider.chain(broken, credentialProvider.from_callable(_vault),
+                                        credentialProvider.from_file(str(path), 'USD_1'))
+    assert provider() == ('vault-access', 'vault-secret')
+
+
+def test_first_result_is_cached_and_not_in_repr():
+    calls = []
+
+    def _vault():
+        calls.append(1)
+        return 'access', 'secret'
+    provider = credentialProvider.from_callable(_vault)
+    assert provider() == provider() == ('access', 'secret')
+    assert len(calls) == 1
+    assert 'secret' not in repr(provider) and '_vault' in repr(provider)
+    # 失败不缓存，下次调用重新获取
+    keys = iter([None, ('access', 'secret')])
+    retried = credentialProvider.from_callable(lambda: next(keys))
+    with pytest.raises(CredentialsError):
+        retried()
+    assert retried() == ('access', 'secret')
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+"""
+depthArray：字符串价格的转换，吃单的vwap、逐档成交量、滑点，以及get_depth(as_array=True)
+"""
+
+import math
+import pytest
+import depthArray
+import poloniexSDK
+from mockExchange import MockExchange, make_book
+
+np = pytest.importorskip('numpy')
+
+ASKS = [['100.0', 1], ['101.0', 2], ['103.0', 3]]
+
+
+def test_parse_depth_converts_strings_and_keeps_seq():
+    depth = depthArray.parse_depth({'bids': [['99.5', 2]], 'asks': ASKS, 'seq': 42, 'isFrozen': '0'})
+    assert depth['asks'].dtype == np.float64 and depth['asks'].shape == (3, 2)
+    assert depth['bids'].tolist() == [[99.5, 2.0]]
+    assert depth['seq'] == 42
+    # prices/sizes是视图
+    assert np.shares_memory(depthArray.prices(depth['asks']), depth['asks'])
+    assert depthArray.to_array([]).shape == (0, 2)
+
+
+def test_fill_walks_levels_from_best():
+    asks = depthArray.to_array(ASKS)
+    assert depthArray.fill(asks, 2.5).tolist() == [1.0, 1.5, 0.0]
+    assert depthArray.fill(asks, 10).tolist() == [1.0, 2.0, 3.0]
+    assert depthArray.cumulative(asks).tolist() == [1.0, 3.0, 6.0]
+
+
+def test_vwap_and_slippage():
+    asks = depthArray.to_array(ASKS)
+    assert depthArray.vwap(asks, 0.5) == 100.0
+    assert depthArray.vwap(asks, 2.5) == pytest.approx((100 + 1.5 * 101) / 2.5)
+    assert depthArray.slippage(asks, 2.5) == pytest.approx(((100 + 1.5 * 101) / 2.5 - 100) / 100)
+    # 深度不足
+    assert math.isnan(depthArray.vwap(asks, 6.5))
+    assert math.isnan(depthArray.slippage(depthArray.to_array([]), 1))
+
+
+def test_proceeds_spend_mid_spread():
+    depth = depthArray.parse_depth({'bids': [['99.0', 1], ['98.0', 1]], 'asks': ASKS})
+    assert depthArray.proceeds(depth['bids'], 1.5) == pytest.approx(99 + 0.5 * 98)
+    # 用201买：100买1个，101买1个
+    assert depthArray.spend(depth['asks'], 201) == pytest.approx(2.0)
+    assert depthArray.mid(depth) == 99.5
+    assert depthArray.spread(depth) == 1.0
+    assert math.isnan(depthArray.mid({'bids': depth['bids'], 'asks': depthArray.to_array([])}))
+
+
+def test_get_depth_as_array_matches_list_depth():
+    with MockExchange() as exchange:
+        client = poloniexSDK.Client_Poloniex(endpoint=exchange.url)
+        array = client.get_depth('usd_btc', as_array=True)
+        listed = client.get_depth('usd_btc')
+    assert isinstance(array['asks'], np.ndarray)
+    assert array['asks'].tolist() == [[float(p), float(q)] for p, q in listed['asks']]
+    assert array['bids'][0, 0] == float(make_book(25)['bids'][0][0])
@@ -0,0 +1,85 @@
+# -*- coding:utf-8 -*-
+"""
+depthPoller：后台刷新和就绪等待，max_age检查，出错时保留上一个Snapshot，慢请求不重复提交
+"""
+
+import threading
+import time
+import pytest
+from depthPoller import DepthPoller, StaleError
+
+
+class _Client():
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def get_depth(self, pair, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            n = self.calls
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise ValueError('down')
+            return {'bids': [[100.0 - n, 1.0]], 'asks': [[101.0, 1.0]], 'pair': pair, 'kwargs': kwargs}
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_background_refresh_publishes_snapshots():
+    client = _Client()
+    updates = []
+    with DepthPoller({'paper': client}, ['usd_btc', 'eth_btc'], interval=0.02, as_array=False,
+                     on_update=lambda venue, pair, snapshot: updates.append((pair, snapshot.seq))) as poller:
+        assert poller.wait_ready(timeout=2)
+        first = poller.snapshot('paper', 'usd_btc')
+        while poller.snapshot('paper', 'usd_btc').seq < first.seq + 3:
+            time.sleep(0.005)
+    depth = poller.depth('paper', 'eth_btc')
+    assert depth['pair'] == 'eth_btc' and depth['kwargs'] == {'as_array': False}
+    assert ('usd_btc', 1) in updates and ('eth_btc', 1) in updates
+    stats = poller.stats()[('paper', 'usd_btc')]
+    assert stats['refreshes'] == stats['seq'] >= 4 and stats['errors'] == 0
+
+
+def test_max_age_and_missing_depth():
+    poller = DepthPoller({'paper': _Client()}, ['usd_btc'])
+    with pytest.raises(StaleError):
+        poller.depth('paper', 'usd_btc')
+    assert poller.wait_ready(timeout=0.01) is False
+    poller.refresh('paper', 'usd_btc')
+    assert poller.depth('paper', 'usd_btc', max_age=5)['bids'] == [[99.0, 1.0]]
+    time.sleep(0.03)
+    with pytest.raises(StaleError):
+        poller.depth('paper', 'usd_btc', max_age=0.01)
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    client = _Client()
+    poller = DepthPoller({'paper': client}, ['usd_btc'])
+    snapshot = poller.refresh('paper', 'usd_btc')
+    client.fail = True
+    with pytest.raises(ValueError):
+        poller.refresh('paper', 'usd_btc')
+    assert poller.snapshot('paper', 'usd_btc') is snapshot
+    stats = poller.stats()[('paper', 'usd_btc')]
+    assert stats['errors'] == 1 and 'down' in stats['last_error']
+
+
+def test_slow_pair_is_not_submitted_twice():
+    # get_depth比interval慢得多，同一个交易对同时只有一个请求，lag随之增加
+    client = _Client(delay=0.1)
+    with DepthPoller({'paper': client}, ['usd_btc'], interval=0.01, max_workers=4) as poller:
+        time.sleep(0.35)
+    assert client.max_running == 1
+    stats = poller.stats()[('paper', 'usd_btc')]
+    assert 2 <= stats['refreshes'] <= 4
+    assert stats['lag_max'] >= 0.05
@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+"""
+depthRecorder：录制和按时间范围回放，超过levels的档位丢弃，以及写了一半的记录的截断
+"""
+
+import os
+import pytest
+import depthRecorder
+from depthRecorder import DepthReader, DepthRecorder
+from mockExchange import make_book
+
+np = pytest.importorskip('numpy')
+
+
+def _record(path, count, levels=5):
+    with DepthRecorder(path, levels=levels) as recorder:
+        for i in range(count):
+            recorder.append(make_book(3 + i, mid=100.0 + i), ts=1000.0 + i)
+
+
+def test_replay_round_trip(tmp_path):
+    path = str(tmp_path / 'depth.bin')
+    _record(path, 4)
+    reader = DepthReader(path)
+    assert len(reader) == 4 and reader.levels == 5
+    replayed = list(reader.replay())
+    assert [ts for ts, _ in replayed] == [1000.0, 1001.0, 1002.0, 1003.0]
+    ts, depth = replayed[1]
+    expected = make_book(4, mid=101.0)
+    assert depth['bids'].tolist() == [[float(p), q] for p, q in expected['bids']]
+    # 超过levels的档位丢弃
+    assert len(replayed[3][1]['asks']) == 5
+
+
+def test_between_is_half_open(tmp_path):
+    path = str(tmp_path / 'depth.bin')
+    _record(path, 5)
+    reader = DepthReader(path)
+    assert reader.between(1001.0, 1003.0)['ts'].tolist() == [1001.0, 1002.0]
+    assert reader.between(start=1003.5)['ts'].tolist() == [1004.0]
+    assert len(reader.between(2000.0)) == 0
+
+
+def test_torn_record_is_ignored_and_truncated(tmp_path):
+    path = str(tmp_path / 'depth.bin')
+    _record(path, 3)
+    record_size = depthRecorder.record_dtype(5).itemsize
+    # 模拟写到一半时进程退出
+    with open(path, 'ab') as f:
+        f.write(b'\x01' * (record_size // 2))
+    assert len(DepthReader(path)) == 3
+    # 追加打开时截掉不完整的记录，新记录仍然对齐
+    with DepthRecorder(path, levels=25) as recorder:
+        assert recorder.levels == 5
+        recorder.append({'bids': [[99.0, 1.0]], 'asks': []}, ts=2000.0)
+    assert os.path.getsize(path) == depthRecorder.HEADER_SIZE + 4 * record_size
+    reader = DepthReader(path)
+    assert reader.ts.tolist() == [1000.0, 1001.0, 1002.0, 2000.0]
+    last = DepthReader.to_depth(reader.records[-1])
+    assert last['bids'].tolist() == [[99.0, 1.0]] and last['asks'].shape == (0, 2)
+
+
+def test_empty_and_foreign_files(tmp_path):
+    path = str(tmp_path / 'depth.bin')
+    DepthRecorder(path).close()
+    assert len(DepthReader(path)) == 0 and list(DepthReader(path).replay()) == []
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'x' * 128)
+    with pytest.raises(ValueError):
+        DepthReader(str(other))
@@ -0,0 +1,149 @@
+# -*- coding:utf-8 -*-
+"""
+gateway：长度前缀的帧(分段到达、超长)，METHODS白名单，ExchangeError跨进程还原，
+一个连接上的并发请求，以及socket文件权限
+"""
+
+import json
+import os
+import socket
+import stat
+import threading
+import time
+import pytest
+import errors
+import gateway
+
+
+class _Client():
+    """
+    代替交易所client，方法名在gateway.METHODS中
+    """
+    def __init__(self):
+        self.barrier = threading.Barrier(3, timeout=5)
+
+    def compatible(self, symbol):
+        return symbol.upper()
+
+    def get_depth(self, symbol, delay=0.0, **kwargs):
+        time.sleep(delay)
+        return {'symbol': symbol}
+
+    def balance(self):
+        # 三个请求同时在执行时才能都通过
+        self.barrier.wait()
+        return {'trade': {'btc': 1.0}}
+
+    def trade(self, trade_type, amount, price, symbol):
+        raise errors.ValidationError('poloniex', 'USDT_BTC', 'too many decimals', code='206')
+
+    def cancel(self, order_id, symbol):
+        return errors.RateLimitError('poloniex', 'cancelOrder', 'slow down', retry_after=1.5)
+
+    def openOrders(self, symbol='all', size=0):
+        return ['x' * size]
+
+    def credentials(self):
+        return 'secret'
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = str(tmp_path / 'gw.sock')
+    with gateway.Gateway({'paper': _Client()}, path) as gw:
+        with gateway.GatewayClient(path, timeout=5) as client:
+            yield gw, client
+
+
+def _frame(message):
+    body = json.dumps([message]).encode('utf-8')
+    return gateway.HEADER.pack(len(body)) + body
+
+
+def _read_frame(sock):
+    header = gateway._recv_exact(sock, gateway.HEADER.size)
+    if header is None:
+        return None
+    return json.loads(gateway._recv_exact(sock, gateway.HEADER.unpack(header)[0]))
+
+
+def test_socket_is_owner_only(served):
+    gw, _ = served
+    assert stat.S_IMODE(os.stat(gw.path).st_mode) == 0o600
+
+
+def test_frame_arriving_in_pieces(served):
+    gw, _ = served
+    data = _frame({'id': 7, 'client': 'paper', 'method': 'compatible', 'args': ['usd_btc']})
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(gw.path)
+        # 长度也被拆开
+        for i in range(0, len(data), 3):
+            sock.sendall(data[i:i + 3])
+            time.sleep(0.001)
+        sock.settimeout(5)
+        assert _read_frame(sock) == [{'id': 7, 'result': 'USD_BTC'}]
+
+
+def test_oversized_frame_closes_connection(served, monkeypatch):
+    gw, client = served
+    monkeypatch.setattr(gateway, 'MAX_FRAME', 1024)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(gw.path)
+        sock.settimeout(5)
+        sock.sendall(gateway.HEADER.pack(1025))
+        assert _read_frame(sock) is None
+    # 超长的响应换成error，连接仍然可用
+    with pytest.raises(gateway.GatewayError, match='MAX_FRAME'):
+        client.call('paper', 'openOrders', size=2000)
+    assert client.call('paper', 'openOrders', size=10) == ['x' * 10]
+
+
+def test_only_listed_methods_are_callable(served):
+    _, client = served
+    for method in ('credentials', '__class__', '_keys', 'signedRequest'):
+        with pytest.raises(gateway.GatewayError, match='not available'):
+            client.call('paper', method)
+    with pytest.raises(gateway.GatewayError, match='unknown client'):
+        client.call('live', 'balance')
+    with pytest.raises(AttributeError):
+        client.client('paper').credentials
+
+
+def test_exchange_errors_keep_type_code_and_safe(served):
+    _, client = served
+    with pytest.raises(errors.ValidationError) as raised:
+        client.client('paper').trade('buy_LIMIT', 0.123456789, 9000, 'usd_btc')
+    assert raised.value.code == '206' and raised.value.safe and raised.value.venue == 'poloniex'
+    # 返回而不是抛出的异常仍然作为返回值
+    returned = client.call('paper', 'cancel', '1', 'usd_btc')
+    assert isinstance(returned, errors.RateLimitError)
+    assert returned.code == 429 and returned.safe
+
+
+@pytest.mark.parametrize('error', [
+    errors.NetworkError('coolcoin', '/api/v1/balance/', 'reset', safe=True),
+    errors.RateLimitError('poloniex', 'returnBalances', '429', retry_after=2.0),
+    errors.ServerError('poloniex', 'buy', '502'),
+    errors.APIError('coolcoin', '/api/v1/trade_add/', '余额不足', code='200'),
+    errors.ValidationError('poloniex', 'USDT_BTC', 'below minimum', code='204'),
+])
+def test_error_dict_round_trip(error):
+    restored = errors.from_dict(json.loads(json.dumps(errors.to_dict(error))))
+    assert type(restored) is type(error)
+    assert str(restored) == str(error)
+    assert (restored.venue, restored.endpoint, restored.code, restored.safe) == \
+        (error.venue, error.endpoint, error.code, error.safe)
+
+
+def test_concurrent_requests_share_one_connection(served):
+    gw, client = served
+    # balance()要三个同时执行才能返回，逐个执行会超时
+    futures = [client.submit('paper', 'balance') for _ in range(3)]
+    assert [f.result(5) for f in futures] == [{'trade': {'btc': 1.0}}] * 3
+    # 响应按完成顺序返回，仍然对应各自的请求
+    slow = client.submit('paper', 'get_depth', 'slow', delay=0.2)
+    fast = client.submit('paper', 'get_depth', 'fast')
+    assert fast.result(5) == {'symbol': 'fast'} and not slow.done()
+    assert slow.result(5) == {'symbol': 'slow'}
+    assert gw.stats()['connections'] == 1
@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+"""
+instrument：直方图分位数，expose()的Prometheus text格式，以及client请求记录的耗时、字节数和错误码
+"""
+
+import instrument
+import poloniexSDK
+from instrument import Histogram, Registry
+from mockExchange import MockExchange
+
+
+def test_histogram_quantile_is_bucket_upper_bound():
+    h = Histogram(buckets=(0.01, 0.1, 1.0))
+    assert h.quantile(0.5) is None
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        h.observe(value)
+    assert h.counts == [1, 2, 1, 1]
+    assert h.quantile(0.2) == 0.01 and h.quantile(0.6) == 0.1
+    # 落在+Inf时为最大上界
+    assert h.quantile(0.99) == 1.0
+
+
+def test_expose_format():
+    registry = Registry(buckets=(0.01, 0.1), prefix='sdk')
+    registry.observe('returnOrderBook', instrument.WAIT, 0.05)
+    registry.observe('returnOrderBook', instrument.WAIT, 0.2)
+    registry.add_bytes('returnOrderBook', 10, 2000)
+    registry.error('/api/v1/trade_add/', '200')
+    registry.error('say "hi"\n', 'x')
+    lines = registry.expose().splitlines()
+    labels = 'endpoint="returnOrderBook",phase="wait"'
+    assert lines[:6] == [
+        '# TYPE sdk_request_seconds histogram',
+        'sdk_request_seconds_bucket{%s,le="0.01"} 0' % labels,
+        'sdk_request_seconds_bucket{%s,le="0.1"} 1' % labels,
+        'sdk_request_seconds_bucket{%s,le="+Inf"} 2' % labels,
+        'sdk_request_seconds_sum{%s} 0.25' % labels,
+        'sdk_request_seconds_count{%s} 2' % labels,
+    ]
+    assert lines[6:] == [
+        '# TYPE sdk_bytes_total counter',
+        'sdk_bytes_total{endpoint="returnOrderBook",direction="sent"} 10',
+        'sdk_bytes_total{endpoint="returnOrderBook",direction="received"} 2000',
+        '# TYPE sdk_errors_total counter',
+        'sdk_errors_total{endpoint="/api/v1/trade_add/",code="200"} 1',
+        'sdk_errors_total{endpoint="say \\"hi\\"\\n",code="x"} 1',
+    ]
+
+
+def test_client_requests_are_recorded():
+    registry = Registry()
+    with MockExchange(secrets={'k': 's'}) as exchange:
+        client = poloniexSDK.Client_Poloniex('k', 's', endpoint=exchange.url, instrument=registry)
+        client.get_depth('usd_btc')
+        client.trade('buy_LIMIT', 1, 100, 'usd_btc')
+        bad = poloniexSDK.Client_Poloniex('k', 'wrong', endpoint=exchange.url, instrument=registry)
+        bad.signedRequest('POST', '/tradingApi', {'command': 'returnOpenOrders', 'currencyPair': 'all'})
+    snapshot = registry.snapshot()
+    depth = snapshot['latency']['returnOrderBook']
+    assert set(depth) == set(instrument.PHASES)
+    assert all(phase['count'] == 1 for phase in depth.values())
+    assert snapshot['bytes']['buy']['sent'] > 0 and snapshot['bytes']['returnOrderBook']['received'] > 0
+    assert sum(snapshot['errors']['returnOpenOrders'].values()) == 1
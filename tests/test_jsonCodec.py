@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""
+jsonCodec：逐个解码数组元素的iter_array/iter_markets和lazy_loads的阈值
+"""
+
+import json
+from decimal import Decimal
+import pytest
+import jsonCodec
+
+
+@pytest.fixture
+def stdlib():
+    backend = jsonCodec.BACKEND
+    jsonCodec.set_backend('json')
+    yield
+    jsonCodec.set_backend(backend)
+
+
+def test_iter_array_top_level_nested_and_empty():
+    doc = b' [ {"a": [1, [2, {}]]} ,\n [] ,\t"x" , 1.5 ] '
+    assert list(jsonCodec.iter_array(doc)) == [{'a': [1, [2, {}]]}, [], 'x', Decimal('1.5')]
+    assert list(jsonCodec.iter_array(b'[]')) == []
+    assert list(jsonCodec.iter_array(b' [ ] ')) == []
+
+
+def test_strings_with_escapes_and_brackets():
+    items = ['a,b', ']', '[{"', 'quote " and \\ backslash', 'line\nbreak', '中文']
+    assert list(jsonCodec.iter_array(json.dumps(items).encode('utf-8'))) == items
+    assert list(jsonCodec.iter_array(json.dumps(items, ensure_ascii=False).encode('utf-8'))) == items
+
+
+def test_iter_array_key_skips_other_members():
+    doc = b'{"code": 0, "skip": {"data": [9]}, "s": "]", "data": [{"id": "1"}, {"id": "2"}], "tail": 1}'
+    assert [o['id'] for o in jsonCodec.iter_array(doc, 'data')] == ['1', '2']
+    assert list(jsonCodec.iter_array(b'{"code": 0, "data": []}', 'data')) == []
+    assert list(jsonCodec.iter_array(b'{"code": 0, "data": null}', 'data')) == []
+    assert list(jsonCodec.iter_array(b'{}', 'data')) == []
+
+
+def test_error_dict_instead_of_array():
+    # 错误响应没有数组，不生成任何元素
+    assert list(jsonCodec.iter_array(b'{"code": "104"}', 'data')) == []
+    assert list(jsonCodec.iter_markets(b'{"error": "Invalid API key/secret pair."}')) == []
+
+
+def test_iter_markets_groups_by_market():
+    data = {'BTC_ETH': [{'orderNumber': '1'}, {'orderNumber': '2'}], 'BTC_LTC': [],
+            'USDT_BTC': [{'orderNumber': '3'}]}
+    content = json.dumps(data, indent=2).encode('utf-8')
+    expected = [('BTC_ETH', '1'), ('BTC_ETH', '2'), ('USDT_BTC', '3')]
+    assert [(m, o['orderNumber']) for m, o in jsonCodec.iter_markets(content)] == expected
+    # 已经解码的对象得到相同的结果
+    assert [(m, o['orderNumber']) for m, o in jsonCodec.iter_markets(data)] == expected
+    assert list(jsonCodec.iter_markets(b'[{"orderNumber": "4"}]')) == [(None, {'orderNumber': '4'})]
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        list(jsonCodec.iter_array(b'[1, 2'))
+    with pytest.raises(ValueError):
+        list(jsonCodec.iter_array(b'[1 2]'))
+
+
+def test_lazy_loads_threshold(stdlib):
+    small = json.dumps([{'id': str(i)} for i in range(3)]).encode('utf-8')
+    large = json.dumps([{'id': str(i)} for i in range(1000)]).encode('utf-8')
+    assert len(small) < jsonCodec.LAZY_THRESHOLD < len(large)
+    assert jsonCodec.lazy_loads(small) == json.loads(small)
+    raw = jsonCodec.lazy_loads(large)
+    assert isinstance(raw, jsonCodec.Raw) and len(raw) == len(large)
+    assert list(jsonCodec.iter_array(raw)) == json.loads(large)
+
+
+def test_lazy_loads_decodes_fully_with_orjson():
+    pytest.importorskip('orjson')
+    backend = jsonCodec.BACKEND
+    jsonCodec.set_backend('orjson')
+    try:
+        large = json.dumps([{'id': str(i)} for i in range(1000)]).encode('utf-8')
+        assert jsonCodec.lazy_loads(large) == json.loads(large)
+    finally:
+        jsonCodec.set_backend(backend)
@@ -0,0 +1,94 @@
+# -*- coding:utf-8 -*-
+"""
+marketCache：按接口的TTL，LRU淘汰，并发请求合并以及出错时不缓存
+"""
+
+import threading
+import time
+import pytest
+import marketCache
+import poloniexSDK
+from marketCache import TTLCache
+from mockExchange import MockExchange
+
+
+def _counter():
+    calls = []
+
+    def _fetch():
+        calls.append(1)
+        return len(calls)
+    return _fetch, calls
+
+
+def test_ttl_per_endpoint(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(marketCache.time, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl=1.0, ttls={'depth': 0.2, 'ticker': 0})
+    fetch, calls = _counter()
+    assert cache.get('depth', 'a', fetch) == 1
+    now[0] += 0.1
+    assert cache.get('depth', 'a', fetch) == 1
+    now[0] += 0.2
+    assert cache.get('depth', 'a', fetch) == 2
+    # 默认TTL
+    assert cache.get('other', 'b', fetch) == 3
+    now[0] += 0.9
+    assert cache.get('other', 'b', fetch) == 3
+    # ttl为0时不缓存
+    assert cache.get('ticker', 'c', fetch) == 4
+    assert cache.get('ticker', 'c', fetch) == 5
+    assert cache.stats() == {'hits': 2, 'misses': 5, 'coalesced': 0, 'evictions': 0, 'size': 2}
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.get('e', 'a', lambda: 'A')
+    cache.get('e', 'b', lambda: 'B')
+    # 读取a之后b是最久没用的
+    assert cache.get('e', 'a', lambda: 'A2') == 'A'
+    cache.get('e', 'c', lambda: 'C')
+    assert cache.get('e', 'a', lambda: 'A3') == 'A'
+    assert cache.get('e', 'b', lambda: 'B2') == 'B2'
+    assert cache.stats()['evictions'] == 2 and cache.stats()['size'] == 2
+
+
+def test_concurrent_requests_are_coalesced():
+    cache = TTLCache(ttl=0)
+    release = threading.Event()
+    calls = []
+
+    def _fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'depth'
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('depth', 'k', _fetch)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ['depth'] * 8 and len(calls) == 1
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def _fail():
+        raise ValueError('down')
+    with pytest.raises(ValueError):
+        cache.get('depth', 'k', _fail)
+    assert cache.get('depth', 'k', lambda: 'ok') == 'ok'
+
+
+def test_client_public_requests_share_cache():
+    cache = TTLCache(ttl=60)
+    with MockExchange() as exchange:
+        first = poloniexSDK.Client_Poloniex(endpoint=exchange.url, cache=cache)
+        second = poloniexSDK.Client_Poloniex(endpoint=exchange.url, cache=cache)
+        assert first.get_depth('usd_btc') == second.get_depth('USDT_BTC')
+        assert exchange.requests == 1
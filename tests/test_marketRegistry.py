@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+"""
+marketRegistry：交易对的各种写法，float误差和Decimal，小数位容差的边界，最小数量和最小金额
+"""
+
+from decimal import Decimal
+import pytest
+import errors
+from marketRegistry import DECIMALS_TOLERANCE, MarketRegistry
+
+
+def _code(market, amount, price):
+    with pytest.raises(errors.ValidationError) as raised:
+        market.validate(amount, price)
+    assert raised.value.safe
+    return raised.value.code
+
+
+def test_poloniex_spellings_share_one_market():
+    markets = MarketRegistry('poloniex')
+    market = markets.get('usd_btc')
+    assert markets.get('USD_BTC') is markets.get('USDT_BTC') is market
+    assert (market.id, market.native, market.asset, market.currency) == (0, 'USDT_BTC', 'btc', 'usd')
+    assert markets.native('all') == 'all'
+    assert markets.get('btc_eth').id == 1 and len(markets) == 2
+
+
+def test_coolcoin_spellings():
+    markets = MarketRegistry('coolcoin')
+    eth = markets.get('eth')
+    assert markets.get('ETH_BTC') is markets.get('eth_btc') is markets.get('ETH') is eth
+    assert (eth.native, eth.asset, eth.currency) == ('eth', 'eth', 'btc')
+    usd = markets.get('usd')
+    assert (usd.native, usd.asset, usd.currency) == ('usdt', 'usd', 'btc')
+    with pytest.raises(ValueError):
+        markets.get('_btc')
+
+
+def test_float_artefacts_are_not_decimal_errors():
+    market = MarketRegistry('poloniex').get('usd_btc')
+    assert 0.1 * 3 != 0.3
+    assert market.validate(0.1 * 3, 9000.1 * 3) is market
+    assert market.format(0.1 * 3, 9000.1 * 3) == ('0.30000000', '27000.30000000')
+
+
+def test_decimal_and_string_input():
+    market = MarketRegistry('poloniex').get('usd_btc')
+    assert market.validate(Decimal('0.12345678'), Decimal('9000')) is market
+    assert market.validate('0.12345678', '9000.5') is market
+    assert market.format(Decimal('0.123456785'), '9000') == ('0.12345678', '9000.00000000')
+    assert _code(market, Decimal('0.000000015'), 9000) == '206'
+    assert _code(market, 'abc', 9000) == '206'
+
+
+def test_decimals_tolerance_boundary():
+    market = MarketRegistry('poloniex').configure('usd_btc', amount_decimals=2, price_decimals=2)
+    assert DECIMALS_TOLERANCE == Decimal('0.0001')
+    # 舍入变化都是0.004，容差按相对值计算：40.004 * 0.0001 = 0.0040004，39.996 * 0.0001 = 0.0039996
+    assert market.validate(Decimal('40.004'), 100) is market
+    assert _code(market, Decimal('39.996'), 100) == '206'
+    assert _code(market, 100, Decimal('39.996')) == '206'
+    assert _code(market, '1.005', 100) == '206'
+    # 舍入成0
+    assert _code(market, '0.004', 100) == '206'
+
+
+def test_min_amount_price_range_and_min_total():
+    markets = MarketRegistry('coolcoin')
+    market = markets.configure('eth', min_amount=0.01, max_price=10)
+    assert _code(market, 0.001, 0.1) == '201'
+    assert _code(market, 0, 0.1) == '201'
+    assert _code(market, 1, 0) == '202'
+    assert _code(market, 1, 10) == '202'
+    # min_total默认0.001 btc
+    assert _code(market, 0.01, 0.05) == '204'
+    assert market.validate(0.02, 0.05) is market
+    with pytest.raises(TypeError):
+        markets.configure('eth', min_price=1)
@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+"""
+nonce.NonceGenerator：多线程下严格递增，按nonce顺序发出的签名请求不被交易所拒绝
+"""
+
+import threading
+import coocoinSDK
+import nonce
+import poloniexSDK
+from mockExchange import MockExchange
+
+ACCESS_KEY = 'test-key'
+SECRET_KEY = 'test-secret'
+
+
+def _run_threads(target, threads):
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def test_next_is_strictly_increasing_across_threads():
+    nonces = nonce.NonceGenerator()
+    values = []
+
+    def _worker():
+        values.extend(nonces.next() for _ in range(1000))
+    _run_threads(_worker, 8)
+    assert len(set(values)) == len(values) == 8000
+    assert max(values) == nonces.last
+
+
+def test_state_file_never_goes_back(tmp_path):
+    path = str(tmp_path / 'nonce')
+    first = nonce.NonceGenerator(path, reserve=10)
+    last = max(first.next() for _ in range(25))
+    assert nonce.NonceGenerator(path).next() > last
+
+
+def _stress(make_client, path, params, is_nonce_error, jitter=0.0, threads=8, calls=40):
+    """
+    :return: MockExchange，返回给调用者的nonce错误已经断言为0
+    """
+    with MockExchange(secrets={ACCESS_KEY: SECRET_KEY}, jitter=jitter) as exchange:
+        nonces = nonce.NonceGenerator()
+        rejected = []
+
+        def _worker():
+            client = make_client(exchange.url, nonces)
+            for _ in range(calls):
+                data = client.signedRequest("POST", path, dict(params))
+                if is_nonce_error(data):
+                    rejected.append(data)
+        _run_threads(_worker, threads)
+        assert rejected == []
+        # 每个被拒绝的请求用新的nonce重试一次
+        assert exchange.requests == threads * calls + exchange.nonce_errors
+        return exchange
+
+
+def _coolcoin(url, nonces):
+    return coocoinSDK.Client_Coolcoin(ACCESS_KEY, SECRET_KEY, endpoint=url, nonces=nonces)
+
+def _poloniex(url, nonces):
+    return poloniexSDK.Client_Poloniex(ACCESS_KEY, SECRET_KEY, endpoint=url, nonces=nonces)
+
+
+# 按nonce顺序发出的请求在交易所的处理线程中仍可能偶尔乱序，见nonce.py
+MAX_REJECTED = 0.05
+
+
+def test_stress_coolcoin_no_nonce_rejections():
+    exchange = _stress(_coolcoin, "/api/v1/balance/", {}, coocoinSDK.is_nonce_error)
+    assert exchange.nonce_errors <= MAX_REJECTED * exchange.requests
+
+
+def test_stress_poloniex_no_nonce_rejections():
+    exchange = _stress(_poloniex, "/tradingApi", {'command': 'returnCompleteBalances'},
+                       poloniexSDK.is_nonce_error)
+    assert exchange.nonce_errors <= MAX_REJECTED * exchange.requests
+
+
+def test_stress_retries_requests_reordered_by_the_exchange():
+    # 交易所处理时间不同，被拒绝的请求更多，仍然全部由重试恢复
+    _stress(_coolcoin, "/api/v1/balance/", {}, coocoinSDK.is_nonce_error, jitter=0.001)
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+"""
+orderBook：快照和增量的seq顺序，数量为0时删除档位，以及交替更新和查询时volume()的累计数量
+"""
+
+import random
+import pytest
+from orderBook import OrderBook, ASKS, BIDS
+
+
+def _book(seq=10):
+    return OrderBook.from_depth({'bids': [['99.0', 1], ['98.0', 2], ['97.0', 3]],
+                                 'asks': [['101.0', 1], ['102.0', 2], ['103.0', 3]], 'seq': seq})
+
+
+def test_snapshot_sorts_levels_best_first_and_drops_empty():
+    book = OrderBook.from_depth({'bids': [['98.0', 2], ['99.0', 1], ['97.5', 0]],
+                                 'asks': [['102.0', 2], ['101.0', 1]]}, seq=3)
+    assert book.to_depth() == {BIDS: [[99.0, 1.0], [98.0, 2.0]], ASKS: [[101.0, 1.0], [102.0, 2.0]]}
+    assert book.seq == 3
+    assert book.spread() == 2.0 and book.mid() == 100.0
+
+
+def test_stale_snapshot_and_diff_are_rejected():
+    book = _book(seq=10)
+    assert book.apply_snapshot({'bids': [], 'asks': []}, seq=10) is False
+    assert book.apply_snapshot({'bids': [], 'asks': [], 'seq': 9}) is False
+    assert book.apply_diff(BIDS, 99.5, 1, seq=9) is False
+    assert book.apply_diffs([(BIDS, 99.5, 1)], seq=10) is False
+    assert book.best_bid() == (99.0, 1.0)
+    # 同一个seq的多个diff可以依次应用
+    assert book.apply_diff(BIDS, 99.5, 1, seq=11) is True
+    assert book.apply_diff(ASKS, 100.5, 1, seq=11) is True
+    assert book.seq == 11
+    assert book.best_bid() == (99.5, 1.0) and book.best_ask() == (100.5, 1.0)
+    assert book.apply_snapshot({'bids': [['90.0', 1]], 'asks': []}, seq=12) is True
+    assert book.to_depth() == {BIDS: [[90.0, 1.0]], ASKS: []}
+
+
+def test_zero_size_removes_level():
+    book = _book()
+    book.apply_diff(BIDS, '99.0', '0', seq=11)
+    book.apply_diff(ASKS, 104.0, 0, seq=11)
+    assert book.best_bid() == (98.0, 2.0)
+    assert book.size_at(BIDS, 99.0) == 0.0
+    assert len(book.bids) == 2 and len(book.asks) == 3
+
+
+def test_volume_counts_from_best_price():
+    book = _book()
+    assert book.volume(ASKS, 102.0) == 3.0
+    assert book.volume(ASKS, 100.0) == 0.0
+    assert book.volume(BIDS, 98.0) == 3.0
+    assert book.volume(BIDS, 96.0) == 6.0
+    book.apply_diff(ASKS, 101.0, 5, seq=11)
+    book.apply_diff(ASKS, 101.5, 1, seq=11)
+    book.apply_diff(BIDS, 98.0, 0, seq=12)
+    assert book.volume(ASKS, 102.0) == 8.0
+    assert book.volume(BIDS, 97.0) == 4.0
+
+
+def _expected(levels, descending, price):
+    return sum(s for p, s in levels.items() if (p >= price if descending else p <= price))
+
+
+@pytest.mark.parametrize('side', [BIDS, ASKS])
+def test_volume_after_interleaved_updates_matches_full_sum(side):
+    rng = random.Random(7)
+    book = OrderBook()
+    levels = {}
+    prices = [round(90 + 0.5 * i, 2) for i in range(40)]
+    for step in range(2000):
+        price = rng.choice(prices)
+        size = 0 if rng.random() < 0.2 else rng.randint(1, 20) / 4
+        book.apply_diff(side, price, size)
+        if size:
+            levels[price] = size
+        else:
+            levels.pop(price, None)
+        if step % 3 == 0:
+            query = rng.choice(prices) + rng.choice((-0.25, 0, 0.25))
+            assert book.volume(side, query) == pytest.approx(_expected(levels, side == BIDS, query))
+    assert book.to_depth()[side] == sorted(([p, s] for p, s in levels.items()), reverse=side == BIDS)
@@ -0,0 +1,114 @@
+# -*- coding:utf-8 -*-
+"""
+paperExchange：吃外部深度、价格优先时间优先的挂单撮合和余额
+"""
+
+import pytest
+import batch
+import paperExchange
+from mockExchange import make_book
+
+
+def _paper(venue='poloniex', **balances):
+    paper = paperExchange.paper_service(venue, balances=balances or {'usd': 100000, 'btc': 10})
+    paper.feed('usd_btc', make_book(5, as_string=True), ts=1)
+    return paper
+
+
+def _fills(paper):
+    # (order_id, side, price, amount, maker)
+    return [(f[1], f[3], f[4], pytest.approx(f[5]), f[6]) for f in paper.fills]
+
+
+def test_taker_walks_external_levels_at_their_prices():
+    paper = _paper()
+    result = paper.trade('buy_LIMIT', 2.5, 100.02, 'usd_btc')
+    assert [(t['rate'], t['amount']) for t in result['resultingTrades']] == \
+        [('100.01000000', '1.00000000'), ('100.02000000', '1.50000000')]
+    balance = paper.balance()
+    assert balance['trade']['usd'] == pytest.approx(100000 - 100.01 - 1.5 * 100.02)
+    assert balance['trade']['btc'] == pytest.approx(12.5)
+    assert balance['frozen']['usd'] == 0.0
+    assert paper.open_orders('usd_btc') == []
+
+
+def test_remainder_rests_and_freezes_at_limit_price():
+    paper = _paper()
+    paper.trade('buy_LIMIT', 2.5, 100.02, 'usd_btc')
+    # 100.02上只剩0.5，下一次feed之前不会再次成交
+    order_id = paper.trade('buy_LIMIT', 1, 100.02, 'usd_btc')['orderNumber']
+    assert paper.open_orders('usd_btc') == [{'id': order_id, 'side': 'buy', 'price': 100.02,
+                                             'amount': pytest.approx(0.5)}]
+    assert paper.balance()['frozen']['usd'] == pytest.approx(0.5 * 100.02)
+
+
+def test_resting_orders_fill_by_price_then_time_at_their_own_price():
+    paper = _paper()
+    paper.feed('usd_btc', {'bids': [[98.0, 10]], 'asks': [[101.0, 10]]}, ts=2)
+    first = paper.trade('buy_LIMIT', 1, 99.5, 'usd_btc')['orderNumber']
+    second = paper.trade('buy_LIMIT', 1, 99.5, 'usd_btc')['orderNumber']
+    best = paper.trade('buy_LIMIT', 1, 99.8, 'usd_btc')['orderNumber']
+    paper.feed('usd_btc', {'bids': [[98.0, 10]], 'asks': [[99.4, 1.5]]}, ts=3)
+    assert _fills(paper) == [(best, 'buy', 99.8, 1.0, True), (first, 'buy', 99.5, 0.5, True)]
+    assert [(o['id'], o['amount']) for o in paper.open_orders('usd_btc')] == \
+        [(first, pytest.approx(0.5)), (second, 1.0)]
+    assert paper.balance()['frozen']['usd'] == pytest.approx(0.5 * 99.5 + 99.5)
+
+
+def test_own_orders_do_not_match_each_other():
+    paper = _paper()
+    paper.trade('buy_LIMIT', 1, 99.995, 'usd_btc')
+    paper.trade('sell_LIMIT', 1, 100.005, 'usd_btc')
+    paper.trade('sell_LIMIT', 1, 99.995, 'usd_btc')
+    # 外部买一为99.99，99.995的卖单只能与自己99.995的买单成交，不撮合
+    assert paper.stats()['fills'] == 0
+    assert len(paper.open_orders('usd_btc')) == 3
+
+
+def test_cancel_releases_frozen_balance():
+    paper = _paper()
+    order_id = paper.trade('sell_LIMIT', 2, 101, 'usd_btc')['orderNumber']
+    assert paper.balance()['frozen']['btc'] == 2.0
+    assert paper.cancel(order_id, 'usd_btc')['success'] == 1
+    assert paper.cancel(order_id, 'usd_btc')['success'] == 0
+    balance = paper.balance()
+    assert balance['trade']['btc'] == 10.0 and balance['frozen']['btc'] == 0.0
+
+
+def test_insufficient_balance_is_rejected():
+    paper = _paper(usd=50)
+    assert paper.trade('buy_LIMIT', 1, 100.01, 'usd_btc') == {'error': 'Not enough USD.'}
+    assert paper.stats()['rejected'] == 1
+    assert paper.balance()['trade']['usd'] == 50.0
+
+
+def test_fee_is_taken_from_the_received_coin():
+    paper = paperExchange.paper_service('poloniex', balances={'usd': 1000}, fee=0.01)
+    paper.feed('usd_btc', make_book(5, as_string=True))
+    paper.trade('buy_LIMIT', 1, 100.01, 'usd_btc')
+    assert paper.balance()['trade']['btc'] == pytest.approx(0.99)
+
+
+def test_coolcoin_place_and_cancel_reports():
+    paper = paperExchange.paper_service('coolcoin', balances={'btc': 10})
+    paper.feed('eth_btc', {'bids': [[0.05, 10]], 'asks': [[0.06, 10]]})
+    report = paper.place_orders([('buy_LIMIT', 1, 0.055, 'eth_btc'), ('buy_LIMIT', 1000, 0.055, 'eth_btc')])
+    assert report[batch.PLACED] == [0] and report[batch.FAILED] == [1]
+    order_id = report['results'][0]['id']
+    assert paper.openOrders('eth')[0]['id'] == order_id
+    report = paper.cancel_all(coin='eth_btc')
+    assert report[batch.CANCELLED] == [order_id]
+    assert paper.openOrders('eth') is None
+    assert paper.balance()['trade']['btc'] == pytest.approx(10)
+
+
+def test_get_depth_as_array():
+    np = pytest.importorskip('numpy')
+    import depthArray
+    paper = _paper()
+    depth = paper.get_depth('usd_btc', as_array=True)
+    assert isinstance(depth['bids'], np.ndarray) and depth['bids'].shape == (5, 2)
+    assert depth['asks'][0].tolist() == [100.01, 1.0]
+    assert depthArray.mid(depth) == pytest.approx(100.0)
+    # 默认仍然是feed进来的list
+    assert paper.get_depth('usd_btc')['asks'][0] == ['100.01000000', 1.0]
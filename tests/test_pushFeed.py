@@ -0,0 +1,112 @@
+# -*- coding:utf-8 -*-
+"""
+pushFeed.PushFeed：用MockPushServer测试快照、增量、gap后的重新同步和断线重连
+"""
+
+import time
+import pytest
+import poloniexSDK
+import pushFeed
+from mockExchange import MockExchange, MockPushServer
+
+pytest.importorskip('websockets')
+
+
+def _wait(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _bids(book):
+    return [[float(p), q] for p, q in book['bids']]
+
+
+@pytest.fixture
+def servers():
+    with MockExchange() as exchange, MockPushServer(exchange) as push:
+        yield exchange, push
+
+
+@pytest.fixture
+def feed(servers):
+    exchange, push = servers
+    client = poloniexSDK.Client_Poloniex('k', 's', endpoint=exchange.url)
+    updates = []
+    feed = pushFeed.PushFeed(['usd_btc', 'btc_eth'], client, url=push.url, on_update=updates.append,
+                             reconnect=0.05)
+    feed.updates = updates
+    with feed:
+        assert feed.wait_synced(3)
+        yield feed
+
+
+def test_on_message_applies_diffs_in_seq_order():
+    feed = pushFeed.PushFeed(['usd_btc'], poloniexSDK.Client_Poloniex('k', 's'))
+    feed.on_message('[100, 5, [["i", {"currencyPair": "USDT_BTC", '
+                    '"orderBook": [{"100.01": "1.0"}, {"99.99": "2.0"}]}]]]')
+    feed.on_message([100, 6, [['o', 1, '100.00', '3.0'], ['t', '7', 1, '100.01', '0.5', 1]]])
+    # 重复的seq被忽略
+    feed.on_message([100, 6, [['o', 1, '100.00', '0']]])
+    feed.on_message([1010])
+    book = feed.book('usd_btc')
+    assert book.seq == 6
+    assert book.best_bid() == (100.0, 3.0)
+    assert book.best_ask() == (100.01, 1.0)
+    assert feed.stats()['heartbeats'] == 1
+
+
+def test_updates_and_trades(servers, feed):
+    _, push = servers
+    push.update('USDT_BTC', 'bids', '99.99500000', 3.0)
+    push.update('USDT_BTC', 'asks', '100.01000000', 0)
+    push.trade('USDT_BTC', 'buy', '100.02000000', 0.5)
+    book = feed.book('usd_btc')
+    assert _wait(lambda: book.seq == push.seq['USDT_BTC'])
+    assert book.best_bid() == (99.995, 3.0)
+    assert book.best_ask() == (100.02, 2.0)
+    kinds = [u.kind for u in feed.updates if u.pair == 'usd_btc']
+    assert kinds == [pushFeed.SNAPSHOT, pushFeed.BOOK, pushFeed.BOOK, pushFeed.TRADE]
+    assert feed.stats()['gaps'] == 0
+
+
+def test_gap_resyncs_from_rest_snapshot(servers, feed):
+    _, push = servers
+    push.drop('USDT_BTC', 2)
+    for price in ('99.99600000', '99.99700000', '99.99800000'):
+        push.update('USDT_BTC', 'bids', price, 1.0)
+    book = feed.book('usd_btc')
+    assert _wait(lambda: feed.stats()['resyncs'] == 1 and book.seq == push.seq['USDT_BTC'])
+    assert feed.synced('usd_btc')
+    assert feed.stats()['gaps'] == 1
+    assert book.to_depth(25)['bids'] == _bids(push.snapshot('USDT_BTC'))
+
+
+def test_resync_keeps_books_deeper_than_the_default_depth(servers, feed):
+    _, push = servers
+    # 推送服务器的深度为25档，再增加3档
+    for i in range(3):
+        push.update('USDT_BTC', 'bids', '{:.8f}'.format(99.5 - i * 0.01), 1.0)
+    book = feed.book('usd_btc')
+    assert _wait(lambda: book.seq == push.seq['USDT_BTC'])
+    assert len(book.side('bids')) == 28
+    push.drop('USDT_BTC')
+    push.update('USDT_BTC', 'asks', '100.50000000', 1.0)
+    push.update('USDT_BTC', 'asks', '100.60000000', 1.0)
+    assert _wait(lambda: feed.stats()['resyncs'] == 1 and book.seq == push.seq['USDT_BTC'])
+    assert len(book.side('bids')) == 28
+    assert book.to_depth()['bids'] == _bids(push.snapshot('USDT_BTC', depth=100))
+
+
+def test_reconnect_resubscribes(servers, feed):
+    _, push = servers
+    push.disconnect()
+    assert _wait(lambda: feed.stats()['reconnects'] == 1 and feed.wait_synced(0))
+    assert _wait(lambda: push.subscriptions == 4)
+    push.update('BTC_ETH', 'asks', '100.01000000', 7)
+    book = feed.book('btc_eth')
+    assert _wait(lambda: book.seq == push.seq['BTC_ETH'])
+    assert book.best_ask() == (100.01, 7.0)
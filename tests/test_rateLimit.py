@@ -0,0 +1,64 @@
+# -*- coding:utf-8 -*-
+"""
+rateLimit：token bucket的burst和速率，等待中的请求按优先级获得token，public和private互不影响
+"""
+
+import threading
+import time
+import rateLimit
+from rateLimit import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PRIVATE, PUBLIC, Scheduler, TokenBucket
+
+
+def test_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10, burst=3)
+    now = bucket.last
+    for _ in range(3):
+        assert bucket.wait_time(now) == 0.0
+        bucket.take()
+    assert abs(bucket.wait_time(now) - 0.1) < 1e-9
+    # 空闲再久也最多积累burst个
+    assert bucket.wait_time(now + 100) == 0.0
+    assert bucket.tokens == 3.0
+
+
+def test_waiting_requests_served_by_priority():
+    scheduler = Scheduler(private_rate=10)
+    scheduler.acquire(PRIVATE)
+    order = []
+
+    def _acquire(priority):
+        scheduler.acquire(PRIVATE, priority)
+        order.append(priority)
+    threads = []
+    # 先到的是低优先级，后到的撤单仍然先拿到token
+    for priority in (PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH):
+        t = threading.Thread(target=_acquire, args=(priority,))
+        t.start()
+        threads.append(t)
+        while scheduler.metrics()[PRIVATE]['queue'] < len(threads):
+            time.sleep(0.001)
+    for t in threads:
+        t.join()
+    assert order == [PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW]
+    metrics = scheduler.metrics()[PRIVATE]
+    assert metrics['requests'] == 4 and metrics['max_queue'] == 3
+    waits = metrics['avg_wait_by_priority']
+    assert waits[PRIORITY_HIGH] < waits[PRIORITY_LOW]
+
+
+def test_rate_is_enforced_and_lanes_are_independent():
+    scheduler = Scheduler(public_rate=20, private_rate=1000)
+
+    def _public():
+        for _ in range(5):
+            scheduler.acquire(PUBLIC)
+    start = time.monotonic()
+    worker = threading.Thread(target=_public)
+    worker.start()
+    while scheduler.metrics()[PUBLIC]['requests'] < 2:
+        time.sleep(0.001)
+    # public排队时private不受影响
+    assert scheduler.acquire(PRIVATE, rateLimit.PRIORITY_HIGH) < 0.01
+    worker.join()
+    # 第一个token立即可用，之后每0.05秒一个
+    assert time.monotonic() - start >= 4 * 0.05 * 0.9
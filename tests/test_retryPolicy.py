@@ -0,0 +1,134 @@
+# -*- coding:utf-8 -*-
+"""
+retryPolicy：可能已经发出的private请求不重试，退避时间有上限，只有超过p95时才对冲且使用先返回的结果
+"""
+
+import threading
+import time
+import pytest
+import errors
+import retryPolicy
+from retryPolicy import Hedger, RetryPolicy
+
+
+def _failing(error):
+    calls = []
+
+    def _fn():
+        calls.append(time.monotonic())
+        raise error
+    return _fn, calls
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    slept = []
+    monkeypatch.setattr(retryPolicy.time, 'sleep', slept.append)
+    return slept
+
+
+def test_private_request_not_retried_once_it_may_have_been_sent(no_sleep):
+    policy = RetryPolicy(attempts=5)
+    # 连接断开或超时：交易所可能已经执行
+    fn, calls = _failing(errors.NetworkError('poloniex', 'buy', 'timeout', safe=False))
+    with pytest.raises(errors.NetworkError):
+        policy.call(fn, idempotent=False)
+    assert len(calls) == 1
+    # 同一个错误在public接口上重试到attempts次
+    fn, calls = _failing(errors.NetworkError('poloniex', 'returnOrderBook', 'timeout', safe=False))
+    with pytest.raises(errors.NetworkError):
+        policy.call(fn)
+    assert len(calls) == 5 and len(no_sleep) == 4
+
+
+def test_private_request_retried_when_certainly_not_executed(no_sleep):
+    policy = RetryPolicy(attempts=3)
+    # 连接没有建立
+    fn, calls = _failing(errors.NetworkError('poloniex', 'buy', 'refused', safe=True))
+    with pytest.raises(errors.NetworkError):
+        policy.call(fn, idempotent=False)
+    assert len(calls) == 3
+    # 429之后成功
+    fn, calls = _failing(errors.RateLimitError('poloniex', 'buy', '429'))
+    attempts = iter([fn, lambda: {'orderNumber': '1'}])
+    assert policy.call(lambda: next(attempts)(), idempotent=False) == {'orderNumber': '1'}
+    assert len(calls) == 1
+
+
+def test_api_errors_are_never_retried(no_sleep):
+    fn, calls = _failing(errors.APIError('coolcoin', '/api/v1/trade_add/', '余额不足', code='200'))
+    with pytest.raises(errors.APIError):
+        RetryPolicy(attempts=5).call(fn)
+    assert len(calls) == 1 and no_sleep == []
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(base=0.05, cap=0.3)
+    for attempt in range(1, 30):
+        bound = min(0.3, 0.05 * 2 ** (attempt - 1))
+        assert all(0 <= policy.delay(attempt) <= bound for _ in range(200))
+    # retry_after作为下限，但不超过cap
+    retry_after = errors.RateLimitError('poloniex', 'buy', '429', retry_after=0.2)
+    assert all(0.2 <= policy.delay(1, retry_after) <= 0.3 for _ in range(200))
+    assert policy.delay(1, errors.RateLimitError('poloniex', 'buy', '429', retry_after=60)) == 0.3
+
+
+def _warm(hedger, endpoint, seconds=0.01, n=20):
+    for _ in range(n):
+        hedger.call(endpoint, lambda: time.sleep(seconds))
+
+
+def test_no_hedge_below_p95():
+    hedger = Hedger(min_samples=20)
+    calls = []
+
+    def _fn():
+        calls.append(1)
+        time.sleep(0.01)
+        return 'ok'
+    # 样本不足时不对冲
+    _warm(hedger, 'depth', n=19)
+    assert hedger.threshold('depth') is None
+    _warm(hedger, 'depth', n=1)
+    assert hedger.threshold('depth') >= 0.01
+    for _ in range(10):
+        assert hedger.call('depth', _fn) == 'ok'
+    assert len(calls) == 10
+    assert hedger.stats()['hedged'] == 0
+
+
+def test_hedge_past_p95_returns_first_result_and_ignores_loser():
+    hedger = Hedger(min_samples=20)
+    _warm(hedger, 'depth')
+    release = threading.Event()
+    attempts = []
+
+    def _fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            # 第一个请求卡住，直到测试结束
+            release.wait(5)
+            return 'slow'
+        return 'fast'
+    start = time.monotonic()
+    try:
+        assert hedger.call('depth', _fn) == 'fast'
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+    stats = hedger.stats()
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+    assert len(attempts) == 2
+
+
+def test_hedgers_share_one_executor_unless_sized():
+    first, second = Hedger(min_samples=1), Hedger(min_samples=1)
+    for hedger in (first, second):
+        _warm(hedger, 'depth', seconds=0, n=1)
+        hedger.call('depth', lambda: time.sleep(0.05))
+    assert first._executor is None and second._executor is None
+    own = Hedger(max_workers=2)
+    assert own._executor is not retryPolicy._shared_executor()
+    own.close()
+    first.close()
+    assert not retryPolicy._shared_executor()._shutdown
@@ -0,0 +1,68 @@
+# -*- coding:utf-8 -*-
+"""
+valuation：中间价和VWAP清算估值，set_book/set_balance的增量更新与全部重新计算一致
+"""
+
+import pytest
+import valuation
+from valuation import Valuation
+
+np = pytest.importorskip('numpy')
+
+
+def _balance(**trade):
+    return {'asset': {'total': 0, 'net': 0}, 'trade': trade, 'frozen': {}}
+
+
+def test_mid_and_liquidation_value():
+    val = Valuation('btc', coins=('btc', 'eth', 'usd'))
+    val.set_balance('poloniex', {'trade': {'btc': 1, 'eth': 10}, 'frozen': {'eth': 5}})
+    val.set_balance('coolcoin', {'trade': {'eth': 5}, 'frozen': {}})
+    # 合计20个eth：10个按0.05，10个按0.04卖出
+    val.set_book('eth', {'bids': [['0.05', 10], ['0.04', 20]], 'asks': [['0.06', 10]]})
+    assert val.value('poloniex') == {'total': pytest.approx(1 + 15 * 0.055),
+                                     'net': pytest.approx(1 + 15 * 0.045)}
+    assert val.value('coolcoin')['net'] == pytest.approx(5 * 0.045)
+    # 用USDT_BTC的深度给usd定价：卖出usd即吃asks买btc
+    val.set_balance('coolcoin', {'trade': {'eth': 5, 'usd': 200}, 'frozen': {}})
+    assert val.unpriced() == ['usd']
+    val.set_book('usd', {'bids': [['9900', 1]], 'asks': [['10000', 1]]}, inverse=True)
+    assert val.unpriced() == []
+    assert val.value('coolcoin')['net'] == pytest.approx(5 * 0.045 + 200 / 10000)
+    balance = val.fill('coolcoin', _balance(eth=5, usd=200))
+    assert balance['asset'] == val.value('coolcoin')
+
+
+def test_depth_shortfall_counts_as_zero():
+    val = Valuation('btc', coins=('btc', 'eth'))
+    val.set_balance('poloniex', {'trade': {'eth': 30}, 'frozen': {}})
+    val.set_book('eth', {'bids': [['0.05', 10]], 'asks': [['0.06', 10]]})
+    assert val.value()['net'] == pytest.approx(10 * 0.05)
+    # 没有深度时不计价
+    val.set_book('eth', {'bids': [], 'asks': []})
+    assert val.value() == {'total': 0.0, 'net': 0.0} and val.unpriced() == ['eth']
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = np.random.default_rng(3)
+    venues = ['poloniex', 'coolcoin', 'other']
+    coins = [c for c in valuation.COINS if c != 'btc']
+    val = Valuation('btc')
+    for step in range(300):
+        action = rng.integers(3)
+        if action == 0:
+            amounts = {coin: float(rng.uniform(0, 50)) for coin in rng.choice(valuation.COINS, 3)}
+            val.set_balance(str(rng.choice(venues)), {'trade': amounts, 'frozen': {}})
+        elif action == 1:
+            price = float(rng.uniform(0.01, 1))
+            n = int(rng.integers(0, 4))
+            bids = [[price - 0.001 * k, float(rng.uniform(1, 20))] for k in range(n)]
+            asks = [[price + 0.001 * (k + 1), float(rng.uniform(1, 20))] for k in range(n)]
+            val.set_book(str(rng.choice(coins)), {'bids': bids, 'asks': asks})
+        else:
+            val.set_price(str(rng.choice(coins)), float(rng.uniform(0.01, 1)))
+        # 不调用recompute，增量误差会在300步中累积
+        total, net = val.holdings @ val.mid, val.holdings @ val.liquidation
+        for v, venue in enumerate(val.venues):
+            assert val.value(venue)['total'] == pytest.approx(total[v], abs=1e-9)
+            assert val.value(venue)['net'] == pytest.approx(net[v], abs=1e-9)
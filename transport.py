@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+client使用的HTTPAdapter
+
+- 签名请求按nonce顺序写入socket，见nonce.NonceGenerator.ordered()
+- 记录当前线程建立连接(TCP+TLS)的耗时，供instrument使用
+"""
+
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+import nonce
+
+_local = threading.local()
+
+def pop_connect_time():
+    """
+    :return: 上次调用之后当前线程建立连接的总秒数，并清零
+    """
+    seconds = getattr(_local, 'connect', 0.0)
+    _local.connect = 0.0
+    return seconds
+
+def _timed_connect(connect):
+    start = time.perf_counter()
+    try:
+        return connect()
+    finally:
+        _local.connect = getattr(_local, 'connect', 0.0) + time.perf_counter() - start
+
+
+class _HTTPConnection(HTTPConnection):
+    def connect(self):
+        return _timed_connect(lambda: HTTPConnection.connect(self))
+
+    def request(self, *args, **kwargs):
+        return nonce.send_in_order(lambda: HTTPConnection.request(self, *args, **kwargs))
+
+
+class _HTTPSConnection(HTTPSConnection):
+    def connect(self):
+        return _timed_connect(lambda: HTTPSConnection.connect(self))
+
+    def request(self, *args, **kwargs):
+        return nonce.send_in_order(lambda: HTTPSConnection.request(self, *args, **kwargs))
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class ClientAdapter(HTTPAdapter):
+    """
+    与HTTPAdapter用法相同
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPConnectionPool,
+                                                   'https': _HTTPSConnectionPool}
+
+
+def new_session(pool_size=5):
+    """
+    client使用的Session
+    :param pool_size: keep-alive连接数
+    :return: (requests.Session, ClientAdapter)
+    """
+    session = requests.Session()
+    # 同一个key的签名请求按nonce顺序发送；重试由client的RetryPolicy按接口是否幂等决定，adapter不重试
+    adapter = ClientAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session, adapter
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+多交易所资产估值
+
+把各交易所balance()中的持仓(trade + frozen)按深度估值，填入balance['asset']：
+    total   按中间价估值
+    net     按VWAP清算估值：全部持仓(所有交易所合计)吃对手盘卖出的成交金额，深度不足的部分计为0
+
+持仓是(交易所, 币种)的矩阵，价格是每个币种一个向量，估值为矩阵乘法；
+set_book只更新一个币种的价格，按差值更新各交易所的估值，不重新计算全部。
+
+    valuation = Valuation('btc')
+    valuation.load({'poloniex': poloniex, 'coolcoin': coolcoin},
+                   {'eth': (poloniex, 'btc_eth'), 'usd': (poloniex, 'usd_btc')})
+    valuation.value('poloniex')
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+import depthArray
+
+# balance中的币种
+COINS = ('btc', 'usd', 'cny', 'eth', 'ltc', 'etc')
+
+
+def _side(levels):
+    # 也接受Aggregator.depth()的[price, qty, venue]
+    if np is not None and isinstance(levels, np.ndarray):
+        return levels
+    return depthArray.to_array([level[:2] for level in levels])
+
+
+class Valuation():
+    """
+    :param quote: 计价币种
+    :param coins: 币种list
+    """
+    def __init__(self, quote='btc', coins=COINS):
+        depthArray.require_numpy()
+        self.quote = quote
+        self.coins = list(coins)
+        if quote not in self.coins:
+            self.coins.append(quote)
+        self.index = {coin: i for i, coin in enumerate(self.coins)}
+        self.venues = []
+        self.holdings = np.zeros((0, len(self.coins)))
+        # 每个币种以quote计的中间价和清算均价，没有深度的币种为0
+        self.mid = np.zeros(len(self.coins))
+        self.liquidation = np.zeros(len(self.coins))
+        self.priced = np.zeros(len(self.coins), dtype=bool)
+        self._books = {}
+        self._total = np.zeros(0)
+        self._net = np.zeros(0)
+        self.set_price(quote, 1.0)
+
+    # ---- 持仓 ----
+
+    def set_balance(self, venue, balance):
+        """
+        :param balance: client.balance()的返回值
+        """
+        row = np.zeros(len(self.coins))
+        for kind in ('trade', 'frozen'):
+            for coin, amount in balance[kind].items():
+                if coin in self.index:
+                    row[self.index[coin]] += float(amount)
+        if venue not in self.venues:
+            self.venues.append(venue)
+            self.holdings = np.vstack([self.holdings, row])
+            changed = row != 0
+        else:
+            v = self.venues.index(venue)
+            changed = self.holdings[v] != row
+            self.holdings[v] = row
+        # 合计持仓变化的币种需要重新计算清算均价
+        for i in np.flatnonzero(changed):
+            if i in self._books:
+                self.liquidation[i] = self._liquidation_price(i)
+        self.recompute()
+
+    # ---- 价格 ----
+
+    def set_price(self, coin, price):
+        """
+        固定价格，例如quote本身为1
+        """
+        i = self.index[coin]
+        self._books.pop(i, None)
+        self._update(i, price, price)
+
+    def set_book(self, coin, depth, inverse=False):
+        """
+        用深度给coin定价
+        :param depth: get_depth的返回值(list或as_array)，价格为每个coin多少quote
+        :param inverse: True时depth的价格为每个quote多少coin，例如用USDT_BTC的深度给usd定价
+        """
+        i = self.index[coin]
+        bids, asks = _side(depth['bids']), _side(depth['asks'])
+        self._books[i] = (bids, asks, inverse)
+        mid = depthArray.mid({'bids': bids, 'asks': asks})
+        if inverse:
+            mid = 1.0 / mid
+        if np.isnan(mid):
+            self._books.pop(i, None)
+            self._update(i, 0.0, 0.0, priced=False)
+            return
+        self._update(i, mid, self._liquidation_price(i))
+
+    def _liquidation_price(self, i):
+        bids, asks, inverse = self._books[i]
+        size = self.holdings[:, i].sum()
+        if size <= 0:
+            # 没有持仓时清算均价等于最优价
+            size = 1e-12
+        if inverse:
+            # 卖出coin即用coin买入quote：吃asks
+            received = depthArray.spend(asks, size)
+        else:
+            received = depthArray.proceeds(bids, size)
+        return received / size
+
+    def _update(self, i, mid, liquidation, priced=True):
+        # 只按这个币种的价格变化更新各交易所的估值
+        column = self.holdings[:, i]
+        self._total += column * (mid - self.mid[i])
+        self._net += column * (liquidation - self.liquidation[i])
+        self.mid[i] = mid
+        self.liquidation[i] = liquidation
+        self.priced[i] = priced
+
+    def recompute(self):
+        """
+        重新计算全部估值
+        """
+        self._total = self.holdings @ self.mid
+        self._net = self.holdings @ self.liquidation
+
+    # ---- 结果 ----
+
+    def value(self, venue=None):
+        """
+        :param venue: None为全部交易所合计
+        :return: {'total', 'net'}
+        """
+        if venue is None:
+            return {'total': float(self._total.sum()), 'net': float(self._net.sum())}
+        v = self.venues.index(venue)
+        return {'total': float(self._total[v]), 'net': float(self._net[v])}
+
+    def unpriced(self, venue=None):
+        """
+        :return: 有持仓但没有价格的币种，这些币种的估值计为0
+        """
+        held = self.holdings.sum(axis=0) if venue is None else self.holdings[self.venues.index(venue)]
+        return [coin for coin, i in self.index.items() if held[i] != 0 and not self.priced[i]]
+
+    def fill(self, venue, balance):
+        """
+        把venue的估值填入balance['asset']
+        :return: balance
+        """
+        balance['asset'].update(self.value(venue))
+        return balance
+
+    def load(self, clients, markets, **kwargs):
+        """
+        获取各交易所的balance和定价用的深度，并填入balance['asset']
+        :param clients: {venue: client}
+        :param markets: {coin: (client, pair)}，pair为coin与quote之间的交易对，方向由client.split_pair判断
+        :param kwargs: 传给get_depth的参数
+        :return: {venue: balance}
+        :raises errors.ExchangeError: 获取balance或深度失败
+        """
+        balances = {}
+        for venue, client in clients.items():
+            balance = client.balance()
+            balances[venue] = balance
+            self.set_balance(venue, balance)
+        for coin, (client, pair) in markets.items():
+            asset, currency = client.split_pair(pair)
+            if (asset, currency) == (coin, self.quote):
+                inverse = False
+            elif (asset, currency) == (self.quote, coin):
+                inverse = True
+            else:
+                raise ValueError("{} is not a market between {} and {}".format(pair, coin, self.quote))
+            self.set_book(coin, client.get_depth(pair, as_array=True, **kwargs), inverse)
+        for venue, balance in balances.items():
+            self.fill(venue, balance)
+        return balances